@@ -0,0 +1,242 @@
+"""Initial schema: the tables as they were before the first index migration
+
+Revision ID: 0000
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0000"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "plant_conditions",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("name_ar", sa.String(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("description_ar", sa.Text(), nullable=True),
+        sa.Column("treatment", sa.JSON(), nullable=True),
+        sa.Column("treatment_ar", sa.JSON(), nullable=True),
+        sa.Column("prevention_tips", sa.JSON(), nullable=True),
+        sa.Column("prevention_tips_ar", sa.JSON(), nullable=True),
+        sa.Column("image_examples", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name")
+    )
+    op.create_index("ix_plant_conditions_id", "plant_conditions", ["id"])
+
+    op.create_table(
+        "plant_types",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("name_ar", sa.String(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("description_ar", sa.Text(), nullable=True),
+        sa.Column("care_instructions", sa.Text(), nullable=True),
+        sa.Column("care_instructions_ar", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name")
+    )
+    op.create_index("ix_plant_types_id", "plant_types", ["id"])
+
+    op.create_table(
+        "products",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("name_ar", sa.String(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("description_ar", sa.Text(), nullable=True),
+        sa.Column("price", sa.Float(), nullable=True),
+        sa.Column("discount_price", sa.Float(), nullable=True),
+        sa.Column("category", sa.Enum("INDOOR_PLANTS", "OUTDOOR_PLANTS", "SEEDS", "POTS", "SOIL", "FERTILIZERS", "TOOLS", "ACCESSORIES", name="productcategory"), nullable=True),
+        sa.Column("image_url", sa.String(), nullable=True),
+        sa.Column("additional_images", sa.JSON(), nullable=True),
+        sa.Column("stock_quantity", sa.Integer(), nullable=True),
+        sa.Column("is_available", sa.Boolean(), nullable=True),
+        sa.Column("rating", sa.Float(), nullable=True),
+        sa.Column("reviews_count", sa.Integer(), nullable=True),
+        sa.Column("specifications", sa.JSON(), nullable=True),
+        sa.Column("specifications_ar", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_products_id", "products", ["id"])
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("hashed_password", sa.String(), nullable=True),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("full_name_ar", sa.String(), nullable=True),
+        sa.Column("phone_number", sa.String(), nullable=True),
+        sa.Column("address", sa.String(), nullable=True),
+        sa.Column("address_ar", sa.String(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_admin", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "orders",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("status", sa.Enum("PENDING", "PROCESSING", "SHIPPED", "DELIVERED", "CANCELLED", name="orderstatus"), nullable=True),
+        sa.Column("total_amount", sa.Float(), nullable=True),
+        sa.Column("shipping_address", sa.String(), nullable=True),
+        sa.Column("shipping_address_ar", sa.String(), nullable=True),
+        sa.Column("tracking_number", sa.String(), nullable=True),
+        sa.Column("payment_method", sa.String(), nullable=True),
+        sa.Column("payment_id", sa.String(), nullable=True),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_orders_id", "orders", ["id"])
+
+    op.create_table(
+        "plants",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("nickname", sa.String(), nullable=True),
+        sa.Column("nickname_ar", sa.String(), nullable=True),
+        sa.Column("plant_name", sa.String(), nullable=True),
+        sa.Column("plant_name_ar", sa.String(), nullable=True),
+        sa.Column("latin_name", sa.String(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("description_ar", sa.Text(), nullable=True),
+        sa.Column("location", sa.String(), nullable=True),
+        sa.Column("location_ar", sa.String(), nullable=True),
+        sa.Column("photo_url", sa.String(), nullable=True),
+        sa.Column("watering_interval_days", sa.Integer(), nullable=True),
+        sa.Column("last_watered_date", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("next_watering_date", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("sunlight_requirements", sa.String(), nullable=True),
+        sa.Column("sunlight_requirements_ar", sa.String(), nullable=True),
+        sa.Column("temperature_min", sa.Float(), nullable=True),
+        sa.Column("temperature_max", sa.Float(), nullable=True),
+        sa.Column("humidity_preference", sa.String(), nullable=True),
+        sa.Column("humidity_preference_ar", sa.String(), nullable=True),
+        sa.Column("soil_type", sa.String(), nullable=True),
+        sa.Column("soil_type_ar", sa.String(), nullable=True),
+        sa.Column("fertilizing_interval_days", sa.Integer(), nullable=True),
+        sa.Column("last_fertilized_date", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_deleted", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("owner_id", sa.String(), nullable=True),
+        sa.Column("plant_type_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["plant_type_id"], ["plant_types.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_plants_id", "plants", ["id"])
+
+    op.create_table(
+        "product_reviews",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("rating", sa.Integer(), nullable=True),
+        sa.Column("comment", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("product_id", sa.String(), nullable=True),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_product_reviews_id", "product_reviews", ["id"])
+
+    op.create_table(
+        "diagnoses",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("image_url", sa.String(), nullable=True),
+        sa.Column("condition", sa.String(), nullable=True),
+        sa.Column("condition_ar", sa.String(), nullable=True),
+        sa.Column("confidence", sa.Float(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("description_ar", sa.Text(), nullable=True),
+        sa.Column("treatment", sa.JSON(), nullable=True),
+        sa.Column("treatment_ar", sa.JSON(), nullable=True),
+        sa.Column("prevention_tips", sa.JSON(), nullable=True),
+        sa.Column("prevention_tips_ar", sa.JSON(), nullable=True),
+        sa.Column("is_resolved", sa.Boolean(), nullable=True),
+        sa.Column("resolved_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("plant_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["plant_id"], ["plants.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_diagnoses_id", "diagnoses", ["id"])
+
+    op.create_table(
+        "order_items",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=True),
+        sa.Column("unit_price", sa.Float(), nullable=True),
+        sa.Column("total_price", sa.Float(), nullable=True),
+        sa.Column("order_id", sa.String(), nullable=True),
+        sa.Column("product_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.id"]),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_order_items_id", "order_items", ["id"])
+
+    op.create_table(
+        "watering_history",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("watered_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("plant_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["plant_id"], ["plants.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_watering_history_id", "watering_history", ["id"])
+
+
+def downgrade():
+    op.drop_index("ix_watering_history_id", table_name="watering_history")
+    op.drop_table("watering_history")
+    op.drop_index("ix_order_items_id", table_name="order_items")
+    op.drop_table("order_items")
+    op.drop_index("ix_diagnoses_id", table_name="diagnoses")
+    op.drop_table("diagnoses")
+    op.drop_index("ix_product_reviews_id", table_name="product_reviews")
+    op.drop_table("product_reviews")
+    op.drop_index("ix_plants_id", table_name="plants")
+    op.drop_table("plants")
+    op.drop_index("ix_orders_id", table_name="orders")
+    op.drop_table("orders")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_index("ix_users_username", table_name="users")
+    op.drop_table("users")
+    op.drop_index("ix_products_id", table_name="products")
+    op.drop_table("products")
+    op.drop_index("ix_plant_types_id", table_name="plant_types")
+    op.drop_table("plant_types")
+    op.drop_index("ix_plant_conditions_id", table_name="plant_conditions")
+    op.drop_table("plant_conditions")
@@ -0,0 +1,52 @@
+"""Composite and partial indexes for the hot per-user queries
+
+Also adds products.is_deleted, which the catalog queries filter on but
+the initial schema never created.
+
+Revision ID: 0001
+Revises: 0000
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = "0000"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Every existing product is live; listings only match is_deleted = false
+    op.add_column("products", sa.Column("is_deleted", sa.Boolean(), nullable=True))
+    op.execute(sa.text("UPDATE products SET is_deleted = :deleted").bindparams(deleted=False))
+
+    # Plants listed per owner, excluding soft-deleted rows
+    op.create_index("ix_plants_owner_id_is_deleted", "plants", ["owner_id", "is_deleted"])
+    op.create_index(
+        "ix_plants_owner_id_created_at_active", "plants", ["owner_id", "created_at"],
+        postgresql_where=sa.text("is_deleted = false"),
+        sqlite_where=sa.text("is_deleted = 0")
+    )
+
+    # Diagnosis history per user, newest first
+    op.create_index("ix_diagnoses_user_id_created_at", "diagnoses", ["user_id", "created_at"])
+
+    # Watering history per plant, newest first
+    op.create_index("ix_watering_history_plant_id_watered_at", "watering_history", ["plant_id", "watered_at"])
+
+    # Reviews per product and the one-review-per-user check
+    op.create_index("ix_product_reviews_product_id_user_id", "product_reviews", ["product_id", "user_id"])
+
+
+def downgrade():
+    op.drop_index("ix_product_reviews_product_id_user_id", table_name="product_reviews")
+    op.drop_index("ix_watering_history_plant_id_watered_at", table_name="watering_history")
+    op.drop_index("ix_diagnoses_user_id_created_at", table_name="diagnoses")
+    op.drop_index("ix_plants_owner_id_created_at_active", table_name="plants")
+    op.drop_index("ix_plants_owner_id_is_deleted", table_name="plants")
+
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_column("is_deleted")
@@ -0,0 +1,97 @@
+"""Full-text search index for products
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# A snapshot of the search normalizer (app.utils.i18n_utils.normalize_text)
+# and document layout (app.services.search_service) as of this revision, so
+# that later changes to the app do not change what this migration does
+NAME_FIELDS = ("name", "name_ar", "latin_name")
+BODY_FIELDS = ("description", "description_ar")
+
+_ARABIC_FOLDING = {
+    "\u0623": "\u0627",  # alef with hamza above -> alef
+    "\u0625": "\u0627",  # alef with hamza below -> alef
+    "\u0622": "\u0627",  # alef with madda -> alef
+    "\u0671": "\u0627",  # alef wasla -> alef
+    "\u0629": "\u0647",  # taa marbuta -> haa
+    "\u0649": "\u064a",  # alef maqsura -> yaa
+    "\u0624": "\u0648",  # waw with hamza -> waw
+    "\u0626": "\u064a",  # yaa with hamza -> yaa
+}
+_ARABIC_REMOVED = [chr(code) for code in range(0x064B, 0x0660)] + ["\u0670", "\u0640"]
+_NORMALIZATION_TABLE = str.maketrans({**_ARABIC_FOLDING, **{char: None for char in _ARABIC_REMOVED}})
+_TOKEN_SPLIT = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_text(text):
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold().translate(_NORMALIZATION_TABLE)
+    return " ".join(_TOKEN_SPLIT.split(text)).strip()
+
+
+def build_search_document(product):
+    names = " ".join(normalize_text(product.get(field)) for field in NAME_FIELDS)
+    body = " ".join(normalize_text(product.get(field)) for field in BODY_FIELDS)
+    return names.strip(), body.strip()
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if bind.dialect.name == "sqlite":
+        # Text is normalized in Python before indexing, so FTS5 must not
+        # fold diacritics a second time
+        op.execute(
+            "CREATE VIRTUAL TABLE product_search USING fts5("
+            "product_id UNINDEXED, names, body, tokenize = 'unicode61 remove_diacritics 0')"
+        )
+    else:
+        op.create_table(
+            "product_search",
+            sa.Column("product_id", sa.String(), sa.ForeignKey("products.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("document", postgresql.TSVECTOR(), nullable=False)
+        )
+        op.create_index("ix_product_search_document", "product_search", ["document"], postgresql_using="gin")
+
+    # Index the existing catalog with the normalizer snapshot above
+    columns = {column["name"] for column in sa.inspect(bind).get_columns("products")}
+    fields = ["id"] + [field for field in NAME_FIELDS + BODY_FIELDS if field in columns]
+    products = bind.execute(sa.text(f"SELECT {', '.join(fields)} FROM products")).mappings().all()
+    for product in products:
+        names, body = build_search_document(product)
+        if bind.dialect.name == "sqlite":
+            bind.execute(
+                sa.text("INSERT INTO product_search (product_id, names, body) VALUES (:product_id, :names, :body)"),
+                {"product_id": product["id"], "names": names, "body": body}
+            )
+        else:
+            bind.execute(
+                sa.text(
+                    "INSERT INTO product_search (product_id, document) VALUES (:product_id, "
+                    "setweight(to_tsvector('simple', :names), 'A') || setweight(to_tsvector('simple', :body), 'B'))"
+                ),
+                {"product_id": product["id"], "names": names, "body": body}
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        op.drop_index("ix_product_search_document", table_name="product_search")
+    op.drop_table("product_search")
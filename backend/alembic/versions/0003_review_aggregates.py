@@ -0,0 +1,37 @@
+"""Running rating total for incremental review aggregates
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("products", sa.Column("rating_total", sa.Integer(), nullable=True, server_default="0"))
+
+    # Backfill every aggregate from the existing reviews
+    op.execute(
+        """
+        UPDATE products SET
+            reviews_count = (SELECT COUNT(*) FROM product_reviews WHERE product_reviews.product_id = products.id),
+            rating_total = COALESCE((SELECT SUM(rating) FROM product_reviews WHERE product_reviews.product_id = products.id), 0)
+        """
+    )
+    op.execute(
+        "UPDATE products SET rating = CASE WHEN reviews_count > 0 "
+        "THEN CAST(rating_total AS FLOAT) / reviews_count ELSE 0 END"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_column("rating_total")
@@ -0,0 +1,53 @@
+"""Change tracking columns and indexes for delta sync
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# Tables whose updated_at is now also set on insert
+SYNCED_TABLES = ("plants", "diagnoses", "orders")
+
+
+def upgrade():
+    # updated_at was only set on update; rows never updated get their creation time
+    for table in SYNCED_TABLES:
+        op.execute(f"UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column("updated_at", existing_type=sa.DateTime(timezone=True), server_default=sa.func.now())
+
+    # Watering entries can be backdated, so they get their own recording time.
+    # The default is set after the backfill; SQLite cannot add a column with one.
+    op.add_column("watering_history", sa.Column("created_at", sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE watering_history SET created_at = watered_at WHERE created_at IS NULL")
+    with op.batch_alter_table("watering_history") as batch_op:
+        batch_op.alter_column("created_at", existing_type=sa.DateTime(timezone=True), server_default=sa.func.now())
+
+    # Rows changed since a watermark, per owner, in (updated_at, id) order
+    op.create_index("ix_plants_owner_id_updated_at", "plants", ["owner_id", "updated_at", "id"])
+    op.create_index("ix_diagnoses_user_id_updated_at", "diagnoses", ["user_id", "updated_at", "id"])
+    op.create_index("ix_orders_user_id_updated_at", "orders", ["user_id", "updated_at", "id"])
+    op.create_index("ix_watering_history_plant_id_created_at", "watering_history", ["plant_id", "created_at", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_watering_history_plant_id_created_at", table_name="watering_history")
+    op.drop_index("ix_orders_user_id_updated_at", table_name="orders")
+    op.drop_index("ix_diagnoses_user_id_updated_at", table_name="diagnoses")
+    op.drop_index("ix_plants_owner_id_updated_at", table_name="plants")
+
+    with op.batch_alter_table("watering_history") as batch_op:
+        batch_op.drop_column("created_at")
+
+    for table in SYNCED_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column("updated_at", existing_type=sa.DateTime(timezone=True), server_default=None)
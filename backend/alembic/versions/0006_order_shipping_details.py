@@ -0,0 +1,29 @@
+"""Shipping details on orders
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# Fields the order API takes beside shipping_address, with nowhere to go until now
+SHIPPING_COLUMNS = ("shipping_city", "shipping_country", "shipping_postal_code", "contact_phone")
+
+
+def upgrade():
+    for column in SHIPPING_COLUMNS:
+        op.add_column("orders", sa.Column(column, sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("orders") as batch_op:
+        for column in reversed(SHIPPING_COLUMNS):
+            batch_op.drop_column(column)
@@ -1,26 +1,289 @@
-from sqlalchemy import create_engine
+from sqlalchemy import Column, Delete, Insert, Integer, Update, create_engine, event, literal_column, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+import asyncio
+import itertools
+import logging
 import os
+import time
+
+from .utils.metrics_utils import metrics
+
+# Setup logging
+logger = logging.getLogger(__name__)
 
 # Get database URL from environment variable or use default SQLite database
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./hadeeqati.db")
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-)
+# Comma-separated read replica URLs for read-only endpoints (optional)
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+# How long a failed replica is skipped, and how often replicas are probed
+REPLICA_RETRY_SECONDS = float(os.environ.get("REPLICA_RETRY_SECONDS", 30))
+REPLICA_HEALTH_CHECK_SECONDS = float(os.environ.get("REPLICA_HEALTH_CHECK_SECONDS", 10))
+
+# Connection pool configuration (ignored for in-memory SQLite databases)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# SQLite tuning, applied to every new connection
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 268435456))  # 256 MB
+
+# Async drivers used by the API for each supported backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def get_async_database_url(url: str) -> str:
+    """Convert a synchronous database URL to its async driver equivalent
+
+    Synchronous drivers (e.g. 'postgresql+psycopg2://') are swapped for the
+    async driver of the same dialect; async URLs are returned unchanged.
+    """
+    scheme, sep, rest = url.partition("://")
+    dialect, _, driver = scheme.partition("+")
+    if dialect not in ASYNC_DRIVERS or driver in ("aiosqlite", "asyncpg"):
+        return url
+    return f"{ASYNC_DRIVERS[dialect]}{sep}{rest}"
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL", get_async_database_url(DATABASE_URL))
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def is_memory_sqlite(url: str) -> bool:
+    return is_sqlite(url) and (url.split("://", 1)[-1] in ("", "/", "/:memory:") or "mode=memory" in url)
+
+# Pools that record how long callers wait for a connection
+class _TimedPoolMixin:
+    metrics_name = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe(f"db.pool.{self.metrics_name}.checkout_wait", time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def get_engine_options(url: str, is_async: bool = False) -> dict:
+    """Build create_engine keyword arguments for a database URL
+
+    Args:
+        url: The database URL
+        is_async: Whether the options are for an async engine
+
+    Returns:
+        Keyword arguments for create_engine / create_async_engine
+    """
+    options = {}
+    if is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+        if is_memory_sqlite(url):
+            return options
+
+    options.update(
+        poolclass=TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING
+    )
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+def configure_engine(sync_engine, url: str, name: str):
+    """Attach connection hooks and pool metrics to an engine
+
+    Args:
+        sync_engine: The engine (or AsyncEngine.sync_engine) to configure
+        url: The database URL the engine was created from
+        name: Label used for the engine's metrics (e.g. 'primary')
+    """
+    if is_sqlite(url):
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+
+    pool = sync_engine.pool
+    if not isinstance(pool, _TimedPoolMixin):
+        return
+
+    pool.metrics_name = name
+    event.listen(sync_engine, "checkout", lambda *args: metrics.increment(f"db.pool.{name}.checkouts"))
+    metrics.register_gauge(f"db.pool.{name}.size", lambda: sync_engine.pool.size())
+    metrics.register_gauge(f"db.pool.{name}.checked_out", lambda: sync_engine.pool.checkedout())
+    metrics.register_gauge(f"db.pool.{name}.overflow", lambda: sync_engine.pool.overflow())
+
+# Create SQLAlchemy engine (used by migrations and maintenance scripts)
+engine = create_engine(DATABASE_URL, **get_engine_options(DATABASE_URL))
+configure_engine(engine, DATABASE_URL, "sync")
+
+# Create async engine (used by the API routes)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **get_engine_options(ASYNC_DATABASE_URL, is_async=True))
+configure_engine(async_engine.sync_engine, ASYNC_DATABASE_URL, "primary")
+
+# Read replicas, picked round-robin among the healthy ones
+class ReplicaSet:
+    """Round-robin selection over read replica engines with health tracking
+
+    A replica is taken out of rotation for REPLICA_RETRY_SECONDS when a
+    connection to it fails or a health check does not succeed. When no
+    replica is healthy, reads fall back to the primary.
+    """
+
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self._counter = itertools.count()
+        self._down_until = {}
+
+    def is_healthy(self, engine) -> bool:
+        return self._down_until.get(engine, 0) <= time.monotonic()
+
+    def mark_down(self, engine):
+        if self.is_healthy(engine):
+            logger.warning("Read replica %s is unavailable, routing reads elsewhere", engine.url.render_as_string())
+        self._down_until[engine] = time.monotonic() + REPLICA_RETRY_SECONDS
+        metrics.increment("db.replica.failures")
+
+    def mark_up(self, engine):
+        self._down_until.pop(engine, None)
+
+    def choose(self):
+        """Return the next healthy replica engine, or None"""
+        for _ in range(len(self.engines)):
+            engine = self.engines[next(self._counter) % len(self.engines)]
+            if self.is_healthy(engine):
+                return engine
+        return None
+
+    async def check_health(self):
+        """Probe every replica with a trivial query and update its status"""
+        for engine in self.engines:
+            try:
+                async with engine.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+                self.mark_up(engine)
+            except Exception:
+                self.mark_down(engine)
+
+    def healthy_count(self) -> int:
+        return sum(1 for engine in self.engines if self.is_healthy(engine))
+
+def _create_replica_engine(url: str, name: str):
+    async_url = get_async_database_url(url)
+    replica_engine = create_async_engine(async_url, **get_engine_options(async_url, is_async=True))
+    configure_engine(replica_engine.sync_engine, async_url, name)
+
+    @event.listens_for(replica_engine.sync_engine, "handle_error")
+    def _on_replica_error(context):
+        if context.is_disconnect or context.connection is None:
+            replica_set.mark_down(replica_engine)
+
+    return replica_engine
+
+replica_set = ReplicaSet([])
+replica_set.engines = [
+    _create_replica_engine(url, f"replica{index}") for index, url in enumerate(DATABASE_REPLICA_URLS, start=1)
+]
+metrics.register_gauge("db.replica.healthy", replica_set.healthy_count)
+
+class RoutingSession(Session):
+    """Session that reads from a replica until it writes
+
+    SELECTs go to one healthy replica, chosen when the session first reads
+    so that all its reads share a snapshot. As soon as the session flushes
+    or executes an INSERT/UPDATE/DELETE it is pinned to the primary, so
+    reads that follow a write in the same request see that write.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.info.get("pinned_to_primary") or self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.info["pinned_to_primary"] = True
+            return async_engine.sync_engine
+
+        replica = self.info.get("replica")
+        if replica is None or not replica_set.is_healthy(replica):
+            replica = self.info["replica"] = replica_set.choose()
+        if replica is None:
+            return async_engine.sync_engine
+        metrics.increment("db.replica.reads")
+        return replica.sync_engine
+
+async def monitor_replicas():
+    """Background task that periodically health-checks the read replicas"""
+    while True:
+        await replica_set.check_health()
+        await asyncio.sleep(REPLICA_HEALTH_CHECK_SECONDS)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create AsyncSessionLocal class. Objects stay usable after commit so routes
+# can return them without triggering an implicit (and unsupported) reload.
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Create ReadSessionLocal class for read-only endpoints (routes to replicas)
+ReadSessionLocal = async_sessionmaker(sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False)
+
 # Create Base class
 Base = declarative_base()
 
+def version_column() -> Column:
+    """A row version counter, incremented by every UPDATE of the row
+
+    Applied by the ORM and by Core update() statements alike, so ETags
+    built on it change on every write, however close together; stored
+    timestamps only have whole-second precision on SQLite.
+    """
+    return Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version") + 1)
+
 # Dependency to get DB session
-def get_db():
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dependency to get a DB session for read-only endpoints. Reads go to a
+# replica when DATABASE_REPLICA_URLS is set, otherwise to the primary.
+async def get_read_db():
+    if not replica_set.engines:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    async with ReadSessionLocal() as db:
+        yield db
+
+# Session for scripts and background jobs that run outside the event loop
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
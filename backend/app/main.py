@@ -3,10 +3,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from typing import List, Optional
 import uvicorn
+import asyncio
 import os
 
 # Import routers
-from routers import users, plants, diagnoses, marketplace
+from .routers import users, plants, diagnoses, marketplace, search, sync
+from .database import AsyncSessionLocal, async_engine, monitor_replicas, replica_set
+from .services import auth_service, autocomplete_service, reservation_service
+from .utils.metrics_utils import metrics
+from .utils import compression_utils, idempotency_utils, query_utils, rate_limit_utils
 
 # Create FastAPI app
 app = FastAPI(
@@ -15,6 +20,15 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Replay responses for retried order and diagnosis creation (added first so that
+# it runs inside CORS and replayed responses get CORS headers)
+app.add_middleware(idempotency_utils.IdempotencyMiddleware, subject_resolver=auth_service.get_token_subject)
+
+# Token-bucket rate limiting per user or client IP, weighted by route cost
+# (also inside CORS, so that 429 responses can be read by browsers)
+if rate_limit_utils.RATE_LIMIT_ENABLED:
+    app.add_middleware(rate_limit_utils.RateLimitMiddleware, subject_resolver=auth_service.get_token_subject)
+
 # Configure CORS
 origins = [
     "http://localhost:3000",
@@ -29,13 +43,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed", "ETag", "Last-Modified", "Retry-After"],
 )
 
+# Count SQL statements per request when enabled (development and tests)
+if query_utils.QUERY_COUNTING_ENABLED:
+    query_utils.install_query_counter(async_engine.sync_engine)
+    app.add_middleware(query_utils.QueryCountMiddleware)
+
+# Compress JSON bodies for clients that accept it (outermost, so that stored
+# idempotent responses stay unencoded and are encoded per client on replay)
+app.add_middleware(compression_utils.CompressionMiddleware)
+
 # Include routers
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(plants.router, prefix="/api/plants", tags=["plants"])
 app.include_router(diagnoses.router, prefix="/api/diagnoses", tags=["diagnoses"])
 app.include_router(marketplace.router, prefix="/api/marketplace", tags=["marketplace"])
+app.include_router(search.router, prefix="/api/search", tags=["search"])
+app.include_router(sync.router, prefix="/api/sync", tags=["sync"])
+
+# Background tasks
+@app.on_event("startup")
+async def start_background_tasks():
+    async with AsyncSessionLocal() as db:
+        await autocomplete_service.build_index(db)
+    
+    app.state.reservation_sweeper = asyncio.create_task(reservation_service.sweep_expired_reservations())
+    if replica_set.engines:
+        app.state.replica_monitor = asyncio.create_task(monitor_replicas())
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for name in ("reservation_sweeper", "replica_monitor"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    auth_service.password_executor.shutdown(wait=False)
 
 # Root endpoint
 @app.get("/", tags=["root"])
@@ -51,9 +95,14 @@ async def read_root():
 async def health_check():
     return {"status": "healthy"}
 
+# Metrics endpoint (per worker process)
+@app.get("/metrics", tags=["health"])
+async def get_metrics():
+    return metrics.snapshot()
+
 if __name__ == "__main__":
     # Get port from environment variable or use default
     port = int(os.environ.get("PORT", 8000))
     
     # Run the application
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
+    uvicorn.run("app.main:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
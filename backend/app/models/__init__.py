@@ -1,4 +1,4 @@
-from .user import User
+from .user import User, RefreshToken
 from .plant import Plant, PlantType, WateringHistory
 from .diagnosis import Diagnosis, PlantCondition
 from .marketplace import Product, ProductReview, Order, OrderItem, ProductCategory, OrderStatus
@@ -6,6 +6,7 @@ from .marketplace import Product, ProductReview, Order, OrderItem, ProductCatego
 # Export all models
 __all__ = [
     'User',
+    'RefreshToken',
     'Plant',
     'PlantType',
     'WateringHistory',
@@ -1,9 +1,9 @@
-from sqlalchemy import Boolean, Column, String, Integer, DateTime, ForeignKey, Float, Table, Text, JSON
+from sqlalchemy import Boolean, Column, String, Integer, DateTime, ForeignKey, Float, Table, Text, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
 
-from ..database import Base
+from ..database import Base, version_column
 
 # Diagnosis model
 class Diagnosis(Base):
@@ -23,7 +23,9 @@ class Diagnosis(Base):
     is_resolved = Column(Boolean, default=False)
     resolved_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Set on insert too, so delta sync can select changes on this column alone
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    version = version_column()
     
     # Foreign keys
     user_id = Column(String, ForeignKey("users.id"))
@@ -32,6 +34,12 @@ class Diagnosis(Base):
     # Relationships
     user = relationship("User", back_populates="diagnoses")
     plant = relationship("Plant", back_populates="diagnoses")
+    
+    # Indexes for a user's diagnosis history, newest first, and for delta sync
+    __table_args__ = (
+        Index("ix_diagnoses_user_id_created_at", "user_id", "created_at"),
+        Index("ix_diagnoses_user_id_updated_at", "user_id", "updated_at", "id"),
+    )
 
 # Plant Condition model (for ML model reference)
 class PlantCondition(Base):
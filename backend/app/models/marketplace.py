@@ -1,13 +1,13 @@
-from sqlalchemy import Boolean, Column, String, Integer, DateTime, ForeignKey, Float, Table, Text, JSON, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, String, Integer, DateTime, ForeignKey, Float, Table, Text, JSON, Enum, Index
+from sqlalchemy.orm import relationship, synonym
 from sqlalchemy.sql import func
 import uuid
 import enum
 
-from ..database import Base
+from ..database import Base, version_column
 
-# Product Category Enum
-class ProductCategory(enum.Enum):
+# Product Category Enum (str values, so the API enums validate from members)
+class ProductCategory(str, enum.Enum):
     INDOOR_PLANTS = "indoor_plants"
     OUTDOOR_PLANTS = "outdoor_plants"
     SEEDS = "seeds"
@@ -18,7 +18,7 @@ class ProductCategory(enum.Enum):
     ACCESSORIES = "accessories"
 
 # Order Status Enum
-class OrderStatus(enum.Enum):
+class OrderStatus(str, enum.Enum):
     PENDING = "pending"
     PROCESSING = "processing"
     SHIPPED = "shipped"
@@ -41,16 +41,24 @@ class Product(Base):
     additional_images = Column(JSON, nullable=True)  # List of additional image URLs
     stock_quantity = Column(Integer, default=0)
     is_available = Column(Boolean, default=True)
+    is_deleted = Column(Boolean, default=False)
     rating = Column(Float, default=0.0)
     reviews_count = Column(Integer, default=0)
+    rating_total = Column(Integer, default=0)  # Sum of review ratings, kept with reviews_count
     specifications = Column(JSON, nullable=True)  # JSON object with product specifications
     specifications_ar = Column(JSON, nullable=True)  # JSON object with product specifications in Arabic
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    version = version_column()
     
     # Relationships
     reviews = relationship("ProductReview", back_populates="product")
     order_items = relationship("OrderItem", back_populates="product")
+    
+    # Names used by the API responses
+    category_id = synonym("category")
+    average_rating = synonym("rating")
+    review_count = synonym("reviews_count")
 
 # Product Review model
 class ProductReview(Base):
@@ -68,6 +76,11 @@ class ProductReview(Base):
     # Relationships
     product = relationship("Product", back_populates="reviews")
     user = relationship("User")
+    
+    # Index for per-product review listing and the one-review-per-user check
+    __table_args__ = (
+        Index("ix_product_reviews_product_id_user_id", "product_id", "user_id"),
+    )
 
 # Order model
 class Order(Base):
@@ -78,12 +91,17 @@ class Order(Base):
     total_amount = Column(Float)
     shipping_address = Column(String)
     shipping_address_ar = Column(String, nullable=True)
+    shipping_city = Column(String, nullable=True)
+    shipping_country = Column(String, nullable=True)
+    shipping_postal_code = Column(String, nullable=True)
+    contact_phone = Column(String, nullable=True)
     tracking_number = Column(String, nullable=True)
     payment_method = Column(String)
     payment_id = Column(String, nullable=True)
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Set on insert too, so delta sync can select changes on this column alone
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Foreign keys
     user_id = Column(String, ForeignKey("users.id"))
@@ -91,6 +109,11 @@ class Order(Base):
     # Relationships
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order")
+    
+    # Index for delta sync of a user's orders
+    __table_args__ = (
+        Index("ix_orders_user_id_updated_at", "user_id", "updated_at", "id"),
+    )
 
 # Order Item model
 class OrderItem(Base):
@@ -107,4 +130,7 @@ class OrderItem(Base):
     
     # Relationships
     order = relationship("Order", back_populates="items")
-    product = relationship("Product", back_populates="order_items")
\ No newline at end of file
+    product = relationship("Product", back_populates="order_items")
+    
+    # Name used by the API responses
+    price_per_unit = synonym("unit_price")
\ No newline at end of file
@@ -1,9 +1,9 @@
-from sqlalchemy import Boolean, Column, String, Integer, DateTime, ForeignKey, Float, Table, Text
+from sqlalchemy import Boolean, Column, String, Integer, DateTime, ForeignKey, Float, Table, Text, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
 
-from ..database import Base
+from ..database import Base, version_column
 
 # Plant model
 class Plant(Base):
@@ -35,7 +35,9 @@ class Plant(Base):
     last_fertilized_date = Column(DateTime(timezone=True), nullable=True)
     is_deleted = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Set on insert too, so delta sync can select changes on this column alone
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    version = version_column()
     
     # Foreign keys
     owner_id = Column(String, ForeignKey("users.id"))
@@ -46,6 +48,18 @@ class Plant(Base):
     plant_type = relationship("PlantType", back_populates="plants")
     watering_history = relationship("WateringHistory", back_populates="plant")
     diagnoses = relationship("Diagnosis", back_populates="plant")
+    
+    # Indexes for the per-owner plant listing
+    __table_args__ = (
+        Index("ix_plants_owner_id_is_deleted", "owner_id", "is_deleted"),
+        Index(
+            "ix_plants_owner_id_created_at_active", "owner_id", "created_at",
+            postgresql_where=text("is_deleted = false"),
+            sqlite_where=text("is_deleted = 0")
+        ),
+        # Delta sync: an owner's plants changed (or soft-deleted) since a watermark
+        Index("ix_plants_owner_id_updated_at", "owner_id", "updated_at", "id"),
+    )
 
 # Plant Type model
 class PlantType(Base):
@@ -60,6 +74,7 @@ class PlantType(Base):
     care_instructions_ar = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    version = version_column()
     
     # Relationships
     plants = relationship("Plant", back_populates="plant_type")
@@ -71,9 +86,17 @@ class WateringHistory(Base):
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
     watered_at = Column(DateTime(timezone=True), server_default=func.now())
     notes = Column(Text, nullable=True)
+    # When the entry was recorded; watered_at can be backdated by the client
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Foreign keys
     plant_id = Column(String, ForeignKey("plants.id"))
     
     # Relationships
-    plant = relationship("Plant", back_populates="watering_history")
\ No newline at end of file
+    plant = relationship("Plant", back_populates="watering_history")
+    
+    # Indexes for a plant's watering history, newest first, and for delta sync
+    __table_args__ = (
+        Index("ix_watering_history_plant_id_watered_at", "plant_id", "watered_at"),
+        Index("ix_watering_history_plant_id_created_at", "plant_id", "created_at", "id"),
+    )
\ No newline at end of file
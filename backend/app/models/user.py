@@ -26,4 +26,23 @@ class User(Base):
     # Relationships
     plants = relationship("Plant", back_populates="owner")
     orders = relationship("Order", back_populates="user")
-    diagnoses = relationship("Diagnosis", back_populates="user")
\ No newline at end of file
+    diagnoses = relationship("Diagnosis", back_populates="user")
+    refresh_tokens = relationship("RefreshToken", back_populates="user")
+
+# Refresh token model
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    token_hash = Column(String, unique=True, index=True)  # SHA-256 of the token; the token itself is never stored
+    family_id = Column(String, index=True)  # Shared by every token rotated from the same login
+    expires_at = Column(DateTime(timezone=True))
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+    replaced_by = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Foreign keys
+    user_id = Column(String, ForeignKey("users.id"), index=True)
+    
+    # Relationships
+    user = relationship("User", back_populates="refresh_tokens")
\ No newline at end of file
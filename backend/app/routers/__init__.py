@@ -1,4 +1,6 @@
 from .users import router as users_router
 from .plants import router as plants_router
 from .diagnoses import router as diagnoses_router
-from .marketplace import router as marketplace_router
\ No newline at end of file
+from .marketplace import router as marketplace_router
+from .search import router as search_router
+from .sync import router as sync_router
\ No newline at end of file
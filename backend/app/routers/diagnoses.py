@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status, UploadFile, File, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import FrozenSet, List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 import uuid
 
-from ..database import get_db
-from ..models import Diagnosis, PlantCondition, Plant, User
+from ..database import get_db, get_read_db
+from ..models import Diagnosis, PlantCondition, Plant
 from ..services import auth_service, diagnosis_service
+from ..utils import cache_utils, http_cache_utils, i18n_utils, pagination_utils, serialization_utils
 
 router = APIRouter()
 
@@ -54,13 +56,16 @@ class DiagnosisResponse(DiagnosisBase):
     class Config:
         orm_mode = True
 
+# Plant conditions change rarely; serialized responses are cached per worker
+condition_cache = cache_utils.TTLCache("plant_conditions")
+
 # Routes
 @router.post("/", response_model=DiagnosisResponse, status_code=status.HTTP_201_CREATED)
 async def create_diagnosis(
     file: UploadFile = File(...),
     plant_id: Optional[str] = None,
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Validate file type
     if file.content_type not in ["image/jpeg", "image/png", "image/gif"]:
@@ -71,11 +76,14 @@ async def create_diagnosis(
     
     # Check if plant exists and belongs to user if plant_id is provided
     if plant_id:
-        plant = db.query(Plant).filter(
-            Plant.id == plant_id,
-            Plant.owner_id == current_user.id,
-            Plant.is_deleted == False
-        ).first()
+        result = await db.execute(
+            select(Plant.id).filter(
+                Plant.id == plant_id,
+                Plant.owner_id == current_user.id,
+                Plant.is_deleted == False
+            )
+        )
+        plant = result.first()
         
         if not plant:
             raise HTTPException(
@@ -88,7 +96,8 @@ async def create_diagnosis(
     # For now, we'll create a diagnosis with mock data
     
     # Get a random plant condition for demo purposes
-    plant_condition = db.query(PlantCondition).first()
+    result = await db.execute(select(PlantCondition).limit(1))
+    plant_condition = result.scalars().first()
     if not plant_condition:
         # Create a default plant condition if none exists
         plant_condition = PlantCondition(
@@ -103,8 +112,8 @@ async def create_diagnosis(
             prevention_ar="حافظ على الري المنتظم، والضوء المناسب، والتسميد العرضي."
         )
         db.add(plant_condition)
-        db.commit()
-        db.refresh(plant_condition)
+        await db.commit()
+        await db.refresh(plant_condition)
     
     # Create diagnosis
     diagnosis_id = str(uuid.uuid4())
@@ -122,30 +131,38 @@ async def create_diagnosis(
     )
     
     db.add(diagnosis)
-    db.commit()
-    db.refresh(diagnosis)
+    await db.commit()
+    await db.refresh(diagnosis)
     
     return diagnosis
 
 @router.get("/", response_model=List[DiagnosisResponse])
 async def get_diagnoses(
-    current_user: User = Depends(auth_service.get_current_user),
+    response: Response,
+    language: str = Depends(i18n_utils.get_response_language),
+    fields: Optional[FrozenSet[str]] = Depends(serialization_utils.field_selector(DiagnosisResponse)),
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
     plant_id: Optional[str] = None,
-    skip: int = 0,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
 ):
     # Build query
-    query = db.query(Diagnosis).filter(Diagnosis.user_id == current_user.id)
+    query = select(Diagnosis).filter(Diagnosis.user_id == current_user.id)
     
     # Filter by plant_id if provided
     if plant_id:
         # Check if plant exists and belongs to user
-        plant = db.query(Plant).filter(
-            Plant.id == plant_id,
-            Plant.owner_id == current_user.id,
-            Plant.is_deleted == False
-        ).first()
+        result = await db.execute(
+            select(Plant.id).filter(
+                Plant.id == plant_id,
+                Plant.owner_id == current_user.id,
+                Plant.is_deleted == False
+            )
+        )
+        plant = result.first()
         
         if not plant:
             raise HTTPException(
@@ -155,36 +172,38 @@ async def get_diagnoses(
         
         query = query.filter(Diagnosis.plant_id == plant_id)
     
-    # Get diagnoses
-    diagnoses = query.order_by(Diagnosis.created_at.desc()).offset(skip).limit(limit).all()
-    
-    return diagnoses
-
-@router.get("/{diagnosis_id}", response_model=DiagnosisResponse)
-async def get_diagnosis(
-    diagnosis_id: str,
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
-):
-    diagnosis = db.query(Diagnosis).filter(
-        Diagnosis.id == diagnosis_id,
-        Diagnosis.user_id == current_user.id
-    ).first()
+    # Answer 304 if the history did not change, before loading it
+    etag = await http_cache_utils.collection_validators(
+        db, query, Diagnosis, current_user.id, plant_id, cursor, skip, limit, language,
+        serialization_utils.fieldset_key(fields)
+    )
+    if http_cache_utils.etag_matches(if_none_match, etag):
+        return http_cache_utils.not_modified_response(etag, cache_control=http_cache_utils.PRIVATE_CACHE_CONTROL, vary=i18n_utils.LANGUAGE_VARY)
+    http_cache_utils.set_cache_headers(response, etag, cache_control=http_cache_utils.PRIVATE_CACHE_CONTROL)
     
-    if not diagnosis:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Diagnosis not found"
+    # A sparse fieldset selects just its columns straight into dicts
+    if fields is not None:
+        projection = serialization_utils.get_projection(Diagnosis, DiagnosisResponse, fields)
+        rows = await pagination_utils.paginate_rows(
+            db, projection.project(query), [Diagnosis.created_at, Diagnosis.id], response,
+            cursor=cursor, skip=skip, limit=limit
         )
+        return i18n_utils.localized_response(projection.to_dicts(rows), DiagnosisResponse, language, response, fields=fields)
     
-    return diagnosis
+    # Get diagnoses
+    diagnoses = await pagination_utils.paginate(
+        db, query, [Diagnosis.created_at, Diagnosis.id], response,
+        cursor=cursor, skip=skip, limit=limit
+    )
+    
+    return i18n_utils.localized_response(diagnoses, DiagnosisResponse, language, response)
 
 # Plant Conditions routes (admin only)
 @router.post("/conditions", response_model=PlantConditionResponse, status_code=status.HTTP_201_CREATED)
 async def create_plant_condition(
     condition: PlantConditionCreate,
-    current_user: User = Depends(auth_service.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_admin_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Create new plant condition
     db_condition = PlantCondition(
@@ -193,8 +212,9 @@ async def create_plant_condition(
     )
     
     db.add(db_condition)
-    db.commit()
-    db.refresh(db_condition)
+    await db.commit()
+    await db.refresh(db_condition)
+    await condition_cache.invalidate()
     
     return db_condition
 
@@ -202,17 +222,28 @@ async def create_plant_condition(
 async def get_plant_conditions(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    language: str = Depends(i18n_utils.get_response_language),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    conditions = db.query(PlantCondition).offset(skip).limit(limit).all()
-    return conditions
+    async def load():
+        result = await db.execute(select(PlantCondition).offset(skip).limit(limit))
+        return [PlantConditionResponse.from_orm(condition).dict() for condition in result.scalars().all()]
+    
+    conditions = await condition_cache.get_or_load(("list", skip, limit), load)
+    return i18n_utils.localized_response(conditions, PlantConditionResponse, language)
 
 @router.get("/conditions/{condition_id}", response_model=PlantConditionResponse)
 async def get_plant_condition(
     condition_id: str,
-    db: Session = Depends(get_db)
+    language: str = Depends(i18n_utils.get_response_language),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    condition = db.query(PlantCondition).filter(PlantCondition.id == condition_id).first()
+    async def load():
+        result = await db.execute(select(PlantCondition).filter(PlantCondition.id == condition_id))
+        condition = result.scalars().first()
+        return PlantConditionResponse.from_orm(condition).dict() if condition else None
+    
+    condition = await condition_cache.get_or_load(("id", condition_id), load)
     
     if not condition:
         raise HTTPException(
@@ -220,4 +251,36 @@ async def get_plant_condition(
             detail="Plant condition not found"
         )
     
-    return condition
\ No newline at end of file
+    return i18n_utils.localized_response(condition, PlantConditionResponse, language)
+
+@router.get("/{diagnosis_id}", response_model=DiagnosisResponse)
+async def get_diagnosis(
+    diagnosis_id: str,
+    response: Response,
+    language: str = Depends(i18n_utils.get_response_language),
+    fields: Optional[FrozenSet[str]] = Depends(serialization_utils.field_selector(DiagnosisResponse)),
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
+):
+    result = await db.execute(
+        select(Diagnosis).filter(
+            Diagnosis.id == diagnosis_id,
+            Diagnosis.user_id == current_user.id
+        )
+    )
+    diagnosis = result.scalars().first()
+    
+    if not diagnosis:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Diagnosis not found"
+        )
+    
+    etag, last_modified = http_cache_utils.entity_validators(diagnosis, language, serialization_utils.fieldset_key(fields))
+    if http_cache_utils.is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+        return http_cache_utils.not_modified_response(etag, last_modified, http_cache_utils.PRIVATE_CACHE_CONTROL, i18n_utils.LANGUAGE_VARY)
+    http_cache_utils.set_cache_headers(response, etag, last_modified, http_cache_utils.PRIVATE_CACHE_CONTROL)
+    
+    return i18n_utils.localized_response(diagnosis, DiagnosisResponse, language, response, fields=fields)
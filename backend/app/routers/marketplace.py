@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status, UploadFile, File, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from typing import FrozenSet, List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 import uuid
 from enum import Enum
 
-from ..database import get_db
-from ..models import ProductCategory, Product, ProductReview, Order, OrderItem, OrderStatus, User
-from ..services import auth_service
+from ..database import get_db, get_read_db
+from ..models import ProductCategory, Product, ProductReview, Order, OrderItem, OrderStatus
+from ..services import auth_service, autocomplete_service, order_service, reservation_service, review_service, search_service
+from ..utils import cache_utils, http_cache_utils, i18n_utils, pagination_utils, serialization_utils
 
 router = APIRouter()
 
@@ -71,6 +74,16 @@ class ProductUpdate(BaseModel):
     size: Optional[str] = None
     size_ar: Optional[str] = None
 
+class ProductCategoryEnum(str, Enum):
+    INDOOR_PLANTS = "indoor_plants"
+    OUTDOOR_PLANTS = "outdoor_plants"
+    SEEDS = "seeds"
+    POTS = "pots"
+    SOIL = "soil"
+    FERTILIZERS = "fertilizers"
+    TOOLS = "tools"
+    ACCESSORIES = "accessories"
+
 class ProductResponse(ProductBase):
     id: str
     image_url: Optional[str] = None
@@ -78,7 +91,8 @@ class ProductResponse(ProductBase):
     review_count: int = 0
     created_at: datetime
     updated_at: Optional[datetime] = None
-    category: CategoryResponse
+    # Products store their category as a value, not a row of a categories table
+    category: ProductCategoryEnum
     
     class Config:
         orm_mode = True
@@ -133,6 +147,7 @@ class OrderBase(BaseModel):
 
 class OrderCreate(OrderBase):
     items: List[OrderItemCreate]
+    reservation_id: Optional[str] = None
 
 class OrderUpdate(BaseModel):
     status: OrderStatusEnum
@@ -149,13 +164,45 @@ class OrderResponse(OrderBase):
     class Config:
         orm_mode = True
 
+class ReservationCreate(BaseModel):
+    items: List[OrderItemCreate]
+
+class ReservationResponse(BaseModel):
+    id: str
+    items: List[OrderItemBase]
+    expires_at: datetime
+
+class CartValidationRequest(BaseModel):
+    items: List[OrderItemCreate]
+    reservation_id: Optional[str] = None
+
+class CartLineResponse(OrderItemBase):
+    found: bool
+    available: bool
+    price: Optional[float] = None
+    available_quantity: int
+    stock_sufficient: bool
+    line_total: float
+
+class CartValidationResponse(BaseModel):
+    items: List[CartLineResponse]
+    total: float
+    all_available: bool
+
+# Loader options for the relationships serialized by OrderResponse: one
+# query for the items of every order on the page, joined to their products
+ORDER_RESPONSE_LOADERS = (selectinload(Order.items).joinedload(OrderItem.product),)
+
+# Categories change rarely; serialized responses are cached per worker
+category_cache = cache_utils.TTLCache("categories")
+
 # Routes
 # Categories
 @router.post("/categories", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
 async def create_category(
     category: CategoryCreate,
-    current_user: User = Depends(auth_service.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_admin_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Create new category
     db_category = ProductCategory(
@@ -164,8 +211,9 @@ async def create_category(
     )
     
     db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    await db.commit()
+    await db.refresh(db_category)
+    await category_cache.invalidate()
     
     return db_category
 
@@ -173,17 +221,28 @@ async def create_category(
 async def get_categories(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    language: str = Depends(i18n_utils.get_response_language),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    categories = db.query(ProductCategory).offset(skip).limit(limit).all()
-    return categories
+    async def load():
+        result = await db.execute(select(ProductCategory).offset(skip).limit(limit))
+        return [CategoryResponse.from_orm(category).dict() for category in result.scalars().all()]
+    
+    categories = await category_cache.get_or_load(("list", skip, limit), load)
+    return i18n_utils.localized_response(categories, CategoryResponse, language)
 
 @router.get("/categories/{category_id}", response_model=CategoryResponse)
 async def get_category(
     category_id: str,
-    db: Session = Depends(get_db)
+    language: str = Depends(i18n_utils.get_response_language),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    category = db.query(ProductCategory).filter(ProductCategory.id == category_id).first()
+    async def load():
+        result = await db.execute(select(ProductCategory).filter(ProductCategory.id == category_id))
+        category = result.scalars().first()
+        return CategoryResponse.from_orm(category).dict() if category else None
+    
+    category = await category_cache.get_or_load(("id", category_id), load)
     
     if not category:
         raise HTTPException(
@@ -191,17 +250,18 @@ async def get_category(
             detail="Category not found"
         )
     
-    return category
+    return i18n_utils.localized_response(category, CategoryResponse, language)
 
 # Products
 @router.post("/products", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
 async def create_product(
     product: ProductCreate,
-    current_user: User = Depends(auth_service.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_admin_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if category exists
-    category = db.query(ProductCategory).filter(ProductCategory.id == product.category_id).first()
+    result = await db.execute(select(ProductCategory).filter(ProductCategory.id == product.category_id))
+    category = result.scalars().first()
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -215,24 +275,31 @@ async def create_product(
     )
     
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    await search_service.index_product(db, db_product)
+    await db.commit()
+    await db.refresh(db_product)
+    autocomplete_service.index_product(db_product)
     
     return db_product
 
 @router.get("/products", response_model=List[ProductResponse])
 async def get_products(
+    response: Response,
+    language: str = Depends(i18n_utils.get_response_language),
+    fields: Optional[FrozenSet[str]] = Depends(serialization_utils.field_selector(ProductResponse)),
     category_id: Optional[str] = None,
     is_plant: Optional[bool] = None,
     search: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    skip: int = 0,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
 ):
     # Build query
-    query = db.query(Product).filter(Product.is_deleted == False)
+    query = select(Product).filter(Product.is_deleted == False)
     
     # Apply filters
     if category_id:
@@ -241,15 +308,12 @@ async def get_products(
     if is_plant is not None:
         query = query.filter(Product.is_plant == is_plant)
     
+    # Full-text search, ordered by relevance instead of recency
+    key_columns = [Product.created_at, Product.id]
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            (Product.name.ilike(search_term)) |
-            (Product.name_ar.ilike(search_term)) |
-            (Product.description.ilike(search_term)) |
-            (Product.description_ar.ilike(search_term)) |
-            (Product.latin_name.ilike(search_term))
-        )
+        query, rank = search_service.search_products(query, Product.id, search)
+        if rank is not None:
+            key_columns = [rank, Product.id]
     
     if min_price is not None:
         query = query.filter(Product.price >= min_price)
@@ -257,20 +321,50 @@ async def get_products(
     if max_price is not None:
         query = query.filter(Product.price <= max_price)
     
+    # Answer 304 if nothing in the result set changed, before loading it
+    etag = await http_cache_utils.collection_validators(
+        db, query, Product,
+        category_id, is_plant, search, min_price, max_price, cursor, skip, limit, language,
+        serialization_utils.fieldset_key(fields)
+    )
+    if http_cache_utils.etag_matches(if_none_match, etag):
+        return http_cache_utils.not_modified_response(etag, cache_control=http_cache_utils.CATALOG_CACHE_CONTROL, vary=i18n_utils.LANGUAGE_VARY)
+    http_cache_utils.set_cache_headers(response, etag, cache_control=http_cache_utils.CATALOG_CACHE_CONTROL)
+    
+    # A sparse fieldset selects just its columns straight into dicts
+    if fields is not None:
+        projection = serialization_utils.get_projection(Product, ProductResponse, fields)
+        rows = await pagination_utils.paginate_rows(
+            db, projection.project(query), key_columns, response,
+            cursor=cursor, skip=skip, limit=limit
+        )
+        return i18n_utils.localized_response(projection.to_dicts(rows), ProductResponse, language, response, fields=fields)
+    
     # Get products
-    products = query.offset(skip).limit(limit).all()
+    products = await pagination_utils.paginate(
+        db, query, key_columns, response,
+        cursor=cursor, skip=skip, limit=limit
+    )
     
-    return products
+    return i18n_utils.localized_response(products, ProductResponse, language, response)
 
 @router.get("/products/{product_id}", response_model=ProductResponse)
 async def get_product(
     product_id: str,
-    db: Session = Depends(get_db)
+    response: Response,
+    language: str = Depends(i18n_utils.get_response_language),
+    fields: Optional[FrozenSet[str]] = Depends(serialization_utils.field_selector(ProductResponse)),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    product = db.query(Product).filter(
-        Product.id == product_id,
-        Product.is_deleted == False
-    ).first()
+    result = await db.execute(
+        select(Product).filter(
+            Product.id == product_id,
+            Product.is_deleted == False
+        )
+    )
+    product = result.scalars().first()
     
     if not product:
         raise HTTPException(
@@ -278,20 +372,28 @@ async def get_product(
             detail="Product not found"
         )
     
-    return product
+    etag, last_modified = http_cache_utils.entity_validators(product, language, serialization_utils.fieldset_key(fields))
+    if http_cache_utils.is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+        return http_cache_utils.not_modified_response(etag, last_modified, http_cache_utils.CATALOG_CACHE_CONTROL, i18n_utils.LANGUAGE_VARY)
+    http_cache_utils.set_cache_headers(response, etag, last_modified, http_cache_utils.CATALOG_CACHE_CONTROL)
+    
+    return i18n_utils.localized_response(product, ProductResponse, language, response, fields=fields)
 
 @router.put("/products/{product_id}", response_model=ProductResponse)
 async def update_product(
     product_id: str,
     product_update: ProductUpdate,
-    current_user: User = Depends(auth_service.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_admin_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Get product
-    product = db.query(Product).filter(
-        Product.id == product_id,
-        Product.is_deleted == False
-    ).first()
+    result = await db.execute(
+        select(Product).filter(
+            Product.id == product_id,
+            Product.is_deleted == False
+        )
+    )
+    product = result.scalars().first()
     
     if not product:
         raise HTTPException(
@@ -301,7 +403,8 @@ async def update_product(
     
     # Check if category exists if provided
     if product_update.category_id:
-        category = db.query(ProductCategory).filter(ProductCategory.id == product_update.category_id).first()
+        result = await db.execute(select(ProductCategory).filter(ProductCategory.id == product_update.category_id))
+        category = result.scalars().first()
         if not category:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -313,22 +416,27 @@ async def update_product(
     for key, value in update_data.items():
         setattr(product, key, value)
     
-    db.commit()
-    db.refresh(product)
+    await search_service.index_product(db, product)
+    await db.commit()
+    await db.refresh(product)
+    autocomplete_service.index_product(product)
     
     return product
 
 @router.delete("/products/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_product(
     product_id: str,
-    current_user: User = Depends(auth_service.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_admin_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Get product
-    product = db.query(Product).filter(
-        Product.id == product_id,
-        Product.is_deleted == False
-    ).first()
+    result = await db.execute(
+        select(Product).filter(
+            Product.id == product_id,
+            Product.is_deleted == False
+        )
+    )
+    product = result.scalars().first()
     
     if not product:
         raise HTTPException(
@@ -338,7 +446,9 @@ async def delete_product(
     
     # Soft delete
     product.is_deleted = True
-    db.commit()
+    await search_service.remove_product(db, product.id)
+    await db.commit()
+    autocomplete_service.remove_product(product.id)
     
     return None
 
@@ -346,14 +456,17 @@ async def delete_product(
 async def upload_product_image(
     product_id: str,
     file: UploadFile = File(...),
-    current_user: User = Depends(auth_service.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_admin_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Get product
-    product = db.query(Product).filter(
-        Product.id == product_id,
-        Product.is_deleted == False
-    ).first()
+    result = await db.execute(
+        select(Product).filter(
+            Product.id == product_id,
+            Product.is_deleted == False
+        )
+    )
+    product = result.scalars().first()
     
     if not product:
         raise HTTPException(
@@ -372,8 +485,8 @@ async def upload_product_image(
     # and update the product's image_url with the URL of the uploaded file
     # For now, we'll just update with a placeholder URL
     product.image_url = f"/uploads/products/{product_id}/{file.filename}"
-    db.commit()
-    db.refresh(product)
+    await db.commit()
+    await db.refresh(product)
     
     return product
 
@@ -381,14 +494,17 @@ async def upload_product_image(
 @router.post("/reviews", response_model=ReviewResponse, status_code=status.HTTP_201_CREATED)
 async def create_review(
     review: ReviewCreate,
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if product exists
-    product = db.query(Product).filter(
-        Product.id == review.product_id,
-        Product.is_deleted == False
-    ).first()
+    result = await db.execute(
+        select(Product).filter(
+            Product.id == review.product_id,
+            Product.is_deleted == False
+        )
+    )
+    product = result.scalars().first()
     
     if not product:
         raise HTTPException(
@@ -397,10 +513,13 @@ async def create_review(
         )
     
     # Check if user has already reviewed this product
-    existing_review = db.query(ProductReview).filter(
-        ProductReview.product_id == review.product_id,
-        ProductReview.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(ProductReview.id).filter(
+            ProductReview.product_id == review.product_id,
+            ProductReview.user_id == current_user.id
+        )
+    )
+    existing_review = result.first()
     
     if existing_review:
         raise HTTPException(
@@ -416,30 +535,38 @@ async def create_review(
     )
     
     db.add(db_review)
-    db.commit()
-    db.refresh(db_review)
     
-    # Update product's average rating
-    product_reviews = db.query(ProductReview).filter(ProductReview.product_id == product.id).all()
-    total_rating = sum(r.rating for r in product_reviews)
-    product.average_rating = total_rating / len(product_reviews)
-    product.review_count = len(product_reviews)
-    db.commit()
+    # Update product's rating aggregates in the same transaction
+    await review_service.add_review_to_aggregates(db, product.id, review.rating)
+    await db.commit()
+    await db.refresh(db_review)
     
     return db_review
 
+@router.post("/reviews/reconcile")
+async def reconcile_review_aggregates(
+    current_user: auth_service.Principal = Depends(auth_service.get_current_admin_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    return await review_service.reconcile_review_aggregates(db)
+
 @router.get("/products/{product_id}/reviews", response_model=List[ReviewResponse])
 async def get_product_reviews(
     product_id: str,
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     # Check if product exists
-    product = db.query(Product).filter(
-        Product.id == product_id,
-        Product.is_deleted == False
-    ).first()
+    result = await db.execute(
+        select(Product.id).filter(
+            Product.id == product_id,
+            Product.is_deleted == False
+        )
+    )
+    product = result.first()
     
     if not product:
         raise HTTPException(
@@ -448,18 +575,48 @@ async def get_product_reviews(
         )
     
     # Get reviews
-    reviews = db.query(ProductReview).filter(
-        ProductReview.product_id == product_id
-    ).order_by(ProductReview.created_at.desc()).offset(skip).limit(limit).all()
+    query = select(ProductReview).filter(ProductReview.product_id == product_id)
+    reviews = await pagination_utils.paginate(
+        db, query, [ProductReview.created_at, ProductReview.id], response,
+        cursor=cursor, skip=skip, limit=limit
+    )
     
     return reviews
 
+# Cart
+@router.post("/cart/validate", response_model=CartValidationResponse)
+async def validate_cart(
+    cart: CartValidationRequest,
+    response: Response,
+    current_user: Optional[auth_service.Principal] = Depends(auth_service.get_optional_principal),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # Stock held by the cart's own reservation counts as available to it;
+    # someone else's reservation (or any, when anonymous) counts as not found
+    quantities = order_service.merge_quantities(cart.items)
+    reservation = None
+    if cart.reservation_id and current_user:
+        reservation = await reservation_service.find_user_reservation(cart.reservation_id, current_user.id)
+    result = await order_service.validate_cart(
+        db, quantities,
+        reserved=await reservation_service.held_by_others(quantities, reservation)
+    )
+    
+    # Unchanged since the client's last validation
+    etag = http_cache_utils.compute_etag(result)
+    if http_cache_utils.etag_matches(if_none_match, etag):
+        return http_cache_utils.not_modified_response(etag)
+    
+    response.headers["ETag"] = etag
+    return result
+
 # Orders
 @router.post("/orders", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order: OrderCreate,
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if order has items
     if not order.items or len(order.items) == 0:
@@ -468,96 +625,110 @@ async def create_order(
             detail="Order must have at least one item"
         )
     
-    # Create new order
-    order_id = str(uuid.uuid4())
-    db_order = Order(
-        id=order_id,
-        user_id=current_user.id,
-        status=OrderStatus.PENDING,
-        total_amount=0,  # Will be calculated below
-        **order.dict(exclude={"items"})
-    )
+    quantities = order_service.merge_quantities(order.items)
     
-    db.add(db_order)
+    # Take the reservation holding stock for this cart, if any, so that no
+    # other order can use it while this one is placed
+    reservation = None
+    if order.reservation_id:
+        reservation = await reservation_service.claim_user_reservation(order.reservation_id, current_user.id)
     
-    # Create order items and calculate total
-    total_amount = 0
-    for item in order.items:
-        # Get product
-        product = db.query(Product).filter(
-            Product.id == item.product_id,
-            Product.is_deleted == False
-        ).first()
-        
-        if not product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Product with ID {item.product_id} not found"
-            )
-        
-        # Check stock
-        if product.stock_quantity < item.quantity:
+    try:
+        if reservation and reservation.quantities != quantities:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Not enough stock for product {product.name}. Available: {product.stock_quantity}"
+                detail="Order items do not match the reservation"
             )
         
-        # Create order item
-        order_item = OrderItem(
-            id=str(uuid.uuid4()),
-            order_id=order_id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price_per_unit=product.price
+        # Load and lock every ordered product in one query
+        products = await order_service.lock_products(db, list(quantities))
+        
+        # Take the items out of stock atomically (fails instead of overselling),
+        # leaving stock held for other carts untouched
+        await order_service.decrement_stock(
+            db, products, quantities,
+            reserved=await reservation_service.held_by_others(quantities, reservation)
         )
         
-        db.add(order_item)
+        # Create new order
+        order_id = str(uuid.uuid4())
+        db_order = Order(
+            id=order_id,
+            user_id=current_user.id,
+            status=OrderStatus.PENDING,
+            total_amount=0,  # Will be calculated below
+            shipping_address=order.shipping_address,
+            shipping_city=order.shipping_city,
+            shipping_country=order.shipping_country,
+            shipping_postal_code=order.shipping_postal_code,
+            contact_phone=order.contact_phone,
+            notes=order.notes
+        )
         
-        # Update product stock
-        product.stock_quantity -= item.quantity
+        db.add(db_order)
+        await db.flush()
         
-        # Add to total
-        total_amount += product.price * item.quantity
-    
-    # Update order total
-    db_order.total_amount = total_amount
-    
-    db.commit()
-    db.refresh(db_order)
+        # Create all order items in one insert and calculate total
+        db_order.total_amount = await order_service.insert_order_items(db, order_id, products, quantities)
+        
+        await db.commit()
+    except BaseException:
+        # Nothing was sold, so the cart keeps its hold
+        if reservation:
+            await reservation_service.store.unclaim(reservation.id)
+        raise
+    
+    # The reserved stock is now sold
+    if reservation:
+        await reservation_service.store.release(reservation.id)
+    
+    result = await db.execute(
+        select(Order).options(*ORDER_RESPONSE_LOADERS).filter(
+            Order.id == order_id
+        ).execution_options(populate_existing=True)
+    )
     
-    return db_order
+    return result.scalars().one()
 
 @router.get("/orders", response_model=List[OrderResponse])
 async def get_orders(
-    current_user: User = Depends(auth_service.get_current_user),
+    response: Response,
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
     status: Optional[OrderStatusEnum] = None,
-    skip: int = 0,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     # Build query
-    query = db.query(Order).filter(Order.user_id == current_user.id)
+    query = select(Order).options(*ORDER_RESPONSE_LOADERS).filter(Order.user_id == current_user.id)
     
     # Filter by status if provided
     if status:
         query = query.filter(Order.status == status)
     
     # Get orders
-    orders = query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
+    orders = await pagination_utils.paginate(
+        db, query, [Order.created_at, Order.id], response,
+        cursor=cursor, skip=skip, limit=limit
+    )
     
     return orders
 
 @router.get("/orders/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: str,
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    db: AsyncSession = Depends(get_read_db)
 ):
     # Get order
-    order = db.query(Order).filter(
-        Order.id == order_id,
-        Order.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Order).options(*ORDER_RESPONSE_LOADERS).filter(
+            Order.id == order_id,
+            Order.user_id == current_user.id
+        )
+    )
+    order = result.scalars().first()
     
     if not order:
         raise HTTPException(
@@ -571,11 +742,14 @@ async def get_order(
 async def update_order_status(
     order_id: str,
     order_update: OrderUpdate,
-    current_user: User = Depends(auth_service.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_admin_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Get order
-    order = db.query(Order).filter(Order.id == order_id).first()
+    result = await db.execute(
+        select(Order).options(*ORDER_RESPONSE_LOADERS).filter(Order.id == order_id)
+    )
+    order = result.scalars().first()
     
     if not order:
         raise HTTPException(
@@ -585,22 +759,25 @@ async def update_order_status(
     
     # Update status
     order.status = order_update.status
-    db.commit()
-    db.refresh(order)
+    await db.commit()
+    await db.refresh(order, ["status", "updated_at"])
     
     return order
 
 @router.delete("/orders/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def cancel_order(
     order_id: str,
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Get order
-    order = db.query(Order).filter(
-        Order.id == order_id,
-        Order.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Order).options(selectinload(Order.items)).filter(
+            Order.id == order_id,
+            Order.user_id == current_user.id
+        )
+    )
+    order = result.scalars().first()
     
     if not order:
         raise HTTPException(
@@ -619,11 +796,43 @@ async def cancel_order(
     order.status = OrderStatus.CANCELLED
     
     # Restore product stock
-    for item in order.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product:
-            product.stock_quantity += item.quantity
+    await order_service.restore_stock(db, order_service.merge_quantities(order.items))
     
-    db.commit()
+    await db.commit()
     
-    return None
\ No newline at end of file
+    return None
+
+# Reservations
+@router.post("/reservations", response_model=ReservationResponse, status_code=status.HTTP_201_CREATED)
+async def create_reservation(
+    reservation: ReservationCreate,
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    # Check if reservation has items
+    if not reservation.items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Reservation must have at least one item"
+        )
+    
+    # Hold the stock for the cart
+    quantities = order_service.merge_quantities(reservation.items)
+    held = await reservation_service.create_reservation(db, current_user.id, quantities)
+    
+    return {
+        "id": held.id,
+        "items": [{"product_id": product_id, "quantity": quantity} for product_id, quantity in held.quantities.items()],
+        "expires_at": held.expires_at
+    }
+
+@router.delete("/reservations/{reservation_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def release_reservation(
+    reservation_id: str,
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal)
+):
+    # Give the held stock back
+    reservation = await reservation_service.get_user_reservation(reservation_id, current_user.id)
+    await reservation_service.store.release(reservation.id)
+    
+    return None
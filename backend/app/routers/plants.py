@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status, UploadFile, File, Response
+from sqlalchemy import null, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import FrozenSet, List, Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 import uuid
 
-from ..database import get_db
-from ..models import Plant, PlantType, WateringHistory, User
-from ..services import auth_service
+from ..database import get_db, get_read_db
+from ..models import Plant, PlantType, WateringHistory
+from ..services import auth_service, autocomplete_service
+from ..utils import cache_utils, http_cache_utils, i18n_utils, pagination_utils, serialization_utils
 
 router = APIRouter()
 
@@ -106,16 +109,32 @@ class PlantResponse(PlantBase):
     class Config:
         orm_mode = True
 
+# Plant types change rarely; serialized responses are cached per worker
+plant_type_cache = cache_utils.TTLCache("plant_types")
+
+# Loader options for the relationships serialized by PlantResponse
+PLANT_RESPONSE_LOADERS = (joinedload(Plant.plant_type),)
+
+async def load_plant_response(db: AsyncSession, plant_id: str) -> Plant:
+    """Reload a plant with everything PlantResponse needs in one query"""
+    result = await db.execute(
+        select(Plant).options(*PLANT_RESPONSE_LOADERS).filter(
+            Plant.id == plant_id
+        ).execution_options(populate_existing=True)
+    )
+    return result.scalars().one()
+
 # Routes
 @router.post("/", response_model=PlantResponse, status_code=status.HTTP_201_CREATED)
 async def create_plant(
     plant: PlantCreate, 
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if plant type exists if provided
     if plant.plant_type_id:
-        plant_type = db.query(PlantType).filter(PlantType.id == plant.plant_type_id).first()
+        result = await db.execute(select(PlantType).filter(PlantType.id == plant.plant_type_id))
+        plant_type = result.scalars().first()
         if not plant_type:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -134,58 +153,162 @@ async def create_plant(
         db_plant.next_watering_date = datetime.now() + timedelta(days=db_plant.watering_interval_days)
     
     db.add(db_plant)
-    db.commit()
-    db.refresh(db_plant)
+    await db.commit()
+    autocomplete_service.index_plant(db_plant)
     
-    return db_plant
+    return await load_plant_response(db, db_plant.id)
 
 @router.get("/", response_model=List[PlantResponse])
 async def get_plants(
-    current_user: User = Depends(auth_service.get_current_user),
-    skip: int = 0,
+    response: Response,
+    language: str = Depends(i18n_utils.get_response_language),
+    fields: Optional[FrozenSet[str]] = Depends(serialization_utils.field_selector(PlantResponse)),
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
 ):
-    plants = db.query(Plant).filter(
+    query = select(Plant).filter(
         Plant.owner_id == current_user.id,
         Plant.is_deleted == False
-    ).offset(skip).limit(limit).all()
+    )
+    
+    # Answer 304 if none of the user's plants (or their plant types) changed, before loading them
+    etag = await http_cache_utils.collection_validators(
+        db, query, Plant, current_user.id, cursor, skip, limit, language, serialization_utils.fieldset_key(fields),
+        related=[(PlantType, Plant.plant_type_id == PlantType.id)]
+    )
+    if http_cache_utils.etag_matches(if_none_match, etag):
+        return http_cache_utils.not_modified_response(etag, cache_control=http_cache_utils.PRIVATE_CACHE_CONTROL, vary=i18n_utils.LANGUAGE_VARY)
+    http_cache_utils.set_cache_headers(response, etag, cache_control=http_cache_utils.PRIVATE_CACHE_CONTROL)
+    
+    # Select just the requested response columns (plant type outer joined
+    # only if requested) straight into dicts
+    projection = serialization_utils.get_projection(Plant, PlantResponse, fields)
+    rows = await pagination_utils.paginate_rows(
+        db, projection.project(query), [Plant.created_at, Plant.id], response,
+        cursor=cursor, skip=skip, limit=limit
+    )
+    
+    return i18n_utils.localized_response(projection.to_dicts(rows), PlantResponse, language, response, fields=fields)
+
+# Plant Types routes
+@router.post("/types", response_model=PlantTypeResponse, status_code=status.HTTP_201_CREATED)
+async def create_plant_type(
+    plant_type: PlantTypeCreate,
+    current_user: auth_service.Principal = Depends(auth_service.get_current_admin_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    # Create new plant type
+    db_plant_type = PlantType(
+        id=str(uuid.uuid4()),
+        **plant_type.dict()
+    )
+    
+    db.add(db_plant_type)
+    await db.commit()
+    await db.refresh(db_plant_type)
+    autocomplete_service.index_plant_type(db_plant_type)
+    await plant_type_cache.invalidate()
+    
+    return db_plant_type
+
+@router.get("/types", response_model=List[PlantTypeResponse])
+async def get_plant_types(
+    skip: int = 0,
+    limit: int = 100,
+    language: str = Depends(i18n_utils.get_response_language),
+    db: AsyncSession = Depends(get_read_db)
+):
+    async def load():
+        result = await db.execute(select(PlantType).offset(skip).limit(limit))
+        return [PlantTypeResponse.from_orm(plant_type).dict() for plant_type in result.scalars().all()]
     
-    return plants
+    plant_types = await plant_type_cache.get_or_load(("list", skip, limit), load)
+    return i18n_utils.localized_response(plant_types, PlantTypeResponse, language)
+
+@router.get("/types/{plant_type_id}", response_model=PlantTypeResponse)
+async def get_plant_type(
+    plant_type_id: str,
+    language: str = Depends(i18n_utils.get_response_language),
+    db: AsyncSession = Depends(get_read_db)
+):
+    async def load():
+        result = await db.execute(select(PlantType).filter(PlantType.id == plant_type_id))
+        plant_type = result.scalars().first()
+        return PlantTypeResponse.from_orm(plant_type).dict() if plant_type else None
+    
+    plant_type = await plant_type_cache.get_or_load(("id", plant_type_id), load)
+    
+    if not plant_type:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Plant type not found"
+        )
+    
+    return i18n_utils.localized_response(plant_type, PlantTypeResponse, language)
 
 @router.get("/{plant_id}", response_model=PlantResponse)
 async def get_plant(
     plant_id: str,
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    language: str = Depends(i18n_utils.get_response_language),
+    fields: Optional[FrozenSet[str]] = Depends(serialization_utils.field_selector(PlantResponse)),
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
 ):
-    plant = db.query(Plant).filter(
-        Plant.id == plant_id,
-        Plant.owner_id == current_user.id,
-        Plant.is_deleted == False
-    ).first()
+    # Select the requested columns plus the ones the validators need; the
+    # plant type is only joined (and only part of the ETag) when requested
+    projection = serialization_utils.get_projection(Plant, PlantResponse, fields)
+    plant_type_version = PlantType.version if fields is None or "plant_type" in fields else null()
+    result = await db.execute(
+        projection.project(
+            select(Plant).filter(
+                Plant.id == plant_id,
+                Plant.owner_id == current_user.id,
+                Plant.is_deleted == False
+            ),
+            Plant.id, Plant.version, Plant.created_at, Plant.updated_at, plant_type_version
+        )
+    )
+    row = result.first()
     
-    if not plant:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Plant not found"
         )
     
-    return plant
+    row_id, version, created_at, updated_at, type_version = row[len(projection.columns):]
+    etag, last_modified = http_cache_utils.row_validators(
+        row_id, version, created_at, updated_at, type_version, language, serialization_utils.fieldset_key(fields)
+    )
+    if http_cache_utils.is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+        return http_cache_utils.not_modified_response(etag, last_modified, http_cache_utils.PRIVATE_CACHE_CONTROL, i18n_utils.LANGUAGE_VARY)
+    http_cache_utils.set_cache_headers(response, etag, last_modified, http_cache_utils.PRIVATE_CACHE_CONTROL)
+    
+    return i18n_utils.localized_response(projection.to_dicts([row])[0], PlantResponse, language, response, fields=fields)
 
 @router.put("/{plant_id}", response_model=PlantResponse)
 async def update_plant(
     plant_id: str,
     plant_update: PlantUpdate,
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Get plant
-    plant = db.query(Plant).filter(
-        Plant.id == plant_id,
-        Plant.owner_id == current_user.id,
-        Plant.is_deleted == False
-    ).first()
+    result = await db.execute(
+        select(Plant).filter(
+            Plant.id == plant_id,
+            Plant.owner_id == current_user.id,
+            Plant.is_deleted == False
+        )
+    )
+    plant = result.scalars().first()
     
     if not plant:
         raise HTTPException(
@@ -195,7 +318,8 @@ async def update_plant(
     
     # Check if plant type exists if provided
     if plant_update.plant_type_id:
-        plant_type = db.query(PlantType).filter(PlantType.id == plant_update.plant_type_id).first()
+        result = await db.execute(select(PlantType).filter(PlantType.id == plant_update.plant_type_id))
+        plant_type = result.scalars().first()
         if not plant_type:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -211,23 +335,26 @@ async def update_plant(
     if plant_update.watering_interval_days is not None and plant.last_watered_date:
         plant.next_watering_date = plant.last_watered_date + timedelta(days=plant.watering_interval_days)
     
-    db.commit()
-    db.refresh(plant)
+    await db.commit()
+    autocomplete_service.index_plant(plant)
     
-    return plant
+    return await load_plant_response(db, plant.id)
 
 @router.delete("/{plant_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_plant(
     plant_id: str,
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Get plant
-    plant = db.query(Plant).filter(
-        Plant.id == plant_id,
-        Plant.owner_id == current_user.id,
-        Plant.is_deleted == False
-    ).first()
+    result = await db.execute(
+        select(Plant).filter(
+            Plant.id == plant_id,
+            Plant.owner_id == current_user.id,
+            Plant.is_deleted == False
+        )
+    )
+    plant = result.scalars().first()
     
     if not plant:
         raise HTTPException(
@@ -237,7 +364,8 @@ async def delete_plant(
     
     # Soft delete
     plant.is_deleted = True
-    db.commit()
+    await db.commit()
+    autocomplete_service.remove_plant(plant.id)
     
     return None
 
@@ -245,15 +373,18 @@ async def delete_plant(
 async def water_plant(
     plant_id: str,
     watering: WateringHistoryCreate,
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Get plant
-    plant = db.query(Plant).filter(
-        Plant.id == plant_id,
-        Plant.owner_id == current_user.id,
-        Plant.is_deleted == False
-    ).first()
+    result = await db.execute(
+        select(Plant).filter(
+            Plant.id == plant_id,
+            Plant.owner_id == current_user.id,
+            Plant.is_deleted == False
+        )
+    )
+    plant = result.scalars().first()
     
     if not plant:
         raise HTTPException(
@@ -274,25 +405,31 @@ async def water_plant(
     plant.next_watering_date = watering.watered_at + timedelta(days=plant.watering_interval_days)
     
     db.add(watering_history)
-    db.commit()
-    db.refresh(watering_history)
+    await db.commit()
+    await db.refresh(watering_history)
     
     return watering_history
 
 @router.get("/{plant_id}/watering-history", response_model=List[WateringHistoryResponse])
 async def get_watering_history(
     plant_id: str,
-    current_user: User = Depends(auth_service.get_current_user),
-    skip: int = 0,
+    response: Response,
+    fields: Optional[FrozenSet[str]] = Depends(serialization_utils.field_selector(WateringHistoryResponse)),
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     # Check if plant exists and belongs to user
-    plant = db.query(Plant).filter(
-        Plant.id == plant_id,
-        Plant.owner_id == current_user.id,
-        Plant.is_deleted == False
-    ).first()
+    result = await db.execute(
+        select(Plant.id).filter(
+            Plant.id == plant_id,
+            Plant.owner_id == current_user.id,
+            Plant.is_deleted == False
+        )
+    )
+    plant = result.first()
     
     if not plant:
         raise HTTPException(
@@ -301,25 +438,31 @@ async def get_watering_history(
         )
     
     # Get watering history
-    watering_history = db.query(WateringHistory).filter(
-        WateringHistory.plant_id == plant_id
-    ).order_by(WateringHistory.watered_at.desc()).offset(skip).limit(limit).all()
+    projection = serialization_utils.get_projection(WateringHistory, WateringHistoryResponse, fields)
+    query = select(WateringHistory).filter(WateringHistory.plant_id == plant_id)
+    rows = await pagination_utils.paginate_rows(
+        db, projection.project(query), [WateringHistory.watered_at, WateringHistory.id], response,
+        cursor=cursor, skip=skip, limit=limit
+    )
     
-    return watering_history
+    return serialization_utils.json_response(projection.to_dicts(rows), response)
 
 @router.post("/{plant_id}/upload-photo", response_model=PlantResponse)
 async def upload_plant_photo(
     plant_id: str,
     file: UploadFile = File(...),
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     # Get plant
-    plant = db.query(Plant).filter(
-        Plant.id == plant_id,
-        Plant.owner_id == current_user.id,
-        Plant.is_deleted == False
-    ).first()
+    result = await db.execute(
+        select(Plant).filter(
+            Plant.id == plant_id,
+            Plant.owner_id == current_user.id,
+            Plant.is_deleted == False
+        )
+    )
+    plant = result.scalars().first()
     
     if not plant:
         raise HTTPException(
@@ -340,50 +483,6 @@ async def upload_plant_photo(
     
     # Update plant's photo_url
     plant.photo_url = f"/uploads/plants/{plant_id}/{file.filename}"
-    db.commit()
-    db.refresh(plant)
-    
-    return plant
-
-# Plant Types routes
-@router.post("/types", response_model=PlantTypeResponse, status_code=status.HTTP_201_CREATED)
-async def create_plant_type(
-    plant_type: PlantTypeCreate,
-    current_user: User = Depends(auth_service.get_current_admin_user),
-    db: Session = Depends(get_db)
-):
-    # Create new plant type
-    db_plant_type = PlantType(
-        id=str(uuid.uuid4()),
-        **plant_type.dict()
-    )
-    
-    db.add(db_plant_type)
-    db.commit()
-    db.refresh(db_plant_type)
-    
-    return db_plant_type
-
-@router.get("/types", response_model=List[PlantTypeResponse])
-async def get_plant_types(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
-):
-    plant_types = db.query(PlantType).offset(skip).limit(limit).all()
-    return plant_types
-
-@router.get("/types/{plant_type_id}", response_model=PlantTypeResponse)
-async def get_plant_type(
-    plant_type_id: str,
-    db: Session = Depends(get_db)
-):
-    plant_type = db.query(PlantType).filter(PlantType.id == plant_type_id).first()
-    
-    if not plant_type:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Plant type not found"
-        )
+    await db.commit()
     
-    return plant_type
\ No newline at end of file
+    return await load_plant_response(db, plant.id)
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List, Optional
+from pydantic import BaseModel
+
+from ..services import auth_service, autocomplete_service
+
+router = APIRouter()
+
+# Pydantic models for request/response
+class SuggestionResponse(BaseModel):
+    type: str
+    id: Optional[str] = None
+    name: Optional[str] = None
+    name_ar: Optional[str] = None
+    latin_name: Optional[str] = None
+
+# Routes
+@router.get("/autocomplete", response_model=List[SuggestionResponse])
+async def autocomplete(
+    q: str = Query(..., min_length=1, max_length=100),
+    types: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+    current_user: Optional[auth_service.Principal] = Depends(auth_service.get_optional_principal)
+):
+    # Parse the comma-separated suggestion types
+    kinds = None
+    if types:
+        kinds = [kind.strip() for kind in types.split(",") if kind.strip()]
+        unknown = set(kinds) - {autocomplete_service.PRODUCT, autocomplete_service.PLANT_TYPE, autocomplete_service.PLANT_NAME}
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown suggestion types: {', '.join(sorted(unknown))}"
+            )
+    
+    # Plant names come from the caller's own plants only
+    if kinds and autocomplete_service.PLANT_NAME in kinds and current_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    
+    return autocomplete_service.suggest(q, limit=limit, kinds=kinds, user_id=current_user.id if current_user else None)
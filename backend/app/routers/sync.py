@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from pydantic import BaseModel
+
+from ..database import get_db
+from ..models import Diagnosis, Order, Plant, WateringHistory
+from ..services import auth_service, sync_service
+from ..utils import http_cache_utils, i18n_utils, serialization_utils
+from .diagnoses import DiagnosisResponse
+from .marketplace import ORDER_RESPONSE_LOADERS, OrderResponse
+from .plants import PlantResponse, WateringHistoryResponse
+
+router = APIRouter()
+
+# Pydantic models for request/response
+class SyncResponse(BaseModel):
+    plants: List[PlantResponse] = []
+    deleted_plants: List[str] = []
+    watering_history: List[WateringHistoryResponse] = []
+    diagnoses: List[DiagnosisResponse] = []
+    orders: List[OrderResponse] = []
+    watermark: str
+    has_more: bool = False
+
+# Routes
+@router.get("", response_model=SyncResponse)
+async def sync(
+    since: Optional[str] = None,
+    limit: int = Query(sync_service.SYNC_BATCH_SIZE, ge=1, le=sync_service.SYNC_BATCH_SIZE),
+    language: str = Depends(i18n_utils.get_response_language),
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    # The primary, not a replica: a lagging replica would move the watermark past unseen rows
+    db: AsyncSession = Depends(get_db)
+):
+    positions = sync_service.decode_watermark(since)
+    cutoff = await sync_service.settled_cutoff(db)
+    has_more = False
+
+    # Plants, with soft-deleted ones as tombstones (a first sync has nothing to delete)
+    projection = serialization_utils.compile_projection(Plant, PlantResponse)
+    query = select(Plant).filter(Plant.owner_id == current_user.id)
+    if positions["plants"] is None:
+        query = query.filter(Plant.is_deleted == False)
+    rows, positions["plants"], more = await sync_service.fetch_changes(
+        db, projection.project(query, Plant.is_deleted), Plant.updated_at, Plant.id,
+        positions["plants"], cutoff, limit
+    )
+    has_more |= more
+    items = projection.to_dicts(rows)
+    plants = [item for item, row in zip(items, rows) if not row[-1]]
+    deleted_plants = [item["id"] for item, row in zip(items, rows) if row[-1]]
+
+    # Watering entries of the user's plants, by when they were recorded
+    projection = serialization_utils.compile_projection(WateringHistory, WateringHistoryResponse)
+    query = select(WateringHistory).filter(
+        WateringHistory.plant_id.in_(select(Plant.id).filter(Plant.owner_id == current_user.id))
+    )
+    rows, positions["watering_history"], more = await sync_service.fetch_changes(
+        db, projection.project(query), WateringHistory.created_at, WateringHistory.id,
+        positions["watering_history"], cutoff, limit
+    )
+    has_more |= more
+    watering_history = projection.to_dicts(rows)
+
+    # Diagnoses and orders
+    rows, positions["diagnoses"], more = await sync_service.fetch_changes(
+        db, select(Diagnosis).filter(Diagnosis.user_id == current_user.id), Diagnosis.updated_at, Diagnosis.id,
+        positions["diagnoses"], cutoff, limit
+    )
+    has_more |= more
+    diagnoses = [DiagnosisResponse.from_orm(row[0]).dict() for row in rows]
+
+    rows, positions["orders"], more = await sync_service.fetch_changes(
+        db, select(Order).options(*ORDER_RESPONSE_LOADERS).filter(Order.user_id == current_user.id),
+        Order.updated_at, Order.id, positions["orders"], cutoff, limit
+    )
+    has_more |= more
+    orders = [OrderResponse.from_orm(row[0]).dict() for row in rows]
+
+    synced = serialization_utils.json_response({
+        "plants": i18n_utils.localize_response(plants, PlantResponse, language),
+        "deleted_plants": deleted_plants,
+        "watering_history": watering_history,
+        "diagnoses": i18n_utils.localize_response(diagnoses, DiagnosisResponse, language),
+        "orders": i18n_utils.localize_response(orders, OrderResponse, language),
+        "watermark": sync_service.encode_watermark(positions),
+        "has_more": has_more
+    })
+    synced.headers["Cache-Control"] = http_cache_utils.PRIVATE_CACHE_CONTROL
+    synced.headers["Content-Language"] = ", ".join(i18n_utils.SUPPORTED_LANGUAGES) if language == i18n_utils.ALL_LANGUAGES else language
+    synced.headers["Vary"] = i18n_utils.LANGUAGE_VARY
+    return synced
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime, timedelta
 import jwt
@@ -34,6 +35,14 @@ class UserUpdate(BaseModel):
     address: Optional[str] = None
     address_ar: Optional[str] = None
 
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str
+
+class UserAccessUpdate(BaseModel):
+    is_active: Optional[bool] = None
+    is_admin: Optional[bool] = None
+
 class UserResponse(UserBase):
     id: str
     is_active: bool
@@ -45,14 +54,27 @@ class UserResponse(UserBase):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: str
     token_type: str
     user: UserResponse
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class RefreshedToken(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str
+
+class RevokedTokens(BaseModel):
+    revoked: int
+
 # Routes
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     # Check if user with email already exists
-    db_user_email = db.query(User).filter(User.email == user.email).first()
+    result = await db.execute(select(User.id).filter(User.email == user.email))
+    db_user_email = result.first()
     if db_user_email:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -60,7 +82,8 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Check if user with username already exists
-    db_user_username = db.query(User).filter(User.username == user.username).first()
+    result = await db.execute(select(User.id).filter(User.username == user.username))
+    db_user_username = result.first()
     if db_user_username:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -68,7 +91,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = auth_service.get_password_hash(user.password)
+    hashed_password = await auth_service.get_password_hash_async(user.password)
     db_user = User(
         id=str(uuid.uuid4()),
         email=user.email,
@@ -82,15 +105,15 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     # Authenticate user
-    user = auth_service.authenticate_user(db, form_data.username, form_data.password)
+    user = await auth_service.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -98,25 +121,51 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Create access token
+    # Create access and refresh tokens
     access_token = auth_service.create_access_token(data={"sub": user.id})
+    refresh_token, _ = auth_service.issue_refresh_token(db, user.id)
+    await db.commit()
     
     return {
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "token_type": "bearer",
         "user": user
     }
 
+@router.post("/token/refresh", response_model=RefreshedToken)
+async def refresh_access_token(request: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    # Rotate the refresh token; no password check is needed
+    user_id, refresh_token = await auth_service.rotate_refresh_token(db, request.refresh_token)
+    
+    return {
+        "access_token": auth_service.create_access_token(data={"sub": user_id}),
+        "refresh_token": refresh_token,
+        "token_type": "bearer"
+    }
+
+@router.delete("/me/refresh-tokens", response_model=RevokedTokens)
+async def revoke_refresh_tokens(
+    current_user: auth_service.Principal = Depends(auth_service.get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    # Sign the user out of every device once their access tokens expire
+    revoked = await auth_service.revoke_user_refresh_tokens(db, current_user.id)
+    await db.commit()
+    
+    return {"revoked": revoked}
+
 @router.get("/me", response_model=UserResponse)
 async def read_users_me(current_user: User = Depends(auth_service.get_current_user)):
     return current_user
 
 @router.put("/me", response_model=UserResponse)
-async def update_user(user_update: UserUpdate, current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+async def update_user(user_update: UserUpdate, current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_db)):
     # Update user fields if provided
     if user_update.email is not None:
         # Check if email is already taken by another user
-        existing_user = db.query(User).filter(User.email == user_update.email).first()
+        result = await db.execute(select(User.id).filter(User.email == user_update.email))
+        existing_user = result.first()
         if existing_user and existing_user.id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -139,7 +188,53 @@ async def update_user(user_update: UserUpdate, current_user: User = Depends(auth
     if user_update.address_ar is not None:
         current_user.address_ar = user_update.address_ar
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
+    
+    # Tokens of this user resolve to a fresh principal from now on
+    await auth_service.invalidate_principal(current_user.id)
+    
+    return current_user
+
+@router.put("/me/password", status_code=status.HTTP_204_NO_CONTENT)
+async def change_password(password_change: PasswordChange, current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_db)):
+    if not await auth_service.verify_password_async(password_change.current_password, current_user.hashed_password):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Incorrect password"
+        )
+    
+    current_user.hashed_password = await auth_service.get_password_hash_async(password_change.new_password)
+    # Other devices must sign in again with the new password
+    await auth_service.revoke_user_refresh_tokens(db, current_user.id)
+    await db.commit()
+    await auth_service.invalidate_principal(current_user.id)
+    
+    return None
+
+@router.put("/{user_id}/access", response_model=UserResponse)
+async def update_user_access(
+    user_id: str,
+    access_update: UserAccessUpdate,
+    current_user: auth_service.Principal = Depends(auth_service.get_current_admin_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await db.execute(select(User).filter(User.id == user_id))
+    user = result.scalars().first()
+    
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    for key, value in access_update.dict(exclude_unset=True).items():
+        setattr(user, key, value)
+    
+    await db.commit()
+    await db.refresh(user)
+    
+    # The user's tokens carry the new flags from their next request on
+    await auth_service.invalidate_principal(user.id)
     
-    return current_user
\ No newline at end of file
+    return user
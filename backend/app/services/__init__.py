@@ -1,2 +1,8 @@
 from . import auth_service
-from . import diagnosis_service
\ No newline at end of file
+from . import diagnosis_service
+from . import search_service
+from . import autocomplete_service
+from . import review_service
+from . import order_service
+from . import reservation_service
+from . import sync_service
\ No newline at end of file
@@ -2,31 +2,76 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
 from pydantic import BaseModel
+import asyncio
+import hashlib
+import logging
 import os
+import secrets
+import time
+import uuid
 
 from ..database import get_db
-from ..models import User
+from ..models import User, RefreshToken
+from ..utils.cache_utils import TTLCache
+from ..utils.metrics_utils import metrics
+
+# Setup logging
+logger = logging.getLogger(__name__)
 
 # Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "hadeeqati_secret_key_for_development_only")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS", 30))
+
+# How long a verified token's principal is reused before the user row is read again
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.environ.get("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.environ.get("PRINCIPAL_CACHE_MAX_ENTRIES", 10000))
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt runs on its own threads so that a login does not stall the event
+# loop; beyond the workers, at most PASSWORD_HASH_MAX_QUEUE operations wait
+# and further ones are turned away with 503
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", 32))
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_pending = 0
+
+def _password_queued() -> int:
+    return max(_password_pending - PASSWORD_HASH_WORKERS, 0)
+
+metrics.register_gauge("password_hash.pending", lambda: _password_pending)
+metrics.register_gauge("password_hash.queued", _password_queued)
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login", auto_error=False)
 
 # Token model
 class TokenData(BaseModel):
     username: Optional[str] = None
     user_id: Optional[str] = None
 
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user's id and flags, without the ORM object"""
+    id: str
+    is_active: bool
+    is_admin: bool
+    expires_at: float  # Token expiry, seconds since the epoch
+
+# Verified token -> Principal
+principal_cache = TTLCache("principals", PRINCIPAL_CACHE_TTL_SECONDS, PRINCIPAL_CACHE_MAX_ENTRIES)
+
 # Functions
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -34,11 +79,43 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(User).filter(User.email == email).first()
+async def _run_password_operation(name: str, function, *args):
+    """Run a bcrypt operation on the password executor
+
+    Raises:
+        HTTPException: 503 if the executor's queue is full
+    """
+    global _password_pending
+    if _password_pending >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        metrics.increment("password_hash.rejected")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in requests, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    _password_pending += 1
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, function, *args)
+    finally:
+        _password_pending -= 1
+        metrics.observe(f"password_hash.{name}", time.perf_counter() - start)
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    """verify_password without blocking the event loop"""
+    return await _run_password_operation("verify", verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    """get_password_hash without blocking the event loop"""
+    return await _run_password_operation("hash", get_password_hash, password)
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    result = await db.execute(select(User).filter(User.email == email))
+    user = result.scalars().first()
     if not user:
         return False
-    if not verify_password(password, user.password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
     return user
 
@@ -52,26 +129,207 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def get_token_subject(token: str) -> Optional[str]:
+    """Return the user id an access token was issued for, or None if it is invalid
+
+    Only checks the signature and expiry; no database lookup.
+    """
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        token_data = TokenData(user_id=user_id)
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+# Refresh tokens
+def _hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _utc(value: datetime) -> datetime:
+    # SQLite hands timestamps back without a timezone; they are stored in UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def _refresh_token_exception():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def issue_refresh_token(db: AsyncSession, user_id: str, family_id: Optional[str] = None) -> Tuple[str, RefreshToken]:
+    """Create a refresh token; the caller commits
+
+    Only the SHA-256 of the token is stored, so a leaked table cannot be
+    replayed. The token itself is returned once to hand to the client.
+
+    Args:
+        db: The async database session
+        user_id: The user the token is issued to
+        family_id: The family of the token being rotated, or None for a new login
+
+    Returns:
+        The token and its row
+    """
+    token = secrets.token_urlsafe(32)
+    row = RefreshToken(
+        id=str(uuid.uuid4()),
+        token_hash=_hash_refresh_token(token),
+        family_id=family_id or str(uuid.uuid4()),
+        expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        user_id=user_id
+    )
+    db.add(row)
+    return token, row
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Tuple[str, str]:
+    """Exchange a refresh token for a new one, detecting reuse
+
+    Each refresh token can be used once. Presenting one that was already
+    rotated means it was copied, so the whole family (every token rotated
+    from the same login) is revoked and the legitimate client has to sign
+    in again. No password hashing is involved.
+
+    Args:
+        db: The async database session
+        token: The refresh token sent by the client
+
+    Returns:
+        The user id and the new refresh token
+
+    Raises:
+        HTTPException: 401 if the token is unknown, expired, reused or its user is inactive
+    """
+    result = await db.execute(
+        select(RefreshToken.id, RefreshToken.user_id, RefreshToken.family_id, RefreshToken.expires_at, RefreshToken.revoked_at, RefreshToken.replaced_by, User.is_active)
+        .join(User, User.id == RefreshToken.user_id)
+        .filter(RefreshToken.token_hash == _hash_refresh_token(token))
+    )
+    current = result.first()
+    if current is None:
+        raise _refresh_token_exception()
+    if current.revoked_at is not None:
+        # A rotated token coming back is reuse; a revoked one is just signed out
+        if current.replaced_by is not None:
+            await _revoke_reused_family(db, current.family_id, current.user_id)
+        raise _refresh_token_exception()
+    if _utc(current.expires_at) <= datetime.now(timezone.utc) or not current.is_active:
+        raise _refresh_token_exception()
+
+    new_token, new_row = issue_refresh_token(db, current.user_id, current.family_id)
+    # Only one of two concurrent rotations of the same token can win
+    rotated = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == current.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc), replaced_by=new_row.id)
+        .execution_options(synchronize_session=False)
+    )
+    if rotated.rowcount != 1:
+        await db.rollback()
+        await _revoke_reused_family(db, current.family_id, current.user_id)
+        raise _refresh_token_exception()
+
+    await db.commit()
+    metrics.increment("auth.refresh_tokens.rotated")
+    return current.user_id, new_token
+
+async def _revoke_reused_family(db: AsyncSession, family_id: str, user_id: str):
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    metrics.increment("auth.refresh_tokens.reused")
+    logger.warning("Refresh token reuse detected for user %s; revoked token family %s", user_id, family_id)
+
+async def revoke_user_refresh_tokens(db: AsyncSession, user_id: str) -> int:
+    """Revoke every active refresh token of a user with one UPDATE; the caller commits
+
+    Returns:
+        The number of tokens revoked
+    """
+    result = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    payload = _decode_token(token)
+    token_data = TokenData(user_id=payload["sub"])
     
-    user = db.query(User).filter(User.id == token_data.user_id).first()
+    result = await db.execute(select(User).filter(User.id == token_data.user_id))
+    user = result.scalars().first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
+    """Resolve the token to the user's id and flags
+
+    For routes that only need the user id and flags. A token seen within
+    PRINCIPAL_CACHE_TTL_SECONDS is answered from the principal cache
+    without decoding it again or touching the database; otherwise only
+    the id and flag columns are selected, so no User object is built.
+    """
+    principal = principal_cache.get(token)
+    if principal is not None and principal.expires_at > time.time():
+        return principal
+
+    payload = _decode_token(token)
+    result = await db.execute(
+        select(User.id, User.is_active, User.is_admin).filter(User.id == payload["sub"])
+    )
+    row = result.first()
+    if row is None:
+        raise _credentials_exception()
+
+    principal = Principal(
+        id=row.id,
+        is_active=bool(row.is_active),
+        is_admin=bool(row.is_admin),
+        expires_at=float(payload.get("exp", 0))
+    )
+    principal_cache.set(token, principal)
+    return principal
+
+async def get_optional_principal(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> Optional[Principal]:
+    """Like get_current_principal, but None for anonymous requests
+
+    For public routes that behave differently for a signed-in user. A
+    token that is sent but invalid is still rejected with 401.
+    """
+    if token is None:
+        return None
+    return await get_current_principal(token, db)
+
+async def invalidate_principal(user_id: str):
+    """Forget every cached token of a user after their account or flags change"""
+    await principal_cache.invalidate(where={"id": user_id})
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -83,4 +341,12 @@ async def get_current_admin_user(current_user: User = Depends(get_current_user))
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_current_admin_principal(principal: Principal = Depends(get_current_principal)):
+    if not principal.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return principal
\ No newline at end of file
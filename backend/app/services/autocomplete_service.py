@@ -0,0 +1,252 @@
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+import time
+
+from sqlalchemy import select
+
+from ..models import Plant, PlantType, Product
+from ..utils.i18n_utils import normalize_text
+from ..utils.metrics_utils import metrics
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Suggestion types
+PRODUCT = "product"
+PLANT_TYPE = "plant_type"
+PLANT_NAME = "plant_name"
+
+# Fields offered as suggestions for each entity, in display order
+PRODUCT_FIELDS = ("name", "name_ar", "latin_name")
+PLANT_TYPE_FIELDS = ("name", "name_ar")
+PLANT_NAME_FIELDS = ("plant_name", "plant_name_ar", "latin_name")
+
+class PrefixIndex:
+    """Sorted-array prefix index over normalized names
+
+    Every word position of every name is stored as a sorted key, so both
+    "monstera" and "deli" find "Monstera Deliciosa". A lookup is a binary
+    search to the first key >= the normalized prefix followed by a short
+    scan, so it stays in the microseconds for catalogs of this size.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, str, str]] = []  # (term, kind, entity id)
+        self._entries: Dict[Tuple[str, str], Tuple[List[Tuple[str, str, str]], Dict[str, Any]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _terms(names: Iterable[Optional[str]]) -> List[str]:
+        terms = set()
+        for name in names:
+            words = normalize_text(name).split()
+            for start in range(len(words)):
+                terms.add(" ".join(words[start:]))
+        return sorted(terms)
+
+    def _entry(self, kind: str, entity_id: str, names: Sequence[Optional[str]], payload: Dict[str, Any]):
+        keys = [(term, kind, entity_id) for term in self._terms(names)]
+        return keys, {"type": kind, **payload}
+
+    def add(self, kind: str, entity_id: str, names: Sequence[Optional[str]], payload: Dict[str, Any]):
+        """Add or replace one entity
+
+        Args:
+            kind: The suggestion type (e.g. 'product')
+            entity_id: Identifier of the entity within its kind
+            names: The names the entity can be found by
+            payload: The suggestion returned to clients
+        """
+        self.remove(kind, entity_id)
+        keys, suggestion = self._entry(kind, entity_id, names, payload)
+        for key in keys:
+            insort(self._keys, key)
+        self._entries[(kind, entity_id)] = (keys, suggestion)
+
+    def remove(self, kind: str, entity_id: str):
+        """Remove one entity if present"""
+        entry = self._entries.pop((kind, entity_id), None)
+        if entry is None:
+            return
+        for key in entry[0]:
+            position = bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                del self._keys[position]
+
+    def rebuild(self, entities: Iterable[Tuple[str, str, Sequence[Optional[str]], Dict[str, Any]]]):
+        """Replace the whole index, sorting once instead of inserting per key"""
+        keys, entries = [], {}
+        for kind, entity_id, names, payload in entities:
+            entity_keys, suggestion = self._entry(kind, entity_id, names, payload)
+            keys.extend(entity_keys)
+            entries[(kind, entity_id)] = (entity_keys, suggestion)
+        keys.sort()
+        self._keys, self._entries = keys, entries
+
+    def search(self, prefix: str, limit: int = 10, kinds: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Return up to limit suggestions whose names contain a word starting with prefix
+
+        Args:
+            prefix: The raw text typed by the user
+            limit: Maximum number of suggestions
+            kinds: Restrict suggestions to these types
+
+        Returns:
+            Suggestions in order of their matching name, so a name equal
+            to the prefix comes before the longer names it starts
+        """
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+
+        suggestions, seen = [], set()
+        position = bisect_left(self._keys, (prefix,))
+        while position < len(self._keys) and len(suggestions) < limit:
+            term, kind, entity_id = self._keys[position]
+            position += 1
+            if not term.startswith(prefix):
+                break
+            if (kinds and kind not in kinds) or (kind, entity_id) in seen:
+                continue
+            seen.add((kind, entity_id))
+            suggestions.append(self._entries[(kind, entity_id)][1])
+        return suggestions
+
+# Shared in-process catalog index (products and plant types). Each API
+# worker holds its own copy, built at startup and kept current by the
+# writes that worker handles.
+index = PrefixIndex()
+
+# Plant names are private to their owner, so each user gets a small index
+# of their own. A name is suggested once however many of the user's plants
+# carry it; the counts track when the last plant with a name goes.
+_plant_indexes: Dict[str, PrefixIndex] = {}
+_plant_name_keys: Dict[str, Tuple[str, str]] = {}  # plant id -> (owner id, name key)
+_plant_name_counts: Counter = Counter()  # (owner id, name key) -> plants
+
+def _fields(entity, fields: Sequence[str]) -> Dict[str, Any]:
+    return {field: getattr(entity, field, None) for field in fields}
+
+def _product_entity(product):
+    fields = _fields(product, PRODUCT_FIELDS)
+    return PRODUCT, product.id, list(fields.values()), {"id": product.id, **fields}
+
+def _plant_type_entity(plant_type):
+    fields = _fields(plant_type, PLANT_TYPE_FIELDS)
+    return PLANT_TYPE, plant_type.id, list(fields.values()), {"id": plant_type.id, **fields}
+
+def _plant_name_entity(key: str, plant):
+    # Plant names are reported with the same keys as the catalog entries
+    names = [getattr(plant, field, None) for field in PLANT_NAME_FIELDS]
+    return PLANT_NAME, key, names, {"id": None, **dict(zip(PRODUCT_FIELDS, names))}
+
+def index_product(product):
+    """Add or refresh a product after it is created or updated"""
+    index.add(*_product_entity(product))
+
+def remove_product(product_id: str):
+    index.remove(PRODUCT, product_id)
+
+def index_plant_type(plant_type):
+    """Add or refresh a plant type after it is created or updated"""
+    index.add(*_plant_type_entity(plant_type))
+
+def _count_plant(plant) -> Optional[Tuple[str, str]]:
+    """Record a plant's name under its owner; returns the (owner, name) key if it is new"""
+    key = normalize_text(plant.plant_name)
+    if not key or not plant.owner_id:
+        return None
+    owner_key = (plant.owner_id, key)
+    _plant_name_keys[plant.id] = owner_key
+    _plant_name_counts[owner_key] += 1
+    return owner_key if _plant_name_counts[owner_key] == 1 else None
+
+def index_plant(plant):
+    """Add or refresh the plant name of a user's plant"""
+    remove_plant(plant.id)
+    owner_key = _count_plant(plant)
+    if owner_key is not None:
+        _plant_indexes.setdefault(plant.owner_id, PrefixIndex()).add(*_plant_name_entity(owner_key[1], plant))
+
+def remove_plant(plant_id: str):
+    """Drop a plant's name once none of the owner's remaining plants uses it"""
+    owner_key = _plant_name_keys.pop(plant_id, None)
+    if owner_key is None:
+        return
+    _plant_name_counts[owner_key] -= 1
+    if _plant_name_counts[owner_key] <= 0:
+        del _plant_name_counts[owner_key]
+        owner_id, key = owner_key
+        plant_index = _plant_indexes.get(owner_id)
+        if plant_index is not None:
+            plant_index.remove(PLANT_NAME, key)
+            if not len(plant_index):
+                del _plant_indexes[owner_id]
+
+async def build_index(db):
+    """Load the catalog and rebuild the index from scratch
+
+    Args:
+        db: The async database session
+    """
+    start = time.perf_counter()
+
+    products = (await db.execute(select(Product).filter(Product.is_deleted == False))).scalars().all()
+    plant_types = (await db.execute(select(PlantType))).scalars().all()
+    plants = (await db.execute(
+        select(Plant.id, Plant.owner_id, *[getattr(Plant, field) for field in PLANT_NAME_FIELDS]).filter(Plant.is_deleted == False)
+    )).all()
+
+    _plant_name_keys.clear()
+    _plant_name_counts.clear()
+    plant_names: Dict[str, list] = {}
+    for plant in plants:
+        owner_key = _count_plant(plant)
+        if owner_key is not None:
+            plant_names.setdefault(plant.owner_id, []).append(_plant_name_entity(owner_key[1], plant))
+
+    index.rebuild(
+        [_product_entity(product) for product in products] +
+        [_plant_type_entity(plant_type) for plant_type in plant_types]
+    )
+    _plant_indexes.clear()
+    for owner_id, entities in plant_names.items():
+        _plant_indexes[owner_id] = PrefixIndex()
+        _plant_indexes[owner_id].rebuild(entities)
+    logger.info(
+        "Built autocomplete index with %d catalog entries and plant names of %d users in %.3fs",
+        len(index), len(_plant_indexes), time.perf_counter() - start
+    )
+
+def suggest(
+    prefix: str,
+    limit: int = 10,
+    kinds: Optional[Sequence[str]] = None,
+    user_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Answer an autocomplete query from the in-memory indexes
+
+    Args:
+        prefix: The raw text typed by the user
+        limit: Maximum number of suggestions
+        kinds: Restrict suggestions to these types
+        user_id: The signed-in user, whose own plant names are suggested
+            first; anonymous queries get catalog suggestions only
+
+    Returns:
+        The suggestions
+    """
+    start = time.perf_counter()
+    suggestions = []
+    plant_index = _plant_indexes.get(user_id) if user_id else None
+    if plant_index is not None and (not kinds or PLANT_NAME in kinds):
+        suggestions = plant_index.search(prefix, limit)
+    catalog_kinds = [kind for kind in (kinds or (PRODUCT, PLANT_TYPE)) if kind != PLANT_NAME]
+    if catalog_kinds and len(suggestions) < limit:
+        suggestions += index.search(prefix, limit - len(suggestions), catalog_kinds)
+    metrics.observe("autocomplete.lookup", time.perf_counter() - start)
+    return suggestions
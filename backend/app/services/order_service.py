@@ -0,0 +1,198 @@
+from fastapi import HTTPException, status
+from sqlalchemy import case, insert, select, update
+from typing import Dict, Iterable, List, Optional
+import uuid
+import logging
+
+from ..models import Product, OrderItem
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+def merge_quantities(items: Iterable) -> Dict[str, int]:
+    """Sum the requested quantity per product, in a stable (sorted) order
+
+    Args:
+        items: Order lines with product_id and quantity
+
+    Returns:
+        A mapping of product id to total quantity, sorted by product id
+    """
+    quantities: Dict[str, int] = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return dict(sorted(quantities.items()))
+
+async def lock_products(db, product_ids: List[str]) -> Dict[str, Product]:
+    """Load the ordered products in one query and lock their rows
+
+    Rows are locked in product id order so that concurrent checkouts of
+    overlapping baskets cannot deadlock. SQLite ignores FOR UPDATE and
+    relies on the conditional stock update below instead.
+
+    Raises:
+        HTTPException: If any product does not exist
+    """
+    result = await db.execute(
+        select(Product).filter(
+            Product.id.in_(product_ids),
+            Product.is_deleted == False
+        ).order_by(Product.id).with_for_update()
+    )
+    products = {product.id: product for product in result.scalars().all()}
+
+    for product_id in product_ids:
+        if product_id not in products:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with ID {product_id} not found"
+            )
+    return products
+
+def _stock_error(product_name: str, available: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Not enough stock for product {product_name}. Available: {available}"
+    )
+
+async def decrement_stock(
+    db,
+    products: Dict[str, Product],
+    quantities: Dict[str, int],
+    reserved: Optional[Dict[str, int]] = None
+):
+    """Take the ordered quantities out of stock, all or nothing
+
+    One UPDATE decrements every product, guarded by
+    stock_quantity >= quantity (plus any stock held for other carts), so
+    stock can never go negative even when checkouts race. If fewer rows
+    than products were updated, another checkout took the stock first and
+    the caller's transaction is rolled back.
+
+    Args:
+        db: The async database session
+        products: The locked products, by id
+        quantities: Quantity ordered per product id
+        reserved: Quantity held by other carts' reservations per product id
+
+    Raises:
+        HTTPException: If any product does not have enough stock
+    """
+    reserved = {product_id: held for product_id, held in (reserved or {}).items() if held > 0}
+    for product_id, quantity in quantities.items():
+        available = products[product_id].stock_quantity - reserved.get(product_id, 0)
+        if available < quantity:
+            raise _stock_error(products[product_id].name, max(available, 0))
+
+    quantity = case(quantities, value=Product.id)
+    required = quantity + case(reserved, value=Product.id, else_=0) if reserved else quantity
+    result = await db.execute(
+        update(Product)
+        .where(Product.id.in_(list(quantities)), Product.stock_quantity >= required)
+        .values(stock_quantity=Product.stock_quantity - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == len(quantities):
+        return
+
+    await db.rollback()
+    current = await db.execute(
+        select(Product.id, Product.name, Product.stock_quantity).filter(Product.id.in_(list(quantities)))
+    )
+    for product_id, name, stock_quantity in current.all():
+        available = stock_quantity - reserved.get(product_id, 0)
+        if available < quantities[product_id]:
+            raise _stock_error(name, max(available, 0))
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Stock changed during checkout, please retry"
+    )
+
+async def restore_stock(db, quantities: Dict[str, int]):
+    """Put quantities back into stock with a single relative UPDATE"""
+    if not quantities:
+        return
+    quantity = case(quantities, value=Product.id)
+    await db.execute(
+        update(Product)
+        .where(Product.id.in_(list(quantities)))
+        .values(stock_quantity=Product.stock_quantity + quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+async def insert_order_items(db, order_id: str, products: Dict[str, Product], quantities: Dict[str, int]) -> float:
+    """Insert every order line in one bulk INSERT
+
+    Returns:
+        The order total
+    """
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "order_id": order_id,
+            "product_id": product_id,
+            "quantity": quantity,
+            "unit_price": products[product_id].price,
+            "total_price": products[product_id].price * quantity
+        }
+        for product_id, quantity in quantities.items()
+    ]
+    await db.execute(insert(OrderItem), rows)
+    return sum(row["total_price"] for row in rows)
+
+async def validate_cart(db, quantities: Dict[str, int], reserved: Optional[Dict[str, int]] = None) -> dict:
+    """Check current price and stock for every cart line with one query
+
+    Args:
+        db: The async database session
+        quantities: Quantity in the cart per product id
+        reserved: Quantity held by other carts' reservations per product id
+
+    Returns:
+        The per-line results, the total of the available lines and whether
+        the whole cart can be ordered
+    """
+    reserved = reserved or {}
+    result = await db.execute(
+        select(Product.id, Product.price, Product.stock_quantity, Product.is_available).filter(
+            Product.id.in_(list(quantities)),
+            Product.is_deleted == False
+        )
+    )
+    products = {row.id: row for row in result.all()}
+
+    items = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            items.append({
+                "product_id": product_id,
+                "quantity": quantity,
+                "found": False,
+                "available": False,
+                "price": None,
+                "available_quantity": 0,
+                "stock_sufficient": False,
+                "line_total": 0.0
+            })
+            continue
+
+        available_quantity = max((product.stock_quantity or 0) - reserved.get(product_id, 0), 0)
+        stock_sufficient = available_quantity >= quantity
+        available = bool(product.is_available) and stock_sufficient
+        items.append({
+            "product_id": product_id,
+            "quantity": quantity,
+            "found": True,
+            "available": available,
+            "price": product.price,
+            "available_quantity": available_quantity,
+            "stock_sufficient": stock_sufficient,
+            "line_total": product.price * quantity if available else 0.0
+        })
+
+    return {
+        "items": items,
+        "total": sum(item["line_total"] for item in items),
+        "all_available": all(item["available"] for item in items)
+    }
@@ -0,0 +1,423 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import heapq
+import logging
+import os
+import time
+import uuid
+
+from ..models import Product
+from ..utils.metrics_utils import metrics
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# How long a cart's stock is held, and how often expired holds are released
+RESERVATION_TTL_MINUTES = float(os.environ.get("RESERVATION_TTL_MINUTES", 10))
+RESERVATION_SWEEP_SECONDS = float(os.environ.get("RESERVATION_SWEEP_SECONDS", 30))
+
+# Most holds one user may have at a time, so one account cannot hold all the stock
+RESERVATION_MAX_PER_USER = int(os.environ.get("RESERVATION_MAX_PER_USER", 5))
+
+# Compare-and-set attempts on a shared store key before giving up
+RESERVATION_MAX_ATTEMPTS = 10
+
+@dataclass
+class Reservation:
+    id: str
+    user_id: str
+    quantities: Dict[str, int]
+    expires_at: datetime
+    expires_monotonic: float
+    # Taken by an order being placed, so no other order can use it
+    claimed: bool = False
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_monotonic <= time.monotonic()
+
+class ReservationLimitReached(Exception):
+    """The user already holds the most reservations allowed"""
+
+_UNCHANGED = object()
+
+class MemoryReservationStore:
+    """In-process counter store for stock held by carts
+
+    Keeps a held-quantity counter per product next to the reservations
+    themselves. No method awaits anything, so each one is atomic on the
+    event loop and never touches the products row. Each worker keeps its
+    own counters; deployments with several workers swap in a
+    SharedReservationStore, which has the same methods.
+    """
+
+    def __init__(self):
+        self._reservations: Dict[str, Reservation] = {}
+        self._by_user: Dict[str, Set[str]] = {}
+        self._held: Dict[str, int] = {}
+        self._expiry: List[Tuple[float, str]] = []
+
+    async def held(self, product_id: str) -> int:
+        return self._held.get(product_id, 0)
+
+    async def active_count(self, user_id: str) -> int:
+        """Number of unexpired reservations held by a user"""
+        await self.release_expired()
+        return len(self._by_user.get(user_id, ()))
+
+    async def get(self, reservation_id: str) -> Optional[Reservation]:
+        reservation = self._reservations.get(reservation_id)
+        if reservation is None or reservation.expired:
+            return None
+        return reservation
+
+    async def reserve(self, user_id: str, quantities: Dict[str, int], stock: Dict[str, int], ttl_seconds: float, max_per_user: int) -> Reservation:
+        """Hold quantities of each product if enough unheld stock remains
+
+        Args:
+            user_id: The user the hold belongs to
+            quantities: Quantity to hold per product id
+            stock: Current stock per product id
+            ttl_seconds: How long the hold lasts
+            max_per_user: Most reservations the user may hold at once
+
+        Returns:
+            The new reservation
+
+        Raises:
+            ReservationLimitReached: If the user holds max_per_user reservations
+            ValueError: With the id of the first product that is short
+        """
+        await self.release_expired()
+        if len(self._by_user.get(user_id, ())) >= max_per_user:
+            raise ReservationLimitReached()
+        for product_id, quantity in quantities.items():
+            if stock[product_id] - self._held.get(product_id, 0) < quantity:
+                raise ValueError(product_id)
+
+        for product_id, quantity in quantities.items():
+            self._held[product_id] = self._held.get(product_id, 0) + quantity
+
+        reservation = Reservation(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            quantities=dict(quantities),
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds),
+            expires_monotonic=time.monotonic() + ttl_seconds
+        )
+        self._reservations[reservation.id] = reservation
+        self._by_user.setdefault(user_id, set()).add(reservation.id)
+        heapq.heappush(self._expiry, (reservation.expires_monotonic, reservation.id))
+        return reservation
+
+    async def claim(self, reservation_id: str) -> bool:
+        """Take an active reservation for an order; returns whether it was free to take"""
+        reservation = await self.get(reservation_id)
+        if reservation is None or reservation.claimed:
+            return False
+        reservation.claimed = True
+        return True
+
+    async def unclaim(self, reservation_id: str):
+        """Give a claimed reservation back after its order failed"""
+        reservation = self._reservations.get(reservation_id)
+        if reservation is not None:
+            reservation.claimed = False
+
+    async def release(self, reservation_id: str) -> bool:
+        """Give a reservation's stock back; returns whether it existed"""
+        reservation = self._reservations.pop(reservation_id, None)
+        if reservation is None:
+            return False
+        user_reservations = self._by_user.get(reservation.user_id)
+        if user_reservations is not None:
+            user_reservations.discard(reservation_id)
+            if not user_reservations:
+                del self._by_user[reservation.user_id]
+        for product_id, quantity in reservation.quantities.items():
+            remaining = self._held.get(product_id, 0) - quantity
+            if remaining > 0:
+                self._held[product_id] = remaining
+            else:
+                self._held.pop(product_id, None)
+        return True
+
+    async def release_expired(self) -> int:
+        """Release every reservation past its expiry; returns how many"""
+        released = 0
+        now = time.monotonic()
+        while self._expiry and self._expiry[0][0] <= now:
+            _, reservation_id = heapq.heappop(self._expiry)
+            released += await self.release(reservation_id)
+        return released
+
+    def __len__(self) -> int:
+        return len(self._reservations)
+
+class SharedReservationStore:
+    """Stock holds kept in a shared store, so every worker sees the same holds
+
+    Uses the versioned get and compare-and-set of a shared key-value
+    store (see rate_limit_utils.LocalSharedStore). Each product's and
+    each user's key maps reservation ids to (quantity, expiry), a user's
+    counting each reservation once, so holds past their expiry stop
+    counting without a sweep and are pruned on the next write. A hold
+    across several products is taken product by product and rolled back
+    if one is short. Expiry uses wall-clock time since the store is
+    shared between hosts.
+    """
+
+    def __init__(self, store, max_attempts: int = RESERVATION_MAX_ATTEMPTS):
+        self.store = store
+        self.max_attempts = max_attempts
+        # Reservations made through this worker, for the active gauge
+        self._created: Dict[str, float] = {}
+
+    async def _update(self, key: str, change: Callable[[Any], Tuple[Any, Any, float]]) -> Any:
+        """Apply change(value) -> (new value, result, ttl) to a key with compare-and-set
+
+        A change returning _UNCHANGED as the new value leaves the key as it is.
+        """
+        for _ in range(self.max_attempts):
+            value, version = await self.store.get(key)
+            new_value, result, ttl_seconds = change(value)
+            if new_value is _UNCHANGED or await self.store.compare_and_set(key, version, new_value, ttl_seconds):
+                return result
+        metrics.increment("reservations.conflicts")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Stock holds are changing, please retry"
+        )
+
+    @staticmethod
+    def _active(entries: Optional[dict], now: float) -> dict:
+        return {reservation_id: entry for reservation_id, entry in (entries or {}).items() if entry[1] > now}
+
+    @staticmethod
+    def _ttl(entries: dict, now: float) -> float:
+        return max((expires_at for _, expires_at in entries.values()), default=now) - now + 1
+
+    def _from_value(self, reservation_id: str, value) -> Optional[Reservation]:
+        if value is None:
+            return None
+        user_id, quantities, expires_at, claimed = value
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return None
+        return Reservation(
+            id=reservation_id,
+            user_id=user_id,
+            quantities=dict(quantities),
+            expires_at=datetime.fromtimestamp(expires_at, timezone.utc),
+            expires_monotonic=time.monotonic() + remaining,
+            claimed=claimed
+        )
+
+    async def held(self, product_id: str) -> int:
+        entries, _ = await self.store.get(f"reservations:product:{product_id}")
+        return sum(quantity for quantity, _ in self._active(entries, time.time()).values())
+
+    async def active_count(self, user_id: str) -> int:
+        """Number of unexpired reservations held by a user"""
+        entries, _ = await self.store.get(f"reservations:user:{user_id}")
+        return len(self._active(entries, time.time()))
+
+    async def get(self, reservation_id: str) -> Optional[Reservation]:
+        value, _ = await self.store.get(f"reservations:id:{reservation_id}")
+        return self._from_value(reservation_id, value)
+
+    async def _remove_hold(self, key: str, reservation_id: str):
+        def remove(entries):
+            now = time.time()
+            entries = self._active(entries, now)
+            entries.pop(reservation_id, None)
+            return entries, None, self._ttl(entries, now)
+        await self._update(key, remove)
+
+    async def reserve(self, user_id: str, quantities: Dict[str, int], stock: Dict[str, int], ttl_seconds: float, max_per_user: int) -> Reservation:
+        """Hold quantities of each product if enough unheld stock remains (see MemoryReservationStore.reserve)"""
+        reservation_id = str(uuid.uuid4())
+        expires_at = time.time() + ttl_seconds
+
+        def add_to_user(entries):
+            now = time.time()
+            entries = self._active(entries, now)
+            if len(entries) >= max_per_user:
+                return entries, False, self._ttl(entries, now)
+            entries[reservation_id] = (1, expires_at)
+            return entries, True, self._ttl(entries, now)
+
+        if not await self._update(f"reservations:user:{user_id}", add_to_user):
+            raise ReservationLimitReached()
+
+        taken = []
+        for product_id, quantity in quantities.items():
+            def add_hold(entries, product_id=product_id, quantity=quantity):
+                now = time.time()
+                entries = self._active(entries, now)
+                if stock[product_id] - sum(held for held, _ in entries.values()) < quantity:
+                    return entries, False, self._ttl(entries, now)
+                entries[reservation_id] = (quantity, expires_at)
+                return entries, True, self._ttl(entries, now)
+
+            if not await self._update(f"reservations:product:{product_id}", add_hold):
+                for taken_id in taken:
+                    await self._remove_hold(f"reservations:product:{taken_id}", reservation_id)
+                await self._remove_hold(f"reservations:user:{user_id}", reservation_id)
+                raise ValueError(product_id)
+            taken.append(product_id)
+
+        value = (user_id, dict(quantities), expires_at, False)
+        await self._update(f"reservations:id:{reservation_id}", lambda _: (value, None, ttl_seconds))
+        self._created[reservation_id] = expires_at
+        return self._from_value(reservation_id, value)
+
+    async def _set_claimed(self, reservation_id: str, claimed: bool) -> bool:
+        def change(value):
+            reservation = self._from_value(reservation_id, value)
+            if reservation is None or reservation.claimed == claimed:
+                return _UNCHANGED, False, 0
+            user_id, quantities, expires_at, _ = value
+            return (user_id, quantities, expires_at, claimed), True, expires_at - time.time()
+        return await self._update(f"reservations:id:{reservation_id}", change)
+
+    async def claim(self, reservation_id: str) -> bool:
+        """Take an active reservation for an order; returns whether it was free to take"""
+        return await self._set_claimed(reservation_id, True)
+
+    async def unclaim(self, reservation_id: str):
+        """Give a claimed reservation back after its order failed"""
+        await self._set_claimed(reservation_id, False)
+
+    async def release(self, reservation_id: str) -> bool:
+        """Give a reservation's stock back; returns whether it existed"""
+        def remove(value):
+            return None, self._from_value(reservation_id, value), 1
+        reservation = await self._update(f"reservations:id:{reservation_id}", remove)
+        self._created.pop(reservation_id, None)
+        if reservation is None:
+            return False
+        for product_id in reservation.quantities:
+            await self._remove_hold(f"reservations:product:{product_id}", reservation_id)
+        await self._remove_hold(f"reservations:user:{reservation.user_id}", reservation_id)
+        return True
+
+    async def release_expired(self) -> int:
+        """Expired holds stop counting on their own; only this worker's gauge is pruned"""
+        now = time.time()
+        expired = [reservation_id for reservation_id, expires_at in self._created.items() if expires_at <= now]
+        for reservation_id in expired:
+            del self._created[reservation_id]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._created)
+
+# Store for the worker process
+store = MemoryReservationStore()
+metrics.register_gauge("reservations.active", lambda: len(store))
+
+async def create_reservation(db, user_id: str, quantities: Dict[str, int], ttl_minutes: Optional[float] = None) -> Reservation:
+    """Hold stock for a cart
+
+    Reads current stock in one query (no row locks) and holds the
+    quantities in the counter store, for ttl_minutes or by default
+    RESERVATION_TTL_MINUTES.
+
+    Raises:
+        HTTPException: If a product does not exist or lacks unheld stock,
+            or the user already holds RESERVATION_MAX_PER_USER reservations
+    """
+    result = await db.execute(
+        select(Product.id, Product.name, Product.stock_quantity).filter(
+            Product.id.in_(list(quantities)),
+            Product.is_deleted == False
+        )
+    )
+    products = {row.id: row for row in result.all()}
+    for product_id in quantities:
+        if product_id not in products:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with ID {product_id} not found"
+            )
+
+    try:
+        reservation = await store.reserve(
+            user_id, quantities, {product_id: row.stock_quantity for product_id, row in products.items()},
+            (ttl_minutes if ttl_minutes is not None else RESERVATION_TTL_MINUTES) * 60, RESERVATION_MAX_PER_USER
+        )
+    except ReservationLimitReached:
+        metrics.increment("reservations.limited")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"At most {RESERVATION_MAX_PER_USER} reservations can be active at once; check out or release one first"
+        )
+    except ValueError as error:
+        product = products[error.args[0]]
+        metrics.increment("reservations.rejected")
+        held = await store.held(product.id)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Not enough stock for product {product.name}. Available: {max(product.stock_quantity - held, 0)}"
+        )
+
+    metrics.increment("reservations.created")
+    return reservation
+
+async def find_user_reservation(reservation_id: str, user_id: str) -> Optional[Reservation]:
+    """Return an active reservation of the user, None if missing, expired or someone else's"""
+    reservation = await store.get(reservation_id)
+    if reservation is None or reservation.user_id != user_id:
+        return None
+    return reservation
+
+async def get_user_reservation(reservation_id: str, user_id: str) -> Reservation:
+    """Return an active reservation of the user
+
+    Raises:
+        HTTPException: If the reservation does not exist, expired or belongs to someone else
+    """
+    reservation = await find_user_reservation(reservation_id, user_id)
+    if reservation is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reservation not found or expired"
+        )
+    return reservation
+
+async def claim_user_reservation(reservation_id: str, user_id: str) -> Reservation:
+    """Take an active reservation of the user for an order
+
+    The order releases it once committed, or gives it back with
+    store.unclaim if it fails; until then no other order can use it.
+
+    Raises:
+        HTTPException: If the reservation does not exist, expired or belongs
+            to someone else, or another order is already using it
+    """
+    reservation = await get_user_reservation(reservation_id, user_id)
+    if not await store.claim(reservation.id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Reservation is already being checked out"
+        )
+    return reservation
+
+async def held_by_others(quantities: Dict[str, int], reservation: Optional[Reservation] = None) -> Dict[str, int]:
+    """Stock of each product held by reservations other than the given one"""
+    own = reservation.quantities if reservation else {}
+    return {product_id: await store.held(product_id) - own.get(product_id, 0) for product_id in quantities}
+
+async def sweep_expired_reservations():
+    """Background task that periodically releases expired holds"""
+    while True:
+        released = await store.release_expired()
+        if released:
+            metrics.increment("reservations.expired", released)
+            logger.info("Released %d expired reservations", released)
+        await asyncio.sleep(RESERVATION_SWEEP_SECONDS)
@@ -0,0 +1,84 @@
+from typing import Dict
+import logging
+
+from sqlalchemy import Float, cast, func, select, update
+
+from ..models import Product, ProductReview
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+async def add_review_to_aggregates(db, product_id: str, rating: int):
+    """Fold a new review into the product's rating aggregates
+
+    A single relative UPDATE, so concurrent reviews of the same product
+    serialize on the row instead of overwriting each other, and the cost
+    does not grow with the number of reviews. Runs in the caller's
+    transaction so the review and the aggregate commit together.
+
+    Args:
+        db: The async database session
+        product_id: The reviewed product
+        rating: The rating of the new review
+    """
+    rating_total = func.coalesce(Product.rating_total, 0) + rating
+    reviews_count = func.coalesce(Product.reviews_count, 0) + 1
+    await db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(
+            rating_total=rating_total,
+            reviews_count=reviews_count,
+            rating=cast(rating_total, Float) / reviews_count
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+async def reconcile_review_aggregates(db) -> Dict[str, int]:
+    """Recompute every product's rating aggregates from its reviews
+
+    Reviews are aggregated in one GROUP BY pass joined to the products, and
+    only products whose stored aggregates drifted are written back, in one
+    bulk UPDATE. Products without reviews are reset to zero.
+
+    Args:
+        db: The async database session
+
+    Returns:
+        The number of products checked and updated
+    """
+    stats = (
+        select(
+            ProductReview.product_id,
+            func.count(ProductReview.id).label("reviews_count"),
+            func.sum(ProductReview.rating).label("rating_total")
+        )
+        .group_by(ProductReview.product_id)
+        .subquery()
+    )
+    result = await db.execute(
+        select(
+            Product.id, Product.reviews_count, Product.rating_total, Product.rating,
+            func.coalesce(stats.c.reviews_count, 0).label("actual_count"),
+            func.coalesce(stats.c.rating_total, 0).label("actual_total")
+        ).outerjoin(stats, stats.c.product_id == Product.id)
+    )
+    rows = result.all()
+
+    changes = []
+    for row in rows:
+        rating = row.actual_total / row.actual_count if row.actual_count else 0.0
+        if (row.reviews_count, row.rating_total, row.rating) != (row.actual_count, row.actual_total, rating):
+            changes.append({
+                "id": row.id,
+                "reviews_count": row.actual_count,
+                "rating_total": row.actual_total,
+                "rating": rating
+            })
+
+    if changes:
+        await db.execute(update(Product), changes)
+    await db.commit()
+
+    logger.info("Reconciled review aggregates: %d of %d products updated", len(changes), len(rows))
+    return {"products_checked": len(rows), "products_updated": len(changes)}
@@ -0,0 +1,108 @@
+from typing import Optional, Tuple
+import logging
+
+from sqlalchemy import Column, Float, MetaData, String, Table, Text, func, literal_column
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from ..database import DATABASE_URL, is_sqlite
+from ..utils.i18n_utils import normalize_text, tokenize
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# SQLite databases use an FTS5 virtual table, PostgreSQL a tsvector column
+USE_FTS5 = is_sqlite(DATABASE_URL)
+
+# Product fields indexed for search. Names rank above descriptions. Fields
+# missing from the Product model are skipped.
+NAME_FIELDS = ("name", "name_ar", "latin_name")
+BODY_FIELDS = ("description", "description_ar")
+
+# Relative weight of a name match over a description match (FTS5 bm25)
+NAME_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+# The search table is created by the migrations (0002_product_search), not
+# by Base.metadata.create_all, since its shape depends on the database
+search_metadata = MetaData()
+
+product_search = Table(
+    "product_search",
+    search_metadata,
+    Column("product_id", String, primary_key=True),
+    Column("names", Text),  # FTS5 only
+    Column("body", Text),  # FTS5 only
+    Column("document", TSVECTOR)  # PostgreSQL only
+)
+
+def build_search_document(product) -> Tuple[str, str]:
+    """Build the normalized names and body text indexed for a product
+
+    Args:
+        product: A Product instance (or any object with the product fields)
+
+    Returns:
+        A (names, body) tuple of normalized text
+    """
+    names = " ".join(normalize_text(getattr(product, field, None)) for field in NAME_FIELDS)
+    body = " ".join(normalize_text(getattr(product, field, None)) for field in BODY_FIELDS)
+    return names.strip(), body.strip()
+
+def search_document_values(product_id: str, names: str, body: str) -> dict:
+    """Build the product_search row for a product"""
+    if USE_FTS5:
+        return {"product_id": product_id, "names": names, "body": body}
+
+    document = func.setweight(func.to_tsvector("simple", names), "A").op("||")(
+        func.setweight(func.to_tsvector("simple", body), "B")
+    )
+    return {"product_id": product_id, "document": document}
+
+async def index_product(db, product):
+    """Add or refresh a product in the search index
+
+    Runs in the caller's transaction, so the index changes commit (or roll
+    back) together with the product.
+
+    Args:
+        db: The async database session
+        product: The Product being created or updated
+    """
+    names, body = build_search_document(product)
+    await db.execute(product_search.delete().where(product_search.c.product_id == product.id))
+    await db.execute(product_search.insert().values(**search_document_values(product.id, names, body)))
+
+async def remove_product(db, product_id: str):
+    """Remove a product from the search index"""
+    await db.execute(product_search.delete().where(product_search.c.product_id == product_id))
+
+def search_products(query, product_id_column, text: str) -> Tuple[object, Optional[object]]:
+    """Restrict a product query to products matching a search string
+
+    Every search term must match, as a prefix, so results narrow as the
+    user types. The text is normalized the same way as the index, so Arabic
+    spelling variants (alef forms, taa marbuta, diacritics) match.
+
+    Args:
+        query: A select() over products
+        product_id_column: The products id column to join the index on
+        text: The raw search string
+
+    Returns:
+        The filtered query and a relevance expression (higher is better),
+        or the unchanged query and None when the text has no terms
+    """
+    terms = tokenize(text)
+    if not terms:
+        return query, None
+
+    query = query.join(product_search, product_search.c.product_id == product_id_column)
+
+    if USE_FTS5:
+        match = " ".join(f'"{term}"*' for term in terms)
+        rank = -func.bm25(literal_column("product_search"), 0.0, NAME_WEIGHT, BODY_WEIGHT, type_=Float)
+        return query.filter(literal_column("product_search").op("MATCH")(match)), rank
+
+    tsquery = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+    rank = func.ts_rank(product_search.c.document, tsquery, type_=Float)
+    return query.filter(product_search.c.document.op("@@")(tsquery)), rank
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, String, func, select, type_coerce
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+import os
+
+from ..utils import pagination_utils
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Most rows returned per collection by one sync call; clients call again while has_more
+SYNC_BATCH_SIZE = int(os.environ.get("SYNC_BATCH_SIZE", 500))
+
+# Rows changed in the last few seconds are left for the next sync, so a
+# transaction that commits after a sync read its rows (with an earlier
+# timestamp) is not skipped by the watermark
+SYNC_SETTLE_SECONDS = float(os.environ.get("SYNC_SETTLE_SECONDS", 5))
+
+# Collections tracked by a watermark, in token order
+SYNC_COLLECTIONS = ("plants", "watering_history", "diagnoses", "orders")
+
+# Types of the (changed at, id) position every collection is synced by
+SYNC_POSITION_TYPES = (DateTime(), String())
+
+def encode_watermark(positions: Dict[str, Optional[Sequence[Any]]]) -> str:
+    """Encode the last synced (changed at, id) of every collection as an opaque token
+
+    Args:
+        positions: The sync position per collection, None if nothing was synced yet
+
+    Returns:
+        A URL-safe token
+    """
+    values: List[Any] = []
+    for name in SYNC_COLLECTIONS:
+        values.extend(positions.get(name) or (None, None))
+    return pagination_utils.encode_cursor(values)
+
+def decode_watermark(token: Optional[str]) -> Dict[str, Optional[List[Any]]]:
+    """Decode a token produced by encode_watermark; no token means a full sync
+
+    Raises:
+        HTTPException: If the token is malformed or from an incompatible version
+    """
+    if not token:
+        return {name: None for name in SYNC_COLLECTIONS}
+    try:
+        values = pagination_utils.decode_cursor(token, SYNC_POSITION_TYPES * len(SYNC_COLLECTIONS), nullable=True)
+    except HTTPException:
+        values = None
+    # A collection is either synced up to a (changed at, id) or not at all
+    if values is None or any((values[index] is None) != (values[index + 1] is None) for index in range(0, len(values), 2)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync token, sync again without one"
+        )
+
+    positions = {}
+    for index, name in enumerate(SYNC_COLLECTIONS):
+        position = values[2 * index:2 * index + 2]
+        positions[name] = position if position[1] is not None else None
+    return positions
+
+async def settled_cutoff(db) -> datetime:
+    """The newest change time a sync may return, by the database's clock"""
+    now = (await db.execute(select(func.now()))).scalar()
+    return now - timedelta(seconds=SYNC_SETTLE_SECONDS)
+
+async def fetch_changes(
+    db,
+    query,
+    changed_column,
+    id_column,
+    position: Optional[Sequence[Any]],
+    cutoff: datetime,
+    limit: int = SYNC_BATCH_SIZE
+) -> Tuple[list, Optional[List[Any]], bool]:
+    """Fetch the rows of one collection changed after a sync position
+
+    Rows are read in (changed_column, id_column) order, resuming strictly
+    after position, up to cutoff. Like the pagination cursors, the
+    position holds the raw stored value of changed_column.
+
+    Args:
+        db: The async database session
+        query: A select() of the collection, filtered to the user
+        changed_column: The column set on insert and on every change
+        id_column: The primary key, breaking ties between equal times
+        position: The collection's position decoded from the watermark
+        cutoff: The newest change time to return (see settled_cutoff)
+        limit: Maximum number of rows to return
+
+    Returns:
+        The rows (without the position columns), the new position and
+        whether more changed rows remain
+    """
+    raw_changed = type_coerce(changed_column, String) if isinstance(changed_column.type, DateTime) else changed_column
+    query = query.add_columns(raw_changed.label("sync_changed_at"), id_column.label("sync_id")).filter(
+        changed_column <= cutoff
+    ).order_by(changed_column, id_column)
+    if position is not None:
+        query = query.filter(pagination_utils.keyset_condition([changed_column, id_column], position, descending=False))
+
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        position = list(rows[-1][-2:])
+    return [tuple(row[:-2]) for row in rows], position, has_more
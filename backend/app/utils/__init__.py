@@ -1,3 +1,12 @@
+from . import cache_utils
+from . import compression_utils
 from . import file_utils
+from . import http_cache_utils
 from . import i18n_utils
+from . import idempotency_utils
+from . import metrics_utils
+from . import pagination_utils
+from . import query_utils
+from . import rate_limit_utils
+from . import serialization_utils
 from . import validation_utils
\ No newline at end of file
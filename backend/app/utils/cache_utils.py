@@ -0,0 +1,151 @@
+import logging
+import os
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from .metrics_utils import metrics
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Defaults for the reference data caches
+CACHE_TTL_SECONDS = float(os.environ.get("REFERENCE_CACHE_TTL_SECONDS", 300))
+CACHE_MAX_ENTRIES = int(os.environ.get("REFERENCE_CACHE_MAX_ENTRIES", 1024))
+
+# Channel carrying cache invalidations between workers
+INVALIDATION_CHANNEL = "cache.invalidate"
+
+class LocalInvalidationBus:
+    """In-process stand-in for a pub/sub channel
+
+    Delivers published messages to the subscribers of the same process.
+    Deployments with several workers swap in a bus with the same
+    subscribe/publish methods backed by a shared broker (e.g. Redis
+    pub/sub), so that an admin write on one worker clears the caches of
+    all of them.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable[[dict], None]]] = defaultdict(list)
+
+    def subscribe(self, channel: str, callback: Callable[[dict], None]):
+        self._subscribers[channel].append(callback)
+
+    async def publish(self, channel: str, message: dict):
+        for callback in list(self._subscribers[channel]):
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("Invalidation subscriber failed on %s", channel)
+
+# Shared bus for the worker process
+invalidation_bus = LocalInvalidationBus()
+
+_MISSING = object()
+
+def _field(value: Any, name: str) -> Any:
+    if isinstance(value, dict):
+        return value.get(name)
+    return getattr(value, name, None)
+
+class TTLCache:
+    """Read-through cache with per-entry expiry and LRU eviction
+
+    Entries expire ttl_seconds after they are stored, and the least
+    recently used entry is evicted once max_entries is reached. Hits and
+    misses are counted under cache.<name>.* in the metrics registry.
+    Invalidations are published on the bus so every worker drops its copy.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        bus: LocalInvalidationBus = invalidation_bus
+    ):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.bus = bus
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        bus.subscribe(INVALIDATION_CHANNEL, self._on_invalidation)
+        metrics.register_gauge(f"cache.{name}.size", lambda: len(self._entries))
+        metrics.register_gauge(f"cache.{name}.hit_rate", self.hit_rate)
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            metrics.increment(f"cache.{self.name}.misses")
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        metrics.increment(f"cache.{self.name}.hits")
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            metrics.increment(f"cache.{self.name}.evictions")
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value, loading and storing it on a miss
+
+        Args:
+            key: The cache key
+            loader: Coroutine function producing the value; a None result
+                (e.g. not found) is returned but not cached
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = await loader()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def clear_local(self, key: Optional[Hashable] = None, where: Optional[Dict[str, Any]] = None):
+        """Drop one key, the entries whose values match where, or everything, from this worker's copy"""
+        if where:
+            stale = [
+                entry_key for entry_key, (_, value) in self._entries.items()
+                if all(_field(value, name) == expected for name, expected in where.items())
+            ]
+            for entry_key in stale:
+                del self._entries[entry_key]
+        elif key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def invalidate(self, key: Optional[Hashable] = None, where: Optional[Dict[str, Any]] = None):
+        """Drop one key, the entries whose values match where, or everything, from every worker's copy
+
+        Args:
+            key: The key to drop
+            where: Field values (e.g. {"id": user_id}) selecting the entries
+                to drop when they are not known by key
+        """
+        await self.bus.publish(INVALIDATION_CHANNEL, {"cache": self.name, "key": key, "where": where})
+
+    def _on_invalidation(self, message: dict):
+        if message.get("cache") == self.name:
+            self.clear_local(message.get("key"), message.get("where"))
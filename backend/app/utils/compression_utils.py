@@ -0,0 +1,251 @@
+import logging
+import os
+import zlib
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics_utils import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd is optional
+    zstandard = None
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Responses smaller than this are sent as they are; the headers and the
+# compressor's framing would eat most of the saving
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+
+# Compression levels; higher levels trade CPU for fewer bytes
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 4))
+ZSTD_LEVEL = int(os.environ.get("ZSTD_LEVEL", 3))
+
+# Content types worth compressing; everything else (images, archives,
+# already compressed downloads) is passed through untouched
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+})
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+def available_encodings() -> Dict[str, Callable[[], object]]:
+    """Streaming compressor factories by content-coding, in server preference order"""
+    encodings: Dict[str, Callable[[], object]] = {}
+    if brotli is not None:
+        encodings["br"] = lambda: _BrotliStream(BROTLI_QUALITY)
+    if zstandard is not None:
+        encodings["zstd"] = lambda: _ZstdStream(ZSTD_LEVEL)
+    encodings["gzip"] = lambda: _GzipStream(GZIP_LEVEL)
+    return encodings
+
+ENCODINGS = available_encodings()
+
+@lru_cache(maxsize=256)
+def negotiate_encoding(accept_encoding: str, supported: Tuple[str, ...] = tuple(ENCODINGS)) -> Optional[str]:
+    """Pick the content-coding to use for an Accept-Encoding header
+
+    The client's highest q-value wins; ties go to the server's order of
+    preference (supported). '*' stands for any coding not listed, and q=0
+    excludes one. Parsed headers are cached.
+
+    Args:
+        accept_encoding: The header value, e.g. 'gzip, deflate, br;q=0.9'
+        supported: The codings this server can produce, preferred first
+
+    Returns:
+        The chosen coding, or None to send the body unencoded
+    """
+    qualities: Dict[str, float] = {}
+    for entry in accept_encoding.split(","):
+        parts = entry.split(";")
+        coding = parts[0].strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for parameter in parts[1:]:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    """Whether a response of this content type is worth compressing"""
+    if not content_type:
+        return False
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith("+json")
+        or media_type.endswith("+xml")
+    )
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+def _add_vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    vary = _header(headers, b"vary")
+    if vary is None:
+        return headers + [(b"vary", b"Accept-Encoding")]
+    if "accept-encoding" in vary.lower():
+        return headers
+    return [(key, value) for key, value in headers if key.lower() != b"vary"] + [
+        (b"vary", f"{vary}, Accept-Encoding".encode("latin-1"))
+    ]
+
+def _encoded_headers(headers: List[Tuple[bytes, bytes]], coding: str, length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+    encoded = []
+    for key, value in headers:
+        lowered = key.lower()
+        if lowered == b"content-length":
+            continue
+        if lowered == b"etag" and not value.startswith(b"W/"):
+            # The encoded body is a different byte sequence, so the tag is weakened
+            value = b"W/" + value
+        encoded.append((key, value))
+    encoded.append((b"content-encoding", coding.encode()))
+    if length is not None:
+        encoded.append((b"content-length", str(length).encode()))
+    return encoded
+
+class CompressionMiddleware:
+    """Compress responses with the best coding the client accepts
+
+    Supports gzip always, and brotli (br) and zstd when their packages are
+    installed. Only textual content types are compressed, responses that
+    already carry a Content-Encoding are left alone, and complete bodies
+    below COMPRESSION_MIN_SIZE are sent as they are. Streamed responses
+    are compressed chunk by chunk without being buffered.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE, encodings: Optional[Dict[str, Callable[[], object]]] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = encodings if encodings is not None else ENCODINGS
+        self.supported = tuple(self.encodings)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = None
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        coding = negotiate_encoding(accept_encoding, self.supported) if accept_encoding else None
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        compressor = None
+        passthrough = False
+
+        async def compress_send(message: Message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                status = message["status"]
+                if (
+                    status < 200 or status in (204, 304)
+                    or _header(headers, b"content-encoding") is not None
+                    or not is_compressible(_header(headers, b"content-type"))
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held back until the first body chunk shows how large the body is
+                    start = {**message, "headers": _add_vary(headers)}
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    passthrough = True
+                    return
+
+                compressor = self.encodings[coding]()
+                if not more_body:
+                    # The whole body at once: compress it and send an exact length
+                    compressed = compressor.compress(body) + compressor.finish()
+                    metrics.increment(f"compression.{coding}.bytes_in", len(body))
+                    metrics.increment(f"compression.{coding}.bytes_out", len(compressed))
+                    await send({**start, "headers": _encoded_headers(start["headers"], coding, len(compressed))})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start, "headers": _encoded_headers(start["headers"], coding, None)})
+
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            metrics.increment(f"compression.{coding}.bytes_in", len(body))
+            metrics.increment(f"compression.{coding}.bytes_out", len(chunk))
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, compress_send)
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional, Sequence, Tuple
+
+from fastapi import Response, status
+from sqlalchemy import func
+
+# Cache-Control for public catalog data and for per-user collections. Catalog
+# responses may be reused briefly; user data is always revalidated.
+CATALOG_CACHE_MAX_AGE = int(os.environ.get("CATALOG_CACHE_MAX_AGE", 30))
+CATALOG_CACHE_CONTROL = f"public, max-age={CATALOG_CACHE_MAX_AGE}, must-revalidate"
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+def compute_etag(payload: Any) -> str:
+    """Compute a strong ETag for a JSON-serializable payload
+
+    Args:
+        payload: The response body before encoding, or any validator parts
+
+    Returns:
+        A quoted entity tag
+    """
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return '"%s"' % hashlib.sha256(encoded).hexdigest()[:32]
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag
+
+    Args:
+        if_none_match: The raw header value (a list of tags or '*')
+        etag: The current entity tag
+
+    Returns:
+        Whether the client's copy is current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison: W/"x" matches "x"
+    return any(tag[2:] == etag if tag.startswith("W/") else tag == etag for tag in tags)
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive timestamps, which func.now() stores in UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def is_not_modified(
+    etag: str,
+    last_modified: Optional[datetime],
+    if_none_match: Optional[str] = None,
+    if_modified_since: Optional[str] = None
+) -> bool:
+    """Evaluate conditional request headers against the current validators
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted
+    when it is absent, as HTTP requires.
+    """
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return _as_utc(last_modified).replace(microsecond=0) <= since
+
+def _cache_headers(etag: str, last_modified: Optional[datetime], cache_control: Optional[str], vary: Optional[str] = None) -> dict:
+    headers = {"ETag": etag}
+    if vary:
+        headers["Vary"] = vary
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return headers
+
+def set_cache_headers(
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    cache_control: Optional[str] = None
+):
+    """Attach validators and Cache-Control to a full response"""
+    response.headers.update(_cache_headers(etag, last_modified, cache_control))
+
+def not_modified_response(
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    cache_control: Optional[str] = None,
+    vary: Optional[str] = None
+) -> Response:
+    """Build an empty 304 response carrying the validators (and Vary, as the full response would)"""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=_cache_headers(etag, last_modified, cache_control, vary)
+    )
+
+def entity_validators(entity, *key_parts: Any) -> Tuple[str, Optional[datetime]]:
+    """Validators for a single row, from its version and timestamps (no serialization)
+
+    Args:
+        entity: An ORM object with version and created_at/updated_at columns
+        key_parts: Anything else the response depends on
+
+    Returns:
+        The ETag and the Last-Modified time
+    """
+    return row_validators(entity.id, entity.version, entity.created_at, entity.updated_at, *key_parts)
+
+def row_validators(
+    entity_id: Any,
+    version: Optional[int],
+    created_at: Optional[datetime],
+    updated_at: Optional[datetime],
+    *key_parts: Any
+) -> Tuple[str, Optional[datetime]]:
+    """Validators for a single row selected as columns rather than as an ORM object
+
+    Produces the same validators as entity_validators for the same values.
+    The ETag follows the row version, so it changes on every write; the
+    Last-Modified time is only as precise as the stored timestamps.
+    """
+    last_modified = updated_at or created_at
+    return compute_etag([entity_id, version, *key_parts]), last_modified
+
+def _change_aggregates(model) -> tuple:
+    return func.sum(model.version), func.max(func.coalesce(model.updated_at, model.created_at))
+
+async def collection_validators(
+    db,
+    query,
+    model,
+    *key_parts: Any,
+    related: Sequence[Tuple[Any, Any]] = ()
+) -> str:
+    """ETag for a list endpoint, computed with one aggregate query
+
+    Runs COUNT(*), SUM(version) and MAX(COALESCE(updated_at, created_at))
+    over the rows the list query selects. Every write increments a row's
+    version, so an edited row changes the sum, and an added or
+    (soft-)deleted row changes the count, without loading or serializing
+    the page. Models whose fields are embedded in the response are outer
+    joined and aggregated too, so renaming one of them also changes the
+    ETag.
+
+    Lists have no Last-Modified time: the newest change among the rows
+    still listed says nothing about rows that left the list, so
+    If-Modified-Since could not tell that a row was deleted. Clients
+    revalidate lists with If-None-Match.
+
+    Args:
+        db: The async database session
+        query: The list query with its filters, before ordering or pagination
+        model: The listed ORM model (with version and created_at/updated_at columns)
+        key_parts: Anything else the page depends on (user, query string)
+        related: (model, join condition) of every embedded many-to-one model
+
+    Returns:
+        The ETag
+    """
+    query = query.with_only_columns(func.count(), *_change_aggregates(model), maintain_column_froms=True)
+    for related_model, onclause in related:
+        query = query.outerjoin(related_model, onclause).add_columns(*_change_aggregates(related_model))
+    result = await db.execute(query.order_by(None))
+    return compute_etag([*result.one(), *key_parts])
@@ -1,5 +1,12 @@
-from typing import Dict, Any, Optional
-from fastapi import Request
+from functools import lru_cache
+from typing import Dict, Any, FrozenSet, List, Optional, Tuple, Type, Union
+from fastapi import Query, Request, Response
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SEQUENCE, SHAPE_SINGLETON
+import re
+import unicodedata
+
+from .serialization_utils import FastJSONResponse, json_response
 
 # Default language
 DEFAULT_LANGUAGE = "en"
@@ -7,34 +14,135 @@ DEFAULT_LANGUAGE = "en"
 # Supported languages
 SUPPORTED_LANGUAGES = ["en", "ar"]
 
-def get_language_from_request(request: Request) -> str:
-    """Extract the preferred language from the request
+# Value of ?lang= that keeps every language's fields (for editing screens)
+ALL_LANGUAGES = "both"
+
+# Vary header of responses negotiated on Accept-Language
+LANGUAGE_VARY = "Accept-Language"
+
+# Suffixes marking a translated field, e.g. name_ar
+_LANGUAGE_SUFFIXES = {f"_{lang}": lang for lang in SUPPORTED_LANGUAGES}
+
+# Arabic characters folded together for search and matching: alef forms,
+# taa marbuta, alef maqsura and hamza carriers. Diacritics (harakat,
+# tanween, shadda, sukun, superscript alef) and tatweel are removed.
+_ARABIC_FOLDING = {
+    "\u0623": "\u0627",  # alef with hamza above -> alef
+    "\u0625": "\u0627",  # alef with hamza below -> alef
+    "\u0622": "\u0627",  # alef with madda -> alef
+    "\u0671": "\u0627",  # alef wasla -> alef
+    "\u0629": "\u0647",  # taa marbuta -> haa
+    "\u0649": "\u064a",  # alef maqsura -> yaa
+    "\u0624": "\u0648",  # waw with hamza -> waw
+    "\u0626": "\u064a",  # yaa with hamza -> yaa
+}
+_ARABIC_REMOVED = [chr(code) for code in range(0x064B, 0x0660)] + ["\u0670", "\u0640"]
+
+_NORMALIZATION_TABLE = str.maketrans({**_ARABIC_FOLDING, **{char: None for char in _ARABIC_REMOVED}})
+
+# Anything that is not a letter or digit separates tokens
+_TOKEN_SPLIT = re.compile(r"[\W_]+", re.UNICODE)
+
+def normalize_text(text: Optional[str]) -> str:
+    """Normalize English/Arabic text for searching and matching
+
+    Applies Unicode NFKC, case folding, Arabic letter folding and removal of
+    Arabic diacritics and tatweel, then collapses punctuation to spaces.
+
+    Args:
+        text: The text to normalize
+
+    Returns:
+        The normalized text ('' for None)
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold().translate(_NORMALIZATION_TABLE)
+    return " ".join(_TOKEN_SPLIT.split(text)).strip()
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into normalized search tokens
+
+    Args:
+        text: The text to tokenize
+
+    Returns:
+        A list of normalized tokens
+    """
+    normalized = normalize_text(text)
+    return normalized.split() if normalized else []
+
+@lru_cache(maxsize=512)
+def parse_accept_language(accept_language: str) -> Tuple[str, ...]:
+    """Parse an Accept-Language header into supported languages by preference
     
-    Checks the Accept-Language header and falls back to DEFAULT_LANGUAGE
+    Entries are ordered by q-value, ties keeping header order; regional
+    variants count as their language (en-US is en), '*' as the default
+    language, and q=0 entries are excluded. Parsed headers are cached
+    since clients send the same few values over and over.
     
     Args:
-        request: The FastAPI request object
+        accept_language: The header value, e.g. 'en-US,en;q=0.9,ar;q=0.8'
         
     Returns:
-        The language code (e.g., 'en', 'ar')
+        The supported language codes, most preferred first
     """
-    # Get Accept-Language header
-    accept_language = request.headers.get("Accept-Language", DEFAULT_LANGUAGE)
-    
-    # Parse the header to get the preferred language
-    # Format is typically like: en-US,en;q=0.9,ar;q=0.8
-    languages = []
-    for lang_q in accept_language.split(","):
-        parts = lang_q.strip().split(";", 1)
-        lang = parts[0].split("-")[0]  # Get the main language part (e.g., 'en' from 'en-US')
+    weighted = []
+    for position, entry in enumerate(accept_language.split(",")):
+        parts = entry.split(";")
+        tag = parts[0].strip().lower()
+        quality = 1.0
+        for parameter in parts[1:]:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
         
-        # Check if the language is supported
+        lang = DEFAULT_LANGUAGE if tag == "*" else tag.split("-")[0]
         if lang in SUPPORTED_LANGUAGES:
+            weighted.append((-quality, position, lang))
+    
+    languages = []
+    for _, _, lang in sorted(weighted):
+        if lang not in languages:
             languages.append(lang)
+    return tuple(languages)
+
+def get_language_from_request(request: Request) -> str:
+    """Extract the preferred language from the request
+    
+    An explicit ?lang= query parameter ('en', 'ar' or 'both') wins;
+    otherwise the Accept-Language header is negotiated, falling back to
+    DEFAULT_LANGUAGE
+    
+    Args:
+        request: The FastAPI request object
+        
+    Returns:
+        The language code (e.g., 'en', 'ar'), or ALL_LANGUAGES
+    """
+    lang = request.query_params.get("lang")
+    if lang == ALL_LANGUAGES or lang in SUPPORTED_LANGUAGES:
+        return lang
     
-    # Return the first supported language or the default
+    languages = parse_accept_language(request.headers.get("Accept-Language", DEFAULT_LANGUAGE))
     return languages[0] if languages else DEFAULT_LANGUAGE
 
+def get_response_language(
+    request: Request,
+    lang: Optional[str] = Query(
+        None,
+        regex=f"^({'|'.join(SUPPORTED_LANGUAGES + [ALL_LANGUAGES])})$",
+        description="Response language; 'both' keeps every language's fields. Defaults to Accept-Language."
+    )
+) -> str:
+    """Dependency resolving the language a response is rendered in"""
+    return get_language_from_request(request)
+
 def get_localized_field(obj: Dict[str, Any], field: str, language: str) -> Any:
     """Get a localized field from an object
     
@@ -55,12 +163,93 @@ def get_localized_field(obj: Dict[str, Any], field: str, language: str) -> Any:
     # Fall back to the default field
     return obj.get(field)
 
-def localize_object(obj: Dict[str, Any], language: str) -> Dict[str, Any]:
+class LocalizationPlan:
+    """Precomputed field mapping that localizes objects of one shape
+
+    fields holds (output key, translated key or None) pairs and nested
+    holds (key, plan, is_list) for nested models. All key names are worked
+    out once when the plan is compiled, so applying it is one pass of dict
+    lookups per object.
+    """
+
+    __slots__ = ("fields", "nested")
+
+    def __init__(
+        self,
+        fields: Tuple[Tuple[str, Optional[str]], ...],
+        nested: Tuple[Tuple[str, "LocalizationPlan", bool], ...] = ()
+    ):
+        self.fields = fields
+        self.nested = nested
+
+    def apply(self, obj: Dict[str, Any]) -> Dict[str, Any]:
+        """Localize one object (e.g. a response model's .dict())"""
+        get = obj.get
+        localized = {}
+        for key, translated_key in self.fields:
+            value = get(translated_key) if translated_key else None
+            localized[key] = value if value else get(key)
+        for key, plan, is_list in self.nested:
+            value = localized.get(key)
+            if value is not None:
+                localized[key] = plan.apply_many(value) if is_list else plan.apply(value)
+        return localized
+
+    def apply_many(self, objs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Localize a list of objects"""
+        apply = self.apply
+        return [apply(obj) for obj in objs]
+
+def _field_mapping(keys: Tuple[str, ...], language: str) -> Tuple[Tuple[str, Optional[str]], ...]:
+    key_set = set(keys)
+    fields = []
+    for key in keys:
+        suffix = key[-3:]
+        if suffix in _LANGUAGE_SUFFIXES and key[:-3] in key_set:
+            # A translation of another field; it is folded into that field
+            continue
+        translated_key = f"{key}_{language}"
+        fields.append((key, translated_key if translated_key in key_set else None))
+    return tuple(fields)
+
+@lru_cache(maxsize=1024)
+def compile_localization_plan(model: Type[BaseModel], language: str, fields: Optional[FrozenSet[str]] = None) -> LocalizationPlan:
+    """Compile the localization plan for a response model, once per model and language
+
+    Args:
+        model: The pydantic response model
+        language: The language code (e.g., 'en', 'ar')
+        fields: The sparse fieldset selected with ?fields=, or None for all
+
+    Returns:
+        A plan mapping the model's .dict() output to the localized object
+    """
+    keys = tuple(name for name in model.__fields__ if fields is None or name in fields)
+    nested = []
+    for name in keys:
+        field = model.__fields__[name]
+        if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+            if field.shape == SHAPE_SINGLETON:
+                nested.append((name, compile_localization_plan(field.type_, language), False))
+            elif field.shape in (SHAPE_LIST, SHAPE_SEQUENCE):
+                nested.append((name, compile_localization_plan(field.type_, language), True))
+    return LocalizationPlan(_field_mapping(keys, language), tuple(nested))
+
+@lru_cache(maxsize=256)
+def _key_plan(keys: Tuple[str, ...], language: str) -> LocalizationPlan:
+    return LocalizationPlan(_field_mapping(keys, language))
+
+def localize_object(obj: Dict[str, Any], language: str, model: Optional[Type[BaseModel]] = None) -> Dict[str, Any]:
     """Localize an object by replacing fields with their localized versions
     
+    With a response model the model's compiled plan is used. Plain dicts
+    get a plan compiled from their keys; their nested dicts and lists of
+    dicts are localized the same way.
+    
     Args:
         obj: The object to localize
         language: The language code (e.g., 'en', 'ar')
+        model: The pydantic model obj was produced from, if known
         
     Returns:
         A new object with localized fields
@@ -69,25 +258,69 @@ def localize_object(obj: Dict[str, Any], language: str) -> Dict[str, Any]:
     if language == DEFAULT_LANGUAGE or not isinstance(obj, dict):
         return obj
     
-    # Create a new object with localized fields
-    localized_obj = {}
-    for key, value in obj.items():
-        # Skip fields that end with a language code
-        if any(key.endswith(f"_{lang}") for lang in SUPPORTED_LANGUAGES):
-            continue
-        
-        # Check if there's a localized version of this field
-        localized_key = f"{key}_{language}"
-        if localized_key in obj and obj[localized_key]:
-            localized_obj[key] = obj[localized_key]
-        else:
-            # If it's a nested dictionary, localize it recursively
-            if isinstance(value, dict):
-                localized_obj[key] = localize_object(value, language)
-            # If it's a list of dictionaries, localize each item
-            elif isinstance(value, list) and all(isinstance(item, dict) for item in value):
-                localized_obj[key] = [localize_object(item, language) for item in value]
-            else:
-                localized_obj[key] = value
+    if model is not None:
+        return compile_localization_plan(model, language).apply(obj)
     
-    return localized_obj
\ No newline at end of file
+    localized_obj = _key_plan(tuple(obj), language).apply(obj)
+    for key, value in localized_obj.items():
+        if isinstance(value, dict):
+            localized_obj[key] = localize_object(value, language)
+        elif isinstance(value, list) and value and isinstance(value[0], dict):
+            localized_obj[key] = [localize_object(item, language) for item in value]
+    
+    return localized_obj
+
+def localize_response(
+    content: Union[Dict[str, Any], List[Dict[str, Any]]],
+    model: Type[BaseModel],
+    language: str,
+    fields: Optional[FrozenSet[str]] = None
+) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    """Render model dicts in one language
+
+    Only the selected language's fields are kept, under their base names
+    (name instead of name/name_ar); ALL_LANGUAGES leaves content as is.
+    Unlike localize_object, the default language drops the translations too.
+    With a sparse fieldset only the selected fields are output.
+    """
+    if language == ALL_LANGUAGES:
+        return content
+    plan = compile_localization_plan(model, language, fields)
+    return plan.apply_many(content) if isinstance(content, list) else plan.apply(content)
+
+def localized_response(
+    content: Any,
+    model: Type[BaseModel],
+    language: str,
+    response: Optional[Response] = None,
+    status_code: int = 200,
+    fields: Optional[FrozenSet[str]] = None
+) -> FastJSONResponse:
+    """Build the JSON response for content rendered in one language
+
+    The response bypasses response_model serialization, which would add
+    the dropped fields back as nulls.
+
+    Args:
+        content: ORM objects or model dicts, one or a list
+        model: The pydantic response model of the items
+        language: The negotiated language, or ALL_LANGUAGES
+        response: The route's injected response, whose headers are kept
+        status_code: The response status
+        fields: The sparse fieldset content was selected with, if any
+
+    Returns:
+        A FastJSONResponse with Content-Language and Vary: Accept-Language set
+    """
+    def as_dict(item):
+        return item if isinstance(item, dict) else model.from_orm(item).dict(include=fields)
+
+    if isinstance(content, list):
+        content = [as_dict(item) for item in content]
+    else:
+        content = as_dict(content)
+
+    localized = json_response(localize_response(content, model, language, fields), response, status_code)
+    localized.headers["Content-Language"] = ", ".join(SUPPORTED_LANGUAGES) if language == ALL_LANGUAGES else language
+    localized.headers["Vary"] = LANGUAGE_VARY
+    return localized
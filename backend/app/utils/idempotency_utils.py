@@ -0,0 +1,373 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics_utils import metrics
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Request header carrying the client-generated key, and the header marking replays
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENT_REPLAY_HEADER = "Idempotent-Replayed"
+
+# How long a stored response is replayed, and how long a duplicate waits
+# for the original request to finish
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", 30))
+
+# Records and stored response bytes kept per worker by the in-memory store
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", 10000))
+IDEMPOTENCY_MAX_BYTES = int(os.environ.get("IDEMPOTENCY_MAX_BYTES", 64 * 1024 * 1024))
+
+# Maximum accepted key length
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Endpoints that honour the Idempotency-Key header
+IDEMPOTENT_ROUTES: FrozenSet[Tuple[str, str]] = frozenset({
+    ("POST", "/api/marketplace/orders"),
+    ("POST", "/api/diagnoses/"),
+})
+
+# How often a duplicate polls a shared store for the original request's response
+IDEMPOTENCY_POLL_SECONDS = float(os.environ.get("IDEMPOTENCY_POLL_SECONDS", 0.05))
+
+# Responses that are not stored, so a retry with the same key runs again
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 425, 429})
+
+@dataclass
+class IdempotencyRecord:
+    """A request seen under an idempotency key and, once finished, its response"""
+    fingerprint: str
+    expires_at: float
+    status: Optional[int] = None
+    headers: List[Tuple[bytes, bytes]] = field(default_factory=list)
+    body: bytes = b""
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    claim: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    @property
+    def completed(self) -> bool:
+        return self.status is not None
+
+    @property
+    def size(self) -> int:
+        """Approximate bytes held by the stored response"""
+        return len(self.body) + sum(len(name) + len(value) for name, value in self.headers)
+
+class MemoryIdempotencyStore:
+    """In-process idempotency store with expiry and a size bound
+
+    Records expire IDEMPOTENCY_TTL_SECONDS after they are created. Beyond
+    max_entries records or max_bytes of stored responses, the least
+    recently used completed records are dropped; a dropped key is simply
+    run again if it is retried. Requests still in progress are never
+    dropped, so duplicates keep waiting for them. Each worker keeps its
+    own records; SharedIdempotencyStore deduplicates retries that land on
+    different workers.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS,
+        max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+        max_bytes: int = IDEMPOTENCY_MAX_BYTES
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._records: "OrderedDict[str, IdempotencyRecord]" = OrderedDict()
+        self._bytes = 0
+
+    def _remove(self, key: str):
+        record = self._records.pop(key)
+        self._bytes -= record.size
+
+    def _evict(self):
+        """Drop expired, then least recently used completed, records until within both bounds"""
+        now = time.monotonic()
+        entries, size = len(self._records), self._bytes
+        evicted = []
+        for key, record in self._records.items():
+            over = entries > self.max_entries or size > self.max_bytes
+            if not over and record.expires_at > now:
+                break
+            if record.completed or record.expires_at <= now:
+                evicted.append(key)
+                entries -= 1
+                size -= record.size
+        for key in evicted:
+            self._remove(key)
+        if evicted:
+            metrics.increment("idempotency.evictions", len(evicted))
+
+    async def get(self, key: str) -> Optional[IdempotencyRecord]:
+        record = self._records.get(key)
+        if record is None:
+            return None
+        if record.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._records.move_to_end(key)
+        return record
+
+    async def begin(self, key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+        """Claim a key for a request that is about to run; None if it is already claimed"""
+        if await self.get(key) is not None:
+            return None
+        record = IdempotencyRecord(fingerprint=fingerprint, expires_at=time.monotonic() + self.ttl_seconds)
+        self._records[key] = record
+        self._evict()
+        return record
+
+    async def complete(self, key: str, record: IdempotencyRecord, status: int, headers, body: bytes):
+        """Store the response of a finished request"""
+        record.status, record.headers, record.body = status, headers, body
+        if self._records.get(key) is record:
+            self._bytes += record.size
+            self._evict()
+        record.done.set()
+
+    async def release(self, key: str, record: IdempotencyRecord):
+        """Forget a request that failed so that it can be retried"""
+        if self._records.get(key) is record:
+            self._remove(key)
+        record.done.set()
+
+    async def wait(self, key: str, record: IdempotencyRecord, timeout: float):
+        """Wait until a request in progress completes or is released
+
+        Raises:
+            asyncio.TimeoutError: If it is still running after timeout seconds
+        """
+        await asyncio.wait_for(record.done.wait(), timeout)
+
+    @property
+    def stored_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+class SharedIdempotencyStore:
+    """Idempotency records kept in a shared store, so retries are deduplicated across workers
+
+    Uses the versioned get and compare-and-set of a shared key-value
+    store (see rate_limit_utils.LocalSharedStore), so exactly one worker
+    claims a key. A record is stored as (claim, fingerprint, status,
+    headers, body) and expires with the store's TTL; the size bounds are
+    left to the store's own eviction. Records use wall-clock time since
+    they are shared between hosts, and duplicates poll for the original
+    request's response instead of waiting on an event.
+    """
+
+    def __init__(self, store, ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS, poll_seconds: float = IDEMPOTENCY_POLL_SECONDS):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.poll_seconds = poll_seconds
+
+    async def get(self, key: str) -> Optional[IdempotencyRecord]:
+        value, _ = await self.store.get(key)
+        if value is None:
+            return None
+        claim, fingerprint, expires_at, status, headers, body = value
+        return IdempotencyRecord(
+            fingerprint=fingerprint, expires_at=expires_at, status=status, headers=list(headers), body=body, claim=claim
+        )
+
+    async def begin(self, key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+        """Claim a key for a request that is about to run; None if it is already claimed"""
+        value, version = await self.store.get(key)
+        if value is not None:
+            return None
+        record = IdempotencyRecord(fingerprint=fingerprint, expires_at=time.time() + self.ttl_seconds)
+        stored = (record.claim, fingerprint, record.expires_at, None, (), b"")
+        if not await self.store.compare_and_set(key, version, stored, self.ttl_seconds):
+            return None
+        return record
+
+    async def _replace(self, key: str, record: IdempotencyRecord, value, ttl_seconds: float):
+        # Only the claim's owner may finish it; a record that expired and
+        # was claimed again by another request is left alone
+        current, version = await self.store.get(key)
+        if current is not None and current[0] == record.claim:
+            await self.store.compare_and_set(key, version, value, ttl_seconds)
+
+    async def complete(self, key: str, record: IdempotencyRecord, status: int, headers, body: bytes):
+        """Store the response of a finished request"""
+        record.status, record.headers, record.body = status, headers, body
+        value = (record.claim, record.fingerprint, record.expires_at, status, tuple(headers), body)
+        await self._replace(key, record, value, max(record.expires_at - time.time(), 1))
+
+    async def release(self, key: str, record: IdempotencyRecord):
+        """Forget a request that failed so that it can be retried"""
+        await self._replace(key, record, None, 1)
+
+    async def wait(self, key: str, record: IdempotencyRecord, timeout: float):
+        """Poll until a request in progress completes or is released
+
+        Raises:
+            asyncio.TimeoutError: If it is still running after timeout seconds
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_seconds)
+            current = await self.get(key)
+            if current is None or current.claim != record.claim or current.completed:
+                return
+        raise asyncio.TimeoutError()
+
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def _bearer_token(scope: Scope) -> Optional[str]:
+    authorization = _header(scope, b"authorization")
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    return authorization[7:].strip()
+
+def _fingerprint(scope: Scope, body: bytes) -> str:
+    # Multipart boundaries are random per attempt, so they are left out
+    content = body
+    content_type = _header(scope, b"content-type") or ""
+    if content_type.startswith("multipart/") and "boundary=" in content_type:
+        boundary = content_type.split("boundary=", 1)[1].split(";", 1)[0].strip('"')
+        content = body.replace(boundary.encode("latin-1"), b"")
+    return hashlib.sha256(b"%s %s\n%s" % (scope["method"].encode(), scope["path"].encode(), content)).hexdigest()
+
+async def _json_error(send: Send, status: int, detail: str):
+    body = ('{"detail":"%s"}' % detail).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class IdempotencyMiddleware:
+    """Replay the stored response for retried POSTs carrying an Idempotency-Key
+
+    Keys are scoped to the authenticated user and the endpoint. The first
+    request with a key runs normally and its response is stored; retries
+    with the same key and request body get that response back (with an
+    Idempotent-Replayed header) without running the endpoint again, and
+    retries that arrive while the first request is still running wait for
+    it. Reusing a key for a different request body is rejected with 422.
+    Server errors and retryable statuses are not stored. Records are kept
+    per worker unless a SharedIdempotencyStore is passed as the store.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        subject_resolver: Callable[[str], Optional[str]],
+        store=None,
+        routes: FrozenSet[Tuple[str, str]] = IDEMPOTENT_ROUTES
+    ):
+        self.app = app
+        self.subject_resolver = subject_resolver
+        self.store = store if store is not None else MemoryIdempotencyStore()
+        self.routes = routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+
+        idempotency_key = _header(scope, IDEMPOTENCY_KEY_HEADER.lower().encode())
+        token = _bearer_token(scope)
+        subject = self.subject_resolver(token) if token else None
+        if not idempotency_key or subject is None:
+            # No key, or the request will be rejected as unauthenticated anyway
+            await self.app(scope, receive, send)
+            return
+
+        if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            await _json_error(send, 400, f"{IDEMPOTENCY_KEY_HEADER} is too long")
+            return
+
+        # Buffer the body to fingerprint it, then hand it on unchanged
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        fingerprint = _fingerprint(scope, body)
+        key = f"{subject}:{scope['method']}:{scope['path']}:{idempotency_key}"
+
+        while True:
+            record = await self.store.get(key)
+            if record is None:
+                record = await self.store.begin(key, fingerprint)
+                if record is not None:
+                    await self._execute(scope, receive, send, body, key, record)
+                    return
+                # Claimed by a concurrent request in between: look again
+                continue
+            if record.fingerprint != fingerprint:
+                await _json_error(send, 422, f"{IDEMPOTENCY_KEY_HEADER} was already used for a different request")
+                return
+            if not record.completed:
+                metrics.increment("idempotency.waits")
+                try:
+                    await self.store.wait(key, record, IDEMPOTENCY_WAIT_SECONDS)
+                except asyncio.TimeoutError:
+                    await _json_error(send, 409, f"A request with this {IDEMPOTENCY_KEY_HEADER} is still in progress")
+                    return
+                # Either replay the finished response or, if it failed, run again
+                continue
+            metrics.increment("idempotency.replays")
+            await self._replay(record, send)
+            return
+
+    async def _replay(self, record: IdempotencyRecord, send: Send):
+        await send({
+            "type": "http.response.start",
+            "status": record.status,
+            "headers": record.headers + [(IDEMPOTENT_REPLAY_HEADER.lower().encode(), b"true")]
+        })
+        await send({"type": "http.response.body", "body": record.body})
+
+    async def _execute(self, scope: Scope, receive: Receive, send: Send, body: bytes, key: str, record: IdempotencyRecord):
+        response: Dict[str, object] = {"status": None, "headers": [], "body": [], "finished": False}
+        body_sent = False
+
+        async def replay_body() -> Message:
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def capture(message: Message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+                response["finished"] = not message.get("more_body", False)
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, capture)
+        finally:
+            status = response["status"]
+            if response["finished"] and status < 500 and status not in RETRYABLE_STATUS_CODES:
+                await self.store.complete(key, record, status, response["headers"], b"".join(response["body"]))
+            else:
+                await self.store.release(key, record)
@@ -0,0 +1,73 @@
+import threading
+from typing import Callable, Dict, Any
+
+class MetricsRegistry:
+    """In-process registry of counters, gauges and timers
+
+    Values are kept per worker process and exposed through the /metrics
+    endpoint. Gauges can be registered as callables so that they are
+    sampled when a snapshot is taken rather than updated on every change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._gauge_callbacks: Dict[str, Callable[[], Any]] = {}
+        self._timers: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1):
+        """Increment a counter by the given value"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        """Set a gauge to an absolute value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def register_gauge(self, name: str, callback: Callable[[], Any]):
+        """Register a callable that is sampled whenever a snapshot is taken"""
+        with self._lock:
+            self._gauge_callbacks[name] = callback
+
+    def observe(self, name: str, seconds: float):
+        """Record a duration for a timer"""
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            timer["count"] += 1
+            timer["total_seconds"] += seconds
+            if seconds > timer["max_seconds"]:
+                timer["max_seconds"] = seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a point-in-time copy of all metrics"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            callbacks = dict(self._gauge_callbacks)
+            timers = {}
+            for name, timer in self._timers.items():
+                timers[name] = dict(timer)
+                timers[name]["avg_seconds"] = timer["total_seconds"] / timer["count"] if timer["count"] else 0.0
+
+        for name, callback in callbacks.items():
+            gauges[name] = callback()
+
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "timers": timers
+        }
+
+    def reset(self):
+        """Clear all recorded values (registered gauge callbacks are kept)"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timers.clear()
+
+# Shared registry for the worker process
+metrics = MetricsRegistry()
@@ -0,0 +1,172 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import DateTime, String, literal, tuple_, type_coerce
+from sqlalchemy.types import TypeEngine
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row of a page as an opaque cursor
+
+    Args:
+        values: The sort key values, in sort column order
+
+    Returns:
+        A URL-safe cursor string
+    """
+    encoded = [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    payload = json.dumps(encoded, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def _decode_value(value: Any, key_type: TypeEngine) -> Any:
+    # Datetimes arrive encoded by encode_cursor or as the raw text SQLite
+    # stores them; anything else must already be of the column's type
+    if isinstance(key_type, DateTime):
+        if isinstance(value, dict):
+            return datetime.fromisoformat(value["dt"])
+        datetime.fromisoformat(value)
+        return value
+    expected = key_type.python_type
+    if expected is float:
+        expected = (int, float)
+    if isinstance(value, bool) or not isinstance(value, expected):
+        raise TypeError(f"Expected {key_type} in cursor")
+    return value
+
+def decode_cursor(cursor: str, key_types: Sequence[TypeEngine], nullable: bool = False) -> List[Any]:
+    """Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: The cursor string sent by the client
+        key_types: The types of the sort columns the values must match
+        nullable: Whether values may be null
+
+    Returns:
+        The sort key values
+
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(payload)
+        if not isinstance(values, list) or len(values) != len(key_types):
+            raise ValueError("Unexpected cursor shape")
+        return [
+            None if value is None and nullable else _decode_value(value, key_type)
+            for value, key_type in zip(values, key_types)
+        ]
+    except (binascii.Error, ValueError, KeyError, TypeError, NotImplementedError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def _key_expression(column, value):
+    # SQLite stores datetimes as text and compares them as text, so the raw
+    # stored string (captured in the cursor) is compared as-is. Databases
+    # with native timestamps hand back datetimes, which are bound normally.
+    if isinstance(value, str) and isinstance(column.type, DateTime):
+        return type_coerce(column, String), literal(value, String)
+    return column, literal(value, column.type)
+
+def keyset_condition(key_columns: Sequence[Any], values: Sequence[Any], descending: bool = True):
+    """Build the WHERE clause selecting rows after a cursor position
+
+    Args:
+        key_columns: The sort columns, ending with a unique column (e.g. id)
+        values: The sort key values decoded from the cursor
+        descending: Whether the listing is sorted in descending order
+
+    Returns:
+        A SQLAlchemy boolean expression
+    """
+    pairs = [_key_expression(column, value) for column, value in zip(key_columns, values)]
+    columns = tuple_(*[column for column, _ in pairs])
+    bound = tuple_(*[value for _, value in pairs])
+    return columns < bound if descending else columns > bound
+
+async def _fetch_page(db, query, key_columns, response, cursor, skip, limit, descending) -> list:
+    raw_keys = [
+        (type_coerce(column, String) if isinstance(column.type, DateTime) else column).label(f"cursor_key_{index}")
+        for index, column in enumerate(key_columns)
+    ]
+    query = query.add_columns(*raw_keys).order_by(
+        *[column.desc() if descending else column.asc() for column in key_columns]
+    )
+
+    if cursor:
+        values = decode_cursor(cursor, [column.type for column in key_columns])
+        query = query.filter(keyset_condition(key_columns, values, descending))
+    elif skip:
+        query = query.offset(skip)
+
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1][-len(key_columns):])
+
+    return rows
+
+async def paginate(
+    db,
+    query,
+    key_columns: Sequence[Any],
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
+    limit: int = 100,
+    descending: bool = True
+) -> list:
+    """Fetch one page of an ORM query using keyset pagination
+
+    The query is ordered by key_columns and, when a cursor is given, resumes
+    strictly after the row it points to. The cursor for the following page
+    is returned in the X-Next-Cursor header when more rows exist. Passing
+    skip instead of a cursor falls back to offset pagination for older
+    clients.
+
+    Args:
+        db: The async database session
+        query: A select() of a single ORM entity, with filters applied
+        key_columns: The sort columns, ending with a unique column (e.g. id)
+        response: The response to attach the next cursor header to
+        cursor: The cursor returned with the previous page
+        skip: Number of rows to skip (offset compatibility mode)
+        limit: Maximum number of rows to return
+        descending: Whether to sort in descending order
+
+    Returns:
+        The ORM objects for the page
+    """
+    rows = await _fetch_page(db, query, key_columns, response, cursor, skip, limit, descending)
+    return [row[0] for row in rows]
+
+async def paginate_rows(
+    db,
+    query,
+    key_columns: Sequence[Any],
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
+    limit: int = 100,
+    descending: bool = True
+) -> list:
+    """Fetch one page of a column select() using keyset pagination
+
+    Same as paginate, for queries selecting columns (e.g. a
+    serialization_utils projection) instead of one ORM entity.
+
+    Returns:
+        The rows for the page, as tuples of the selected columns
+    """
+    rows = await _fetch_page(db, query, key_columns, response, cursor, skip, limit, descending)
+    return [tuple(row[:-len(key_columns)]) for row in rows]
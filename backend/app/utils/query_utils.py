@@ -0,0 +1,133 @@
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Enable per-request SQL statement counting (development and tests)
+QUERY_COUNTING_ENABLED = os.environ.get("SQL_QUERY_COUNTING", "false").lower() in ("1", "true", "yes")
+
+# Response header reporting the number of statements a request executed
+QUERY_COUNT_HEADER = "X-Query-Count"
+
+# Upper bound on SQL statements per request for each list endpoint,
+# including the authenticated user lookup where the route requires one and
+# the conditional GET validator query
+LIST_QUERY_BUDGETS: Dict[Tuple[str, str], int] = {
+    ("GET", "/api/plants/"): 3,
+    ("GET", "/api/plants/{plant_id}/watering-history"): 3,
+    ("GET", "/api/plants/types"): 1,
+    ("GET", "/api/diagnoses/"): 4,
+    ("GET", "/api/diagnoses/conditions"): 1,
+    ("GET", "/api/marketplace/categories"): 1,
+    ("GET", "/api/marketplace/products"): 2,
+    ("GET", "/api/marketplace/products/{product_id}/reviews"): 2,
+    ("POST", "/api/marketplace/cart/validate"): 1,
+    ("GET", "/api/marketplace/orders"): 3,
+}
+
+class QueryCounter:
+    """Collects the SQL statements executed while it is active"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+_current_counter: ContextVar[Optional[QueryCounter]] = ContextVar("query_counter", default=None)
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.statements.append(statement)
+
+def install_query_counter(sync_engine):
+    """Attach the statement counter to an engine (or AsyncEngine.sync_engine)"""
+    if not event.contains(sync_engine, "before_cursor_execute", _record_statement):
+        event.listen(sync_engine, "before_cursor_execute", _record_statement)
+
+@contextmanager
+def count_queries():
+    """Count the statements executed in the current context
+
+    Example:
+        with count_queries() as counter:
+            await db.execute(...)
+        print(counter.count)
+    """
+    counter = QueryCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """Fail if more than limit statements run inside the block
+
+    Raises:
+        AssertionError: With the executed statements listed
+    """
+    with count_queries() as counter:
+        yield counter
+    if counter.count > limit:
+        statements = "\n".join(counter.statements)
+        raise AssertionError(f"Expected at most {limit} SQL statements, got {counter.count}:\n{statements}")
+
+def assert_response_within_budget(response, method: str, route: str):
+    """Check a test client response against LIST_QUERY_BUDGETS
+
+    Requires the app to run with SQL_QUERY_COUNTING enabled.
+
+    Raises:
+        AssertionError: If the request executed more statements than allowed
+    """
+    limit = LIST_QUERY_BUDGETS[(method, route)]
+    count = int(response.headers[QUERY_COUNT_HEADER])
+    if count > limit:
+        raise AssertionError(f"{method} {route} executed {count} SQL statements (budget {limit})")
+
+class QueryCountMiddleware:
+    """Count SQL statements per request
+
+    Adds an X-Query-Count response header and logs a warning when a list
+    endpoint exceeds its budget in LIST_QUERY_BUDGETS.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries() as counter:
+            async def send_with_count(message: Message):
+                if message["type"] == "http.response.start":
+                    message.setdefault("headers", [])
+                    message["headers"].append((QUERY_COUNT_HEADER.lower().encode(), str(counter.count).encode()))
+                    self._check_budget(scope, counter)
+                await send(message)
+
+            await self.app(scope, receive, send_with_count)
+
+    def _check_budget(self, scope: Scope, counter: QueryCounter):
+        route = scope.get("route")
+        if route is None:
+            return
+        limit = LIST_QUERY_BUDGETS.get((scope["method"], route.path))
+        if limit is not None and counter.count > limit:
+            logger.warning(
+                "%s %s executed %d SQL statements (budget %d)",
+                scope["method"], route.path, counter.count, limit
+            )
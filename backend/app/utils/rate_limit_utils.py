@@ -0,0 +1,206 @@
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .metrics_utils import metrics
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Bucket size and refill rate, in cost units; a plain request costs 1
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_CAPACITY = float(os.environ.get("RATE_LIMIT_CAPACITY", 120))
+RATE_LIMIT_REFILL_PER_SECOND = float(os.environ.get("RATE_LIMIT_REFILL_PER_SECOND", 2))
+
+# Buckets kept per worker by the in-memory backend
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", 100000))
+
+# Cost of the expensive endpoints
+ROUTE_COSTS: Dict[Tuple[str, str], float] = {
+    ("POST", "/api/diagnoses/"): 10,             # Image upload and model inference
+    ("POST", "/api/users/login"): 5,             # bcrypt
+    ("POST", "/api/users/register"): 5,          # bcrypt
+    ("POST", "/api/marketplace/orders"): 3,
+    ("POST", "/api/marketplace/cart/validate"): 2,
+    ("GET", "/api/sync"): 2,                     # One query per synced collection
+}
+
+# Listings that cost more when they run a full-text search
+SEARCH_ROUTES: FrozenSet[Tuple[str, str]] = frozenset({
+    ("GET", "/api/marketplace/products"),
+})
+SEARCH_COST = 3
+
+# Paths that are never limited
+EXEMPT_PATHS: FrozenSet[str] = frozenset({"/", "/metrics", "/docs", "/openapi.json"})
+
+class MemoryRateLimitBackend:
+    """Token buckets held in this worker's memory
+
+    Each bucket is (tokens, last refill time) and is refilled lazily when
+    it is next used, so there is no background work. Checking and
+    updating a bucket does not await, so it is atomic on the event loop.
+    The least recently used buckets are dropped beyond max_keys; a
+    dropped bucket starts full again, which only ever errs towards
+    allowing a request.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def consume(self, key: str, cost: float, capacity: float, refill_per_second: float) -> Tuple[bool, float]:
+        """Take cost tokens from the key's bucket if it holds enough
+
+        Returns:
+            Whether the request is allowed, and if not, the seconds until it would be
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = capacity
+        else:
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_per_second)
+            self._buckets.move_to_end(key)
+
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / refill_per_second
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class LocalSharedStore:
+    """In-process stand-in for a shared key-value store
+
+    Offers the two operations the shared backend needs: a versioned read
+    and a compare-and-set with expiry. A Redis-backed store implements
+    the same methods (WATCH/MULTI or a Lua script) so that every worker
+    draws from the same buckets.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[Any, int, float]] = {}
+
+    async def get(self, key: str) -> Tuple[Optional[Any], int]:
+        entry = self._values.get(key)
+        if entry is None or entry[2] <= time.time():
+            return None, 0
+        return entry[0], entry[1]
+
+    async def compare_and_set(self, key: str, version: int, value: Any, ttl_seconds: float) -> bool:
+        """Store value if the key is still at version; returns whether it was stored"""
+        _, current_version = await self.get(key)
+        if current_version != version:
+            return False
+        self._values[key] = (value, version + 1, time.time() + ttl_seconds)
+        return True
+
+class SharedRateLimitBackend:
+    """Token buckets kept in a shared store, so the limit holds across workers
+
+    Buckets use wall-clock time since they are shared between hosts, and
+    expire once they would have refilled completely. A bucket whose
+    update loses a race is read again; after max_attempts conflicts the
+    request is allowed rather than failed.
+    """
+
+    def __init__(self, store, max_attempts: int = 5):
+        self.store = store
+        self.max_attempts = max_attempts
+
+    async def consume(self, key: str, cost: float, capacity: float, refill_per_second: float) -> Tuple[bool, float]:
+        for _ in range(self.max_attempts):
+            bucket, version = await self.store.get(key)
+            now = time.time()
+            tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * refill_per_second)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            ttl_seconds = (capacity - tokens) / refill_per_second + 1
+            if await self.store.compare_and_set(key, version, (tokens, now), ttl_seconds):
+                return allowed, 0.0 if allowed else (cost - tokens) / refill_per_second
+
+        metrics.increment("rate_limit.conflicts")
+        return True, 0.0
+
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def route_cost(method: str, path: str, query_string: bytes = b"") -> float:
+    """Return the cost of a request in bucket tokens"""
+    cost = ROUTE_COSTS.get((method, path), 1)
+    if (method, path) in SEARCH_ROUTES and b"search=" in query_string:
+        cost = max(cost, SEARCH_COST)
+    return cost
+
+class RateLimitMiddleware:
+    """Limit each client to a token bucket, answering 429 when it is empty
+
+    Authenticated requests are limited per user id and anonymous ones per
+    client IP. Each request takes route_cost() tokens, so one diagnosis
+    upload uses as much of the budget as ten cheap reads. The token's
+    user id is cached per token, so the check costs a dictionary lookup
+    and a little arithmetic per request.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        subject_resolver: Callable[[str], Optional[str]],
+        backend=None,
+        capacity: float = RATE_LIMIT_CAPACITY,
+        refill_per_second: float = RATE_LIMIT_REFILL_PER_SECOND
+    ):
+        self.app = app
+        self.backend = backend if backend is not None else MemoryRateLimitBackend()
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._subject = lru_cache(maxsize=4096)(subject_resolver)
+
+    def _key(self, scope: Scope) -> str:
+        authorization = _header(scope, b"authorization")
+        if authorization and authorization.lower().startswith("bearer "):
+            subject = self._subject(authorization[7:].strip())
+            if subject is not None:
+                return f"user:{subject}"
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        cost = min(route_cost(scope["method"], scope["path"], scope.get("query_string", b"")), self.capacity)
+        allowed, retry_after = await self.backend.consume(self._key(scope), cost, self.capacity, self.refill_per_second)
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        metrics.increment("rate_limit.rejected")
+        body = b'{"detail":"Too many requests"}'
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(math.ceil(retry_after), 1)).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,220 @@
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_SINGLETON
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import RelationshipProperty
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the standard encoder
+    orjson = None
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson
+
+    orjson serializes datetimes, enums and UUIDs itself, so content does
+    not go through jsonable_encoder first. Without orjson installed it
+    behaves like JSONResponse.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(jsonable_encoder(content))
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+def json_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> FastJSONResponse:
+    """Encode content with FastJSONResponse, keeping the headers set on the route's injected response
+
+    Returning a response directly skips response_model validation and
+    serialization; the route's response_model still documents the schema.
+    """
+    fast = FastJSONResponse(content=content, status_code=status_code)
+    if response is not None:
+        for key, value in response.headers.items():
+            if key != "content-length":
+                fast.headers[key] = value
+    return fast
+
+class Projection:
+    """The columns a response model needs and how result rows map back to dicts
+
+    Produced by compile_projection. Fields are selected as plain columns
+    (SQLAlchemy Core, no ORM identity map or object construction) and
+    nested single-object models come from an outer join, so each row maps
+    straight to the dict the response model would have produced.
+    """
+
+    __slots__ = ("columns", "joins", "keys", "nested", "defaults")
+
+    def __init__(self, columns: tuple, joins: tuple, keys: Tuple[str, ...], nested: tuple, defaults: Dict[str, Any]):
+        self.columns = columns
+        self.joins = joins
+        self.keys = keys
+        self.nested = nested  # (key, first column, column count, keys, position of the primary key)
+        self.defaults = defaults
+
+    def project(self, query, *extra_columns):
+        """Replace the entity a select() returns with the projected columns, keeping its filters
+
+        Args:
+            query: A select() of the entity, with filters applied
+            extra_columns: Columns selected after the projection (e.g. for
+                validators) that are left out of the mapped dicts
+        """
+        query = query.with_only_columns(*self.columns, *extra_columns)
+        for relationship in self.joins:
+            query = query.outerjoin(relationship)
+        return query
+
+    def to_dicts(self, rows: Sequence[Sequence[Any]]) -> List[Dict[str, Any]]:
+        """Map result rows (in column order) to response dicts"""
+        keys, nested, defaults = self.keys, self.nested, self.defaults
+        if not nested and not defaults:
+            return [dict(zip(keys, row)) for row in rows]
+
+        items = []
+        for row in rows:
+            item = dict(zip(keys, row))
+            for key, default in defaults.items():
+                if item[key] is None:
+                    item[key] = default
+            for key, start, count, nested_keys, primary_key in nested:
+                values = row[start:start + count]
+                item[key] = dict(zip(nested_keys, values)) if values[primary_key] is not None else None
+            items.append(item)
+        return items
+
+def _column_attribute(entity, name: str):
+    attribute = getattr(entity, name, None)
+    if attribute is None or not hasattr(attribute, "property"):
+        return None
+    if isinstance(attribute.property, RelationshipProperty):
+        return None
+    return attribute
+
+def _field_columns(entity, model: Type[BaseModel], fields: Optional[FrozenSet[str]] = None) -> Tuple[list, Tuple[str, ...], Dict[str, Any]]:
+    columns, keys, defaults = [], [], {}
+    for name, field in model.__fields__.items():
+        if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+            continue
+        if fields is not None and name not in fields:
+            continue
+        attribute = _column_attribute(entity, name)
+        if attribute is None:
+            raise ValueError(f"{model.__name__}.{name} has no column on {entity.__name__}")
+        columns.append(attribute.label(name))
+        keys.append(name)
+        if not field.allow_none and field.default is not None:
+            defaults[name] = field.default
+    return columns, tuple(keys), defaults
+
+@lru_cache(maxsize=256)
+def compile_projection(entity, model: Type[BaseModel], fields: Optional[FrozenSet[str]] = None) -> Projection:
+    """Compile the Core projection for an ORM entity and its response model
+
+    Every selected scalar field of the model must be a column (or
+    synonym) of the entity with the same name; nested models must be
+    many-to-one relationships, which are outer joined only when selected.
+    Models with nested lists keep using the ORM path.
+
+    Args:
+        entity: The ORM model class the query selects
+        model: The pydantic response model
+        fields: The fields to select (see field_selector), or None for all
+
+    Returns:
+        The projection, cached per entity, model and fields
+
+    Raises:
+        ValueError: If a field cannot be selected as a column
+    """
+    columns, keys, defaults = _field_columns(entity, model, fields)
+    joins, nested = [], []
+    for name, field in model.__fields__.items():
+        if not (isinstance(field.type_, type) and issubclass(field.type_, BaseModel)):
+            continue
+        if fields is not None and name not in fields:
+            continue
+        relationship = getattr(entity, name, None)
+        if relationship is None or not isinstance(relationship.property, RelationshipProperty) \
+                or relationship.property.uselist or field.shape != SHAPE_SINGLETON:
+            raise ValueError(f"{model.__name__}.{name} is not a many-to-one relationship of {entity.__name__}")
+
+        target = relationship.property.mapper.class_
+        nested_columns, nested_keys, _ = _field_columns(target, field.type_)
+        primary_key = sa_inspect(target).primary_key[0].name
+        if primary_key not in nested_keys:
+            raise ValueError(f"{field.type_.__name__} must include {target.__name__}.{primary_key}")
+
+        nested.append((name, len(columns), len(nested_columns), nested_keys, nested_keys.index(primary_key)))
+        columns.extend(column.label(f"{name}__{key}") for column, key in zip(nested_columns, nested_keys))
+        joins.append(relationship)
+
+    return Projection(tuple(columns), tuple(joins), keys, tuple(nested), defaults)
+
+def get_projection(entity, model: Type[BaseModel], fields: Optional[FrozenSet[str]] = None) -> Projection:
+    """compile_projection for a request, reporting unavailable fields as 400
+
+    Raises:
+        HTTPException: If a requested field cannot be selected as a column
+    """
+    try:
+        return compile_projection(entity, model, fields)
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Field not available for selection: {error}"
+        )
+
+def field_selector(model: Type[BaseModel]):
+    """Build the dependency parsing a ?fields= sparse fieldset for a response model
+
+    Requested names are validated against the model's top-level fields
+    (a nested model is selected as a whole). The translations of each
+    requested field (e.g. name_ar for name) are selected with it, so the
+    response can still be rendered in the negotiated language.
+
+    Args:
+        model: The pydantic response model of the endpoint
+
+    Returns:
+        A dependency returning the frozenset of fields to select, or None for all
+    """
+    # Imported here since i18n_utils renders its responses with this module
+    from .i18n_utils import SUPPORTED_LANGUAGES
+
+    names = tuple(model.__fields__)
+    translations: Dict[str, Tuple[str, ...]] = {
+        name: tuple(f"{name}_{language}" for language in SUPPORTED_LANGUAGES if f"{name}_{language}" in model.__fields__)
+        for name in names
+    }
+
+    def select_fields(
+        fields: Optional[str] = Query(
+            None,
+            description=f"Comma-separated subset of fields to return: {', '.join(names)}"
+        )
+    ) -> Optional[FrozenSet[str]]:
+        if not fields:
+            return None
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested.difference(names)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+        for name in list(requested):
+            requested.update(translations[name])
+        return frozenset(requested)
+
+    return select_fields
+
+def fieldset_key(fields: Optional[FrozenSet[str]]) -> Optional[str]:
+    """A stable representation of a sparse fieldset for cache validators"""
+    return ",".join(sorted(fields)) if fields is not None else None
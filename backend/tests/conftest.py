@@ -0,0 +1,131 @@
+"""Shared fixtures: the API on a throwaway SQLite database migrated to head
+
+Settings are read from the environment when the app modules are imported,
+so they are set here before anything from app is imported. Rate limiting
+is off, since tests make many requests from one client, and SQL statements
+are counted per request for the query budget checks.
+"""
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="hadeeqati-tests-")
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{TEST_DATA_DIR}/test.db")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("SQL_QUERY_COUNTING", "true")
+sys.path.insert(0, str(BACKEND_DIR))
+
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.database import ASYNC_DATABASE_URL, SessionLocal, configure_engine, engine
+from app.models import Product, ProductCategory, User
+from app.services import auth_service
+
+@pytest.fixture(scope="session")
+def migrated_database():
+    """Create the schema the way deployments do, with alembic upgrade head"""
+    alembic_config = Config()
+    alembic_config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    command.upgrade(alembic_config, "head")
+    yield engine
+
+@pytest.fixture(scope="session")
+def fastapi_app(migrated_database):
+    from app.main import app
+    return app
+
+@pytest.fixture(scope="session")
+def client(fastapi_app):
+    """A test client whose requests all run on one event loop
+
+    Requests sent from several threads at once are served concurrently,
+    which the concurrency tests rely on.
+    """
+    with TestClient(fastapi_app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="session")
+def async_sessions(migrated_database):
+    """Async sessions usable from any event loop (e.g. one per asyncio.run)
+
+    The app's pooled engine keeps its connections on the loop that opened
+    them, so tests driving services directly use unpooled connections.
+    """
+    test_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool, connect_args={"check_same_thread": False})
+    configure_engine(test_engine.sync_engine, ASYNC_DATABASE_URL, "test")
+    yield async_sessionmaker(bind=test_engine, autoflush=False, expire_on_commit=False)
+
+@pytest.fixture
+def db(migrated_database):
+    """A synchronous session for seeding and inspecting rows"""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture(scope="session")
+def password_hash(migrated_database):
+    return auth_service.pwd_context.hash("password")
+
+@pytest.fixture
+def make_user(migrated_database, password_hash):
+    """Insert a user and return its id, email, password and bearer headers"""
+    def make(is_admin: bool = False) -> SimpleNamespace:
+        user_id = str(uuid.uuid4())
+        session = SessionLocal()
+        try:
+            session.add(User(
+                id=user_id,
+                email=f"{user_id}@example.com",
+                username=user_id,
+                full_name="Test User",
+                hashed_password=password_hash,
+                is_active=True,
+                is_admin=is_admin
+            ))
+            session.commit()
+        finally:
+            session.close()
+        token = auth_service.create_access_token({"sub": user_id})
+        return SimpleNamespace(
+            id=user_id,
+            username=user_id,
+            email=f"{user_id}@example.com",
+            password="password",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+    return make
+
+@pytest.fixture
+def make_product(migrated_database):
+    """Insert an available product and return its id"""
+    def make(stock_quantity: int = 10, price: float = 5.0) -> str:
+        product_id = str(uuid.uuid4())
+        session = SessionLocal()
+        try:
+            session.add(Product(
+                id=product_id,
+                name=f"Product {product_id[:8]}",
+                description="A test product",
+                price=price,
+                category=ProductCategory.SEEDS,
+                stock_quantity=stock_quantity,
+                is_available=True
+            ))
+            session.commit()
+        finally:
+            session.close()
+        return product_id
+    return make
@@ -0,0 +1,64 @@
+"""Autocomplete suggestions from the in-memory indexes"""
+import asyncio
+import uuid
+
+from app.models import Product
+from app.services import autocomplete_service
+
+def suggest(client, q, headers=None, **params):
+    return client.get("/api/search/autocomplete", params={"q": q, **params}, headers=headers or {})
+
+def create_plant(client, user, plant_name):
+    response = client.post("/api/plants/", json={"nickname": "Window plant", "plant_name": plant_name}, headers=user.headers)
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def test_plant_names_are_suggested_only_to_their_owner(client, make_user):
+    owner, other = make_user(), make_user()
+    plant_name = f"Zamioculcas {uuid.uuid4().hex[:8]}"
+    create_plant(client, owner, plant_name)
+
+    own = suggest(client, plant_name, owner.headers)
+    someone_elses = suggest(client, plant_name, other.headers)
+    anonymous = suggest(client, plant_name)
+
+    assert [item["name"] for item in own.json()] == [plant_name]
+    assert someone_elses.json() == []
+    assert anonymous.json() == []
+
+def test_plant_name_suggestions_require_authentication(client):
+    assert suggest(client, "monstera", types="plant_name").status_code == 401
+    assert suggest(client, "monstera", types="product").status_code == 200
+
+def test_deleted_plant_name_is_no_longer_suggested(client, make_user):
+    user = make_user()
+    plant_name = f"Calathea {uuid.uuid4().hex[:8]}"
+    plant_id = create_plant(client, user, plant_name)
+
+    assert client.delete(f"/api/plants/{plant_id}", headers=user.headers).status_code == 204
+    assert suggest(client, plant_name, user.headers).json() == []
+
+def test_rebuilt_index_leaves_out_deleted_products(async_sessions, make_product, db):
+    live, deleted = make_product(), make_product()
+    db.get(Product, deleted).is_deleted = True
+    db.commit()
+
+    async def rebuild():
+        async with async_sessions() as session:
+            await autocomplete_service.build_index(session)
+    asyncio.run(rebuild())
+
+    def found(product_id):
+        return [item["id"] for item in autocomplete_service.suggest(f"Product {product_id[:8]}", kinds=["product"])]
+    assert found(live) == [live]
+    assert found(deleted) == []
+
+def test_exact_name_comes_before_longer_names():
+    index = autocomplete_service.PrefixIndex()
+    index.rebuild([
+        ("product", "1", ["Rosemary"], {"id": "1"}),
+        ("product", "2", ["Rose"], {"id": "2"}),
+        ("product", "3", ["Desert Rose"], {"id": "3"}),
+    ])
+
+    assert [item["id"] for item in index.search("rose")] == ["2", "3", "1"]
@@ -0,0 +1,101 @@
+"""Checkout stock handling: parallel checkouts never oversell"""
+import asyncio
+
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+
+from app.models import Product
+from app.services import order_service
+
+STOCK = 5
+CHECKOUTS = 20
+
+async def checkout(sessions, product_ids, quantity: int = 1) -> bool:
+    """Run the stock part of POST /api/marketplace/orders in its own transaction"""
+    quantities = {product_id: quantity for product_id in sorted(product_ids)}
+    async with sessions() as db:
+        try:
+            products = await order_service.lock_products(db, list(quantities))
+            await order_service.decrement_stock(db, products, quantities)
+            await db.commit()
+            return True
+        except (HTTPException, OperationalError):
+            await db.rollback()
+            return False
+
+async def checkout_all(sessions, product_ids, count: int) -> list:
+    return await asyncio.gather(*(checkout(sessions, product_ids) for _ in range(count)))
+
+def test_parallel_checkouts_do_not_oversell(async_sessions, make_product, db):
+    product_id = make_product(stock_quantity=STOCK)
+
+    succeeded = sum(asyncio.run(checkout_all(async_sessions, [product_id], CHECKOUTS)))
+
+    stock = db.get(Product, product_id).stock_quantity
+    assert 0 < succeeded <= STOCK
+    assert stock == STOCK - succeeded
+    assert stock >= 0
+
+def test_parallel_checkouts_of_overlapping_baskets_do_not_oversell(async_sessions, make_product, db):
+    first, second = make_product(stock_quantity=STOCK), make_product(stock_quantity=STOCK)
+
+    succeeded = sum(asyncio.run(checkout_all(async_sessions, [first, second], CHECKOUTS)))
+
+    assert 0 < succeeded <= STOCK
+    for product_id in (first, second):
+        assert db.get(Product, product_id).stock_quantity == STOCK - succeeded
+
+def test_checkout_of_deleted_product_is_not_found(async_sessions, make_product, db):
+    product_id = make_product(stock_quantity=STOCK)
+    db.get(Product, product_id).is_deleted = True
+    db.commit()
+
+    assert asyncio.run(checkout(async_sessions, [product_id])) is False
+    db.expire_all()
+    assert db.get(Product, product_id).stock_quantity == STOCK
+
+def test_validate_cart_reports_stock(client, make_product):
+    product_id = make_product(stock_quantity=2, price=4.0)
+
+    response = client.post("/api/marketplace/cart/validate", json={"items": [{"product_id": product_id, "quantity": 3}]})
+
+    assert response.status_code == 200
+    line = response.json()["items"][0]
+    assert line["found"] and line["available_quantity"] == 2
+    assert not line["stock_sufficient"]
+
+SHIPPING = {
+    "shipping_address": "12 Garden Street",
+    "shipping_city": "Amman",
+    "shipping_country": "Jordan",
+    "contact_phone": "+962700000000"
+}
+
+def place_order(client, user, product_id, quantity: int):
+    return client.post(
+        "/api/marketplace/orders",
+        json=SHIPPING | {"items": [{"product_id": product_id, "quantity": quantity}]},
+        headers=user.headers
+    )
+
+def test_order_takes_items_out_of_stock(client, make_user, make_product, db):
+    user, product_id = make_user(), make_product(stock_quantity=STOCK, price=4.0)
+
+    response = place_order(client, user, product_id, 2)
+
+    assert response.status_code == 201
+    order = response.json()
+    assert order["shipping_city"] == "Amman" and order["contact_phone"] == SHIPPING["contact_phone"]
+    assert order["status"] == "pending" and order["total_amount"] == 8.0
+    assert [(item["product_id"], item["quantity"]) for item in order["items"]] == [(product_id, 2)]
+    assert db.get(Product, product_id).stock_quantity == STOCK - 2
+
+def test_order_beyond_stock_is_rejected(client, make_user, make_product, db):
+    user, product_id = make_user(), make_product(stock_quantity=STOCK)
+
+    response = place_order(client, user, product_id, STOCK + 1)
+
+    assert response.status_code == 400
+    assert response.json()["detail"].endswith(f"Available: {STOCK}")
+    assert db.get(Product, product_id).stock_quantity == STOCK
+    assert client.get("/api/marketplace/orders", headers=user.headers).json() == []
@@ -0,0 +1,113 @@
+"""Response compression: negotiation, thresholds and a CPU-versus-bytes benchmark (user-048)
+
+The benchmark compresses a bilingual plants page at several levels of
+every coding and prints the size and time of each. Codings whose
+optional package is not installed are skipped. Run with -s to see the
+table.
+"""
+import asyncio
+import gzip
+import json
+import time
+
+import pytest
+
+from app.utils import compression_utils
+
+def bilingual_page(items: int = 100) -> bytes:
+    """A plants list page like GET /api/plants/?lang=both returns"""
+    return json.dumps([
+        {
+            "id": f"00000000-0000-0000-0000-{index:012d}",
+            "nickname": f"Living room plant {index}",
+            "nickname_ar": f"نبتة غرفة المعيشة {index}",
+            "plant_name": "Monstera Deliciosa",
+            "plant_name_ar": "مونستيرا ديليسيوسا",
+            "description": "Large glossy leaves with natural splits; likes bright indirect light and weekly watering.",
+            "description_ar": "أوراق كبيرة لامعة ذات شقوق طبيعية؛ تحب الضوء الساطع غير المباشر والري الأسبوعي.",
+            "watering_interval_days": 7,
+            "created_at": f"2026-10-{index % 28 + 1:02d}T08:00:00",
+        }
+        for index in range(items)
+    ], ensure_ascii=False).encode()
+
+LEVELS = {
+    "gzip": (1, 6, 9),
+    "br": (1, 4, 6, 9),
+    "zstd": (1, 3, 9),
+}
+STREAMS = {
+    "gzip": lambda level: compression_utils._GzipStream(level),
+    "br": lambda level: compression_utils._BrotliStream(level),
+    "zstd": lambda level: compression_utils._ZstdStream(level),
+}
+PACKAGES = {"br": "brotli", "zstd": "zstandard"}
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("coding", ["gzip", "br", "zstd"])
+def test_cpu_versus_bytes(coding):
+    if coding in PACKAGES:
+        pytest.importorskip(PACKAGES[coding])
+    body = bilingual_page()
+
+    print(f"\n{coding} on a {len(body)} byte bilingual page:")
+    for level in LEVELS[coding]:
+        start = time.perf_counter()
+        for _ in range(20):
+            stream = STREAMS[coding](level)
+            compressed = stream.compress(body) + stream.finish()
+        seconds = (time.perf_counter() - start) / 20
+        print(f"  level {level}: {len(compressed)} bytes ({len(body) / len(compressed):.1f}x) in {seconds * 1000:.2f} ms")
+        assert len(compressed) * 4 < len(body)
+
+def run(app, accept_encoding: str = "gzip, br, zstd") -> tuple:
+    """Send a GET through app and return the response start message and body"""
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(app(scope, receive, send))
+    return messages[0], b"".join(message.get("body", b"") for message in messages[1:])
+
+def body_app(body: bytes, content_type: bytes = b"application/json", chunks: int = 1):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+        size = len(body) // chunks + 1
+        for offset in range(0, len(body), size):
+            await send({"type": "http.response.body", "body": body[offset:offset + size], "more_body": offset + size < len(body)})
+    return app
+
+def headers(start) -> dict:
+    return dict(start["headers"])
+
+def test_large_json_is_compressed_with_gzip():
+    body = bilingual_page()
+    middleware = compression_utils.CompressionMiddleware(body_app(body))
+
+    start, compressed = run(middleware, "gzip")
+
+    assert headers(start)[b"content-encoding"] == b"gzip"
+    assert int(headers(start)[b"content-length"]) == len(compressed)
+    assert gzip.decompress(compressed) == body
+
+def test_streamed_json_is_compressed_chunk_by_chunk():
+    body = bilingual_page()
+    middleware = compression_utils.CompressionMiddleware(body_app(body, chunks=4))
+
+    start, compressed = run(middleware, "gzip")
+
+    assert b"content-length" not in headers(start)
+    assert gzip.decompress(compressed) == body
+
+def test_small_and_image_responses_are_sent_as_they_are():
+    small = compression_utils.CompressionMiddleware(body_app(b'{"status":"healthy"}'))
+    image = compression_utils.CompressionMiddleware(body_app(b"\x89PNG" + bytes(4096), content_type=b"image/png"))
+
+    for middleware in (small, image):
+        start, _ = run(middleware)
+        assert b"content-encoding" not in headers(start)
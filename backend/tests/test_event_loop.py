@@ -0,0 +1,74 @@
+"""Fast requests stay fast while slow queries run (async engine, user-026)
+
+Replays the same mixed load on one event loop: slow queries arriving
+every 200 ms, and cheap queries every 10 ms whose latency is measured
+from when they arrived. "Before" runs every query on a synchronous
+session, as the routes used to, so each slow query stalls the loop;
+"after" runs them on the async engine the routes use now. Each side is
+run a few times and its best p99 kept. Run with -s to see the p99
+latencies.
+"""
+import asyncio
+import statistics
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import ASYNC_DATABASE_URL, SessionLocal, configure_engine, get_engine_options
+
+pytestmark = pytest.mark.benchmark
+
+SLOW_QUERY = text("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 150000) SELECT count(*) FROM c")
+FAST_QUERY = text("SELECT 1")
+DURATION_SECONDS = 0.8
+SLOW_EVERY_SECONDS = 0.2
+FAST_EVERY_SECONDS = 0.01
+RUNS = 3
+
+async def mixed_load(run_query) -> list:
+    """Latencies of the fast queries, from arrival to completion"""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def request(query, arrival: float):
+        await asyncio.sleep(max(start + arrival - loop.time(), 0))
+        await run_query(query)
+        return loop.time() - (start + arrival)
+
+    slow = [request(SLOW_QUERY, offset * SLOW_EVERY_SECONDS) for offset in range(int(DURATION_SECONDS / SLOW_EVERY_SECONDS))]
+    fast = [request(FAST_QUERY, offset * FAST_EVERY_SECONDS) for offset in range(int(DURATION_SECONDS / FAST_EVERY_SECONDS))]
+    results = await asyncio.gather(*fast, *slow)
+    return results[:len(fast)]
+
+def p99(latencies) -> float:
+    return statistics.quantiles(latencies, n=100)[98]
+
+async def on_sync_session(query):
+    with SessionLocal() as db:
+        db.execute(query)
+
+async def async_engine_load() -> list:
+    """mixed_load on a pooled async engine like the app's, opened on this loop"""
+    engine = create_async_engine(ASYNC_DATABASE_URL, **get_engine_options(ASYNC_DATABASE_URL, is_async=True))
+    configure_engine(engine.sync_engine, ASYNC_DATABASE_URL, "benchmark")
+    sessions = async_sessionmaker(bind=engine)
+
+    async def on_async_session(query):
+        async with sessions() as db:
+            await db.execute(query)
+
+    try:
+        # Open the pool's connections before measuring, as a running server has
+        await asyncio.gather(*(on_async_session(FAST_QUERY) for _ in range(engine.pool.size())))
+        return await mixed_load(on_async_session)
+    finally:
+        await engine.dispose()
+
+def test_slow_queries_do_not_stall_fast_requests(migrated_database):
+    # Best of a few runs each, so one scheduling hiccup does not decide the comparison
+    before = min(p99(asyncio.run(mixed_load(on_sync_session))) for _ in range(RUNS))
+    after = min(p99(asyncio.run(async_engine_load())) for _ in range(RUNS))
+    print(f"\nfast request p99 under mixed load: sync session {before * 1000:.1f} ms, async engine {after * 1000:.1f} ms")
+
+    assert after < before / 2
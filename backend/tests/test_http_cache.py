@@ -0,0 +1,104 @@
+"""Conditional GETs of lists and single items (user-040)"""
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from app.models import PlantType
+
+PLANTS = "/api/plants/"
+
+ORDER = {
+    "shipping_address": "12 Garden Street",
+    "shipping_city": "Amman",
+    "shipping_country": "Jordan",
+    "contact_phone": "+962700000000"
+}
+
+def create_plant(client, user, **fields) -> str:
+    response = client.post(PLANTS, json={"nickname": "Desk plant", "plant_name": "Monstera"} | fields, headers=user.headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+def revalidate(client, path: str, user, etag: str):
+    return client.get(path, headers={**user.headers, "If-None-Match": etag})
+
+def test_unchanged_list_is_not_modified(client, make_user):
+    user = make_user()
+    create_plant(client, user)
+
+    first = client.get(PLANTS, headers=user.headers)
+    unchanged = revalidate(client, PLANTS, user, first.headers["ETag"])
+
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == first.headers["ETag"]
+    assert unchanged.content == b""
+
+def test_plant_type_rename_changes_plants_list_etag(client, make_user, db):
+    admin, user = make_user(is_admin=True), make_user()
+    plant_type = client.post("/api/plants/types", json={"name": f"Aroid {uuid.uuid4().hex[:8]}"}, headers=admin.headers).json()
+    create_plant(client, user, plant_type_id=plant_type["id"])
+    first = client.get(PLANTS, headers=user.headers)
+
+    # Renamed in the same second the list was fetched
+    renamed = db.get(PlantType, plant_type["id"])
+    renamed.name = f"Araceae {uuid.uuid4().hex[:8]}"
+    db.commit()
+
+    after_rename = revalidate(client, PLANTS, user, first.headers["ETag"])
+    assert after_rename.status_code == 200
+    assert after_rename.json()[0]["plant_type"]["name"] == renamed.name
+
+def test_every_update_within_a_second_changes_the_etag(client, make_user):
+    user = make_user()
+    plant_id = create_plant(client, user)
+    path = f"{PLANTS}{plant_id}"
+
+    etags = []
+    for nickname in ("Fern", "Palm", "Fern"):
+        assert client.put(path, json={"nickname": nickname}, headers=user.headers).status_code == 200
+        etags.append(client.get(path, headers=user.headers).headers["ETag"])
+    list_etag = client.get(PLANTS, headers=user.headers).headers["ETag"]
+    assert client.put(path, json={"nickname": "Palm"}, headers=user.headers).status_code == 200
+
+    assert len(set(etags)) == 3
+    assert revalidate(client, path, user, etags[-1]).status_code == 200
+    assert revalidate(client, PLANTS, user, list_etag).status_code == 200
+
+def test_stock_change_by_an_order_changes_the_product_etag(client, make_user, make_product):
+    user, product_id = make_user(), make_product(stock_quantity=5)
+    path = f"/api/marketplace/products/{product_id}"
+    first = client.get(path)
+
+    # The checkout decrements stock with a Core UPDATE, not through the ORM
+    order = ORDER | {"items": [{"product_id": product_id, "quantity": 1}]}
+    assert client.post("/api/marketplace/orders", json=order, headers=user.headers).status_code == 201
+
+    after_order = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+    assert after_order.status_code == 200
+    assert after_order.json()["stock_quantity"] == 4
+
+def test_soft_deleted_row_changes_the_list_and_if_modified_since_is_ignored(client, make_user):
+    user = make_user()
+    kept, deleted = create_plant(client, user), create_plant(client, user)
+    first = client.get(PLANTS, headers=user.headers)
+    assert "Last-Modified" not in first.headers
+
+    assert client.delete(f"{PLANTS}{deleted}", headers=user.headers).status_code == 204
+
+    # The newest remaining row is older than the client's copy, yet the list changed
+    since = format_datetime(datetime.now(timezone.utc) + timedelta(days=1), usegmt=True)
+    by_date = client.get(PLANTS, headers={**user.headers, "If-Modified-Since": since})
+    assert by_date.status_code == 200
+    assert [plant["id"] for plant in by_date.json()] == [kept]
+
+    by_etag = revalidate(client, PLANTS, user, first.headers["ETag"])
+    assert by_etag.status_code == 200
+    assert by_etag.headers["ETag"] != first.headers["ETag"]
+
+def test_single_item_honours_if_modified_since(client, make_user):
+    user = make_user()
+    path = f"{PLANTS}{create_plant(client, user)}"
+    first = client.get(path, headers=user.headers)
+
+    unchanged = client.get(path, headers={**user.headers, "If-Modified-Since": first.headers["Last-Modified"]})
+    assert unchanged.status_code == 304
@@ -0,0 +1,120 @@
+"""Idempotency-Key handling: store bounds, the shared store and replays of POST /orders"""
+import asyncio
+
+from app.models import Product
+from app.utils.idempotency_utils import IDEMPOTENT_REPLAY_HEADER, MemoryIdempotencyStore, SharedIdempotencyStore
+from app.utils.rate_limit_utils import LocalSharedStore
+
+def store_response(store, key: str, body: bytes = b"{}"):
+    async def store_it():
+        record = await store.begin(key, "fingerprint")
+        await store.complete(key, record, 201, [(b"content-type", b"application/json")], body)
+        return record
+    return asyncio.run(store_it())
+
+def get(store, key: str):
+    return asyncio.run(store.get(key))
+
+def test_least_recently_used_records_are_dropped_beyond_max_entries():
+    store = MemoryIdempotencyStore(max_entries=3)
+    for key in ("a", "b", "c"):
+        store_response(store, key)
+
+    assert get(store, "a") is not None
+    store_response(store, "d")
+
+    assert len(store) == 3
+    assert get(store, "b") is None
+    assert all(get(store, key) is not None for key in ("a", "c", "d"))
+
+def test_records_are_dropped_beyond_max_bytes():
+    store = MemoryIdempotencyStore(max_bytes=2500)
+    for key in ("a", "b", "c"):
+        store_response(store, key, b"x" * 1000)
+
+    assert store.stored_bytes <= 2500
+    assert get(store, "a") is None
+    assert get(store, "c") is not None
+
+def test_requests_in_progress_are_kept():
+    store = MemoryIdempotencyStore(max_entries=2)
+    running = asyncio.run(store.begin("running", "fingerprint"))
+    for key in ("a", "b", "c"):
+        store_response(store, key)
+
+    assert get(store, "running") is running
+    assert len(store) == 2
+
+def test_released_and_expired_records_free_their_space():
+    store = MemoryIdempotencyStore(ttl_seconds=0)
+    store_response(store, "a", b"x" * 100)
+
+    async def fail():
+        failed = await store.begin("b", "fingerprint")
+        await store.release("b", failed)
+    asyncio.run(fail())
+
+    assert get(store, "a") is None
+    assert len(store) == 0
+    assert store.stored_bytes == 0
+
+def test_shared_store_lets_one_worker_claim_a_key():
+    shared = LocalSharedStore()
+    first, second = SharedIdempotencyStore(shared), SharedIdempotencyStore(shared, poll_seconds=0.01)
+
+    async def race():
+        record = await first.begin("key", "fingerprint")
+        assert await second.begin("key", "fingerprint") is None
+
+        # The other worker waits for the response and then sees it
+        waiting = asyncio.create_task(second.wait("key", await second.get("key"), timeout=5))
+        await first.complete("key", record, 201, [(b"content-type", b"application/json")], b'{"id":"1"}')
+        await waiting
+        return await second.get("key")
+
+    replayed = asyncio.run(race())
+    assert (replayed.status, replayed.body) == (201, b'{"id":"1"}')
+
+def test_shared_store_frees_released_keys():
+    shared = LocalSharedStore()
+    first, second = SharedIdempotencyStore(shared), SharedIdempotencyStore(shared)
+
+    async def fail_then_retry():
+        record = await first.begin("key", "fingerprint")
+        await first.release("key", record)
+        return await second.get("key"), await second.begin("key", "fingerprint")
+
+    missing, retried = asyncio.run(fail_then_retry())
+    assert missing is None
+    assert retried is not None
+
+ORDER = {
+    "shipping_address": "12 Garden Street",
+    "shipping_city": "Amman",
+    "shipping_country": "Jordan",
+    "contact_phone": "+962700000000"
+}
+
+def test_retried_order_is_replayed_not_placed_twice(client, make_user, make_product, db):
+    user, product_id = make_user(), make_product(stock_quantity=5)
+    order = ORDER | {"items": [{"product_id": product_id, "quantity": 2}]}
+    headers = user.headers | {"Idempotency-Key": "order-attempt-1"}
+
+    first = client.post("/api/marketplace/orders", json=order, headers=headers)
+    retry = client.post("/api/marketplace/orders", json=order, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers[IDEMPOTENT_REPLAY_HEADER] == "true"
+    assert IDEMPOTENT_REPLAY_HEADER not in first.headers
+    assert retry.json() == first.json()
+    assert db.get(Product, product_id).stock_quantity == 3
+    assert len(client.get("/api/marketplace/orders", headers=user.headers).json()) == 1
+
+def test_key_reused_for_another_order_is_rejected(client, make_user, make_product):
+    user, product_id = make_user(), make_product(stock_quantity=5)
+    headers = user.headers | {"Idempotency-Key": "order-attempt-1"}
+
+    client.post("/api/marketplace/orders", json=ORDER | {"items": [{"product_id": product_id, "quantity": 1}]}, headers=headers)
+    response = client.post("/api/marketplace/orders", json=ORDER | {"items": [{"product_id": product_id, "quantity": 2}]}, headers=headers)
+
+    assert response.status_code == 422
@@ -0,0 +1,70 @@
+"""Response language negotiated from Accept-Language or ?lang= (user-046)"""
+import pytest
+
+PLANTS = "/api/plants/"
+
+@pytest.fixture
+def plant(client, make_user):
+    """A user's plant with its nickname in both languages and its location in English only"""
+    user = make_user()
+    response = client.post(
+        PLANTS,
+        json={"nickname": "Desk plant", "nickname_ar": "نبتة المكتب", "plant_name": "Monstera", "location": "Office"},
+        headers=user.headers
+    )
+    assert response.status_code == 201
+    return user, f"{PLANTS}{response.json()['id']}"
+
+def get(client, plant, accept_language=None, **params):
+    user, path = plant
+    headers = user.headers | ({"Accept-Language": accept_language} if accept_language else {})
+    return client.get(path, params=params, headers=headers)
+
+@pytest.mark.parametrize("accept_language, language", [
+    (None, "en"),
+    ("ar", "ar"),
+    ("ar-JO,ar;q=0.9", "ar"),
+    ("fr, ar;q=0.8, en;q=0.5", "ar"),
+    ("ar;q=0.4, en-GB;q=0.9", "en"),
+    ("ar;q=0, *", "en"),
+    ("fr, de", "en")
+])
+def test_accept_language_picks_the_response_language(client, plant, accept_language, language):
+    response = get(client, plant, accept_language)
+
+    assert response.status_code == 200
+    assert response.headers["Content-Language"] == language
+    assert "Accept-Language" in response.headers["Vary"]
+    assert response.json()["nickname"] == {"en": "Desk plant", "ar": "نبتة المكتب"}[language]
+
+def test_one_language_drops_the_other_languages_fields(client, plant):
+    arabic = get(client, plant, "ar").json()
+
+    assert "nickname_ar" not in arabic
+    # Untranslated fields fall back to English
+    assert arabic["location"] == "Office"
+
+def test_lang_parameter_overrides_accept_language(client, plant):
+    response = get(client, plant, "ar", lang="en")
+
+    assert response.headers["Content-Language"] == "en"
+    assert response.json()["nickname"] == "Desk plant"
+
+def test_lang_both_keeps_every_language(client, plant):
+    response = get(client, plant, "ar", lang="both")
+    body = response.json()
+
+    assert response.headers["Content-Language"] == "en, ar"
+    assert (body["nickname"], body["nickname_ar"]) == ("Desk plant", "نبتة المكتب")
+
+def test_unsupported_lang_parameter_is_rejected(client, plant):
+    assert get(client, plant, lang="fr").status_code == 422
+
+def test_each_language_has_its_own_etag(client, plant):
+    english, arabic = get(client, plant, "en"), get(client, plant, "ar")
+    user, path = plant
+
+    assert english.headers["ETag"] != arabic.headers["ETag"]
+    stale = client.get(path, headers=user.headers | {"Accept-Language": "ar", "If-None-Match": english.headers["ETag"]})
+    assert stale.status_code == 200
+    assert stale.json()["nickname"] == "نبتة المكتب"
@@ -0,0 +1,49 @@
+"""Keyset pagination cursors (user-029)"""
+import base64
+import json
+import uuid
+
+import pytest
+
+from app.models import Plant
+from app.utils import pagination_utils
+
+PRODUCTS = "/api/marketplace/products"
+
+def craft(values) -> str:
+    """A cursor carrying arbitrary values, as a client could send"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+def test_cursor_pages_through_every_row_once(client, make_user, db):
+    user = make_user()
+    # Inserted in one transaction, so most share a created_at and the id breaks the ties
+    plants = [Plant(id=str(uuid.uuid4()), owner_id=user.id, nickname=f"Plant {index}", plant_name="Monstera") for index in range(5)]
+    db.add_all(plants)
+    db.commit()
+
+    seen, cursor = [], None
+    while True:
+        response = client.get("/api/plants/", params={"limit": 2} | ({"cursor": cursor} if cursor else {}), headers=user.headers)
+        assert response.status_code == 200
+        seen.extend(plant["id"] for plant in response.json())
+        cursor = response.headers.get(pagination_utils.NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+
+    assert len(seen) == len(plants)
+    assert set(seen) == {plant.id for plant in plants}
+
+@pytest.mark.parametrize("cursor", [
+    craft([1, 2]),
+    craft(["2026-10-19 08:00:00", 7]),
+    craft([{"dt": 5}, "id"]),
+    craft(["not a time", "id"]),
+    craft([True, "id"]),
+    craft(["2026-10-19 08:00:00"]),
+    "not base64!"
+], ids=["numbers", "numeric id", "bad encoded time", "bad raw time", "boolean", "short", "garbage"])
+def test_crafted_cursor_is_rejected(client, cursor):
+    response = client.get(PRODUCTS, params={"cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
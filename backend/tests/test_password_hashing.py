@@ -0,0 +1,56 @@
+"""Logins hash on the password executor, not the event loop (user-042)
+
+A login storm runs from many threads while a probe keeps calling an
+unrelated endpoint. Run with -s to see the probe latency next to the
+cost of one bcrypt verification.
+"""
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services import auth_service
+
+LOGINS = 8
+
+def login(client, user):
+    return client.post("/api/users/login", data={"username": user.email, "password": user.password})
+
+def probe_during(client, storm) -> tuple:
+    """Latencies of GET /health while storm runs on other threads, and the storm's responses"""
+    latencies = []
+    with ThreadPoolExecutor(max_workers=LOGINS) as executor:
+        futures = storm(executor)
+        while not all(future.done() for future in futures):
+            start = time.perf_counter()
+            assert client.get("/health").status_code == 200
+            latencies.append(time.perf_counter() - start)
+            time.sleep(0.005)
+        return latencies, [future.result() for future in futures]
+
+@pytest.mark.benchmark
+def test_login_storm_does_not_stall_other_requests(client, make_user, password_hash):
+    user = make_user()
+    start = time.perf_counter()
+    auth_service.verify_password(user.password, password_hash)
+    bcrypt_seconds = time.perf_counter() - start
+
+    latencies, responses = probe_during(client, lambda executor: [executor.submit(login, client, user) for _ in range(LOGINS)])
+
+    p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 1 else latencies[0]
+    print(f"\n{LOGINS} concurrent logins: /health p99 {p99 * 1000:.1f} ms over {len(latencies)} probes, one bcrypt verify {bcrypt_seconds * 1000:.1f} ms")
+    assert all(response.status_code == 200 for response in responses)
+    assert p99 < bcrypt_seconds
+
+def test_full_password_queue_answers_503(client, make_user, monkeypatch):
+    # One password operation at a time, none waiting
+    monkeypatch.setattr(auth_service, "PASSWORD_HASH_WORKERS", 1)
+    monkeypatch.setattr(auth_service, "PASSWORD_HASH_MAX_QUEUE", 0)
+    user = make_user()
+
+    _, responses = probe_during(client, lambda executor: [executor.submit(login, client, user) for _ in range(LOGINS)])
+
+    statuses = [response.status_code for response in responses]
+    assert 200 in statuses and 503 in statuses
+    assert all(response.headers["Retry-After"] for response in responses if response.status_code == 503)
@@ -0,0 +1,69 @@
+"""Cached principals are dropped when a user's role or password changes (user-041)"""
+import uuid
+
+from app.services import auth_service
+
+TYPES = "/api/plants/types"
+
+def create_plant_type(client, user):
+    return client.post(TYPES, json={"name": f"Aroid {uuid.uuid4().hex[:8]}"}, headers=user.headers)
+
+def cached_principal(user):
+    return auth_service.principal_cache.get(user.headers["Authorization"].split()[1])
+
+def login(client, user, password: str):
+    return client.post("/api/users/login", data={"username": user.email, "password": password})
+
+def test_repeated_requests_reuse_the_cached_principal(client, make_user):
+    user = make_user()
+    client.get("/api/plants/", headers=user.headers)
+
+    assert cached_principal(user).id == user.id
+
+def test_demoted_admin_loses_access_on_the_next_request(client, make_user):
+    admin, demoted = make_user(is_admin=True), make_user(is_admin=True)
+    assert create_plant_type(client, demoted).status_code == 201
+    assert cached_principal(demoted).is_admin
+
+    response = client.put(f"/api/users/{demoted.id}/access", json={"is_admin": False}, headers=admin.headers)
+    assert response.status_code == 200
+
+    assert cached_principal(demoted) is None
+    assert create_plant_type(client, demoted).status_code == 403
+
+def test_promoted_user_gains_access_on_the_next_request(client, make_user):
+    admin, user = make_user(is_admin=True), make_user()
+    assert create_plant_type(client, user).status_code == 403
+
+    client.put(f"/api/users/{user.id}/access", json={"is_admin": True}, headers=admin.headers)
+
+    assert create_plant_type(client, user).status_code == 201
+
+def test_only_admins_change_access(client, make_user):
+    user = make_user()
+
+    response = client.put(f"/api/users/{user.id}/access", json={"is_admin": True}, headers=user.headers)
+
+    assert response.status_code == 403
+
+def test_password_change_drops_cached_principal_and_refresh_tokens(client, make_user):
+    user = make_user()
+    refresh_token = login(client, user, user.password).json()["refresh_token"]
+    client.get("/api/plants/", headers=user.headers)
+    assert cached_principal(user) is not None
+
+    changed = client.put("/api/users/me/password", json={"current_password": user.password, "new_password": "n3w-password"}, headers=user.headers)
+    assert changed.status_code == 204
+
+    assert cached_principal(user) is None
+    assert client.post("/api/users/token/refresh", json={"refresh_token": refresh_token}).status_code == 401
+    assert login(client, user, user.password).status_code == 401
+    assert login(client, user, "n3w-password").status_code == 200
+
+def test_password_change_needs_the_current_password(client, make_user):
+    user = make_user()
+
+    response = client.put("/api/users/me/password", json={"current_password": "wrong", "new_password": "n3w-password"}, headers=user.headers)
+
+    assert response.status_code == 400
+    assert login(client, user, user.password).status_code == 200
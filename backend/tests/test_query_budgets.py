@@ -0,0 +1,73 @@
+"""Every list endpoint stays within its SQL statement budget (user-030)
+
+Each endpoint is called on a page of several rows with nested
+relationships, so a lazy load per row would show up as extra statements.
+"""
+import uuid
+
+import pytest
+from sqlalchemy.exc import ArgumentError
+
+from app.models import Diagnosis, Plant, PlantCondition, PlantType, ProductReview, WateringHistory
+from app.utils import query_utils
+
+ROWS = 5
+
+ORDER = {
+    "shipping_address": "12 Garden Street",
+    "shipping_city": "Amman",
+    "shipping_country": "Jordan",
+    "contact_phone": "+962700000000"
+}
+
+@pytest.fixture
+def seeded(client, make_user, make_product, db):
+    """A user with a page of everything the list endpoints return"""
+    user = make_user()
+    plant_type = PlantType(id=str(uuid.uuid4()), name=f"Aroid {user.id[:8]}", description="Tropical")
+    plants = [
+        Plant(id=str(uuid.uuid4()), owner_id=user.id, plant_type_id=plant_type.id, nickname=f"Plant {index}", plant_name="Monstera")
+        for index in range(ROWS)
+    ]
+    db.add(plant_type)
+    db.add_all(plants)
+    db.add_all([WateringHistory(id=str(uuid.uuid4()), plant_id=plants[0].id, notes="Soaked") for _ in range(ROWS)])
+    db.add_all([
+        Diagnosis(id=str(uuid.uuid4()), user_id=user.id, plant_id=plant.id, image_url="uploads/leaf.jpg", confidence=0.9, description="Leaf spot")
+        for plant in plants
+    ])
+    db.add_all([PlantCondition(id=str(uuid.uuid4()), name=f"Condition {user.id[:8]} {index}", description="Spots") for index in range(ROWS)])
+
+    product_ids = [make_product(stock_quantity=100) for _ in range(ROWS)]
+    db.add_all([ProductReview(id=str(uuid.uuid4()), product_id=product_ids[0], user_id=make_user().id, rating=4) for _ in range(ROWS)])
+    db.commit()
+
+    for product_id in product_ids[:2]:
+        order = ORDER | {"items": [{"product_id": product_id, "quantity": 1}, {"product_id": product_ids[-1], "quantity": 1}]}
+        assert client.post("/api/marketplace/orders", json=order, headers=user.headers).status_code == 201
+
+    return user, plants[0].id, product_ids
+
+def call(client, seeded, method: str, route: str):
+    user, plant_id, product_ids = seeded
+    path = route.format(plant_id=plant_id, product_id=product_ids[0])
+    if method == "POST":
+        items = [{"product_id": product_id, "quantity": 1} for product_id in product_ids]
+        return client.post(path, json={"items": items}, headers=user.headers)
+    return client.get(path, headers=user.headers)
+
+BROKEN_ROUTES = {
+    # ProductCategory is an enum column, not a table the route can select from
+    ("GET", "/api/marketplace/categories"): pytest.mark.xfail(raises=ArgumentError, strict=True, reason="no categories table"),
+}
+
+@pytest.mark.parametrize("method, route", [
+    pytest.param(method, route, marks=BROKEN_ROUTES.get((method, route), ()), id=f"{method} {route}")
+    for method, route in query_utils.LIST_QUERY_BUDGETS
+])
+def test_list_endpoint_is_within_its_query_budget(client, seeded, method, route):
+    response = call(client, seeded, method, route)
+
+    assert response.status_code == 200
+    assert response.json()
+    query_utils.assert_response_within_budget(response, method, route)
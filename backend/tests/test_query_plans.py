@@ -0,0 +1,80 @@
+"""Query plan regression checks for the hot per-user queries (migration 0001)
+
+The queries are built the way the list endpoints build them and run
+through EXPLAIN QUERY PLAN against a seeded, ANALYZEd database, so a
+dropped index or a query shape the indexes no longer cover shows up
+as a table scan.
+"""
+import uuid
+
+import pytest
+from sqlalchemy import select, text
+
+from app.database import engine
+from app.models import Diagnosis, Plant, ProductReview, WateringHistory
+
+pytestmark = pytest.mark.skipif(engine.dialect.name != "sqlite", reason="EXPLAIN QUERY PLAN output is SQLite's")
+
+USERS = 50
+PLANTS_PER_USER = 40
+ROWS_PER_PLANT = 5
+
+@pytest.fixture(scope="module")
+def seeded(migrated_database):
+    """Seed enough rows per user and plant for the planner to prefer the indexes"""
+    user_ids = [str(uuid.uuid4()) for _ in range(USERS)]
+    plants, diagnoses, waterings, reviews = [], [], [], []
+    for user_id in user_ids:
+        for index in range(PLANTS_PER_USER):
+            plant_id = str(uuid.uuid4())
+            plants.append({"id": plant_id, "owner_id": user_id, "is_deleted": index % 10 == 0, "nickname": f"Plant {index}"})
+            diagnoses.append({"id": str(uuid.uuid4()), "user_id": user_id, "plant_id": plant_id})
+            for _ in range(ROWS_PER_PLANT):
+                waterings.append({"id": str(uuid.uuid4()), "plant_id": plant_id})
+        for product_index in range(PLANTS_PER_USER):
+            reviews.append({"id": str(uuid.uuid4()), "product_id": f"product-{product_index}", "user_id": user_id, "rating": 5})
+
+    with engine.begin() as connection:
+        connection.execute(Plant.__table__.insert(), plants)
+        connection.execute(Diagnosis.__table__.insert(), diagnoses)
+        connection.execute(WateringHistory.__table__.insert(), waterings)
+        connection.execute(ProductReview.__table__.insert(), reviews)
+        connection.execute(text("ANALYZE"))
+    return user_ids
+
+def query_plan(query) -> str:
+    """The EXPLAIN QUERY PLAN details of a select, one step per line"""
+    compiled = query.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as connection:
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    return "\n".join(row[-1] for row in rows)
+
+def assert_uses_index(plan: str, table: str, index: str):
+    assert f"SEARCH {table} USING INDEX {index}" in plan or f"SEARCH {table} USING COVERING INDEX {index}" in plan, plan
+    assert f"SCAN {table}" not in plan, plan
+
+def test_plants_list_uses_active_owner_index(seeded):
+    query = select(Plant).filter(
+        Plant.owner_id == seeded[0],
+        Plant.is_deleted == False
+    ).order_by(Plant.created_at.desc(), Plant.id.desc()).limit(20)
+    assert_uses_index(query_plan(query), "plants", "ix_plants_owner_id_created_at_active")
+
+def test_diagnosis_history_uses_user_created_index(seeded):
+    query = select(Diagnosis).filter(
+        Diagnosis.user_id == seeded[0]
+    ).order_by(Diagnosis.created_at.desc(), Diagnosis.id.desc()).limit(20)
+    assert_uses_index(query_plan(query), "diagnoses", "ix_diagnoses_user_id_created_at")
+
+def test_watering_history_uses_plant_watered_index(seeded):
+    query = select(WateringHistory).filter(
+        WateringHistory.plant_id == "some-plant"
+    ).order_by(WateringHistory.watered_at.desc(), WateringHistory.id.desc()).limit(20)
+    assert_uses_index(query_plan(query), "watering_history", "ix_watering_history_plant_id_watered_at")
+
+def test_one_review_per_user_check_uses_product_user_index(seeded):
+    query = select(ProductReview.id).filter(
+        ProductReview.product_id == "product-0",
+        ProductReview.user_id == seeded[0]
+    )
+    assert_uses_index(query_plan(query), "product_reviews", "ix_product_reviews_product_id_user_id")
@@ -0,0 +1,74 @@
+"""Token-bucket rate limiting (user-044)
+
+The overhead benchmark calls the middleware directly around a no-op ASGI
+app, so it measures the limiter alone. Run with -s to see it.
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.services import auth_service
+from app.utils.rate_limit_utils import LocalSharedStore, MemoryRateLimitBackend, RateLimitMiddleware, SharedRateLimitBackend
+
+REQUESTS = 20000
+USERS = 500
+
+async def no_op_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+async def no_op_send(message):
+    pass
+
+def scope(token: str, path: str = "/api/plants/") -> dict:
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("203.0.113.7", 50000)
+    }
+
+async def seconds_per_request(app, scopes) -> float:
+    start = time.perf_counter()
+    for request_scope in scopes:
+        await app(request_scope, None, no_op_send)
+    return (time.perf_counter() - start) / len(scopes)
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("backend", [MemoryRateLimitBackend, lambda: SharedRateLimitBackend(LocalSharedStore())], ids=["memory", "shared"])
+def test_limiter_adds_well_under_a_millisecond(backend):
+    tokens = [auth_service.create_access_token({"sub": f"user-{index}"}) for index in range(USERS)]
+    scopes = [scope(tokens[index % USERS]) for index in range(REQUESTS)]
+    limiter = RateLimitMiddleware(no_op_app, auth_service.get_token_subject, backend=backend(), capacity=REQUESTS, refill_per_second=1)
+
+    async def measure():
+        # One pass first, so every token's subject is cached as in steady state
+        await seconds_per_request(limiter, scopes[:USERS])
+        return await seconds_per_request(no_op_app, scopes), await seconds_per_request(limiter, scopes)
+
+    bare, limited = asyncio.run(measure())
+    overhead = limited - bare
+    print(f"\nrate limiter overhead: {overhead * 1e6:.1f} us per request")
+    assert overhead < 0.001
+
+def test_empty_bucket_answers_429_with_retry_after():
+    limiter = RateLimitMiddleware(no_op_app, auth_service.get_token_subject, capacity=3, refill_per_second=0.5)
+    token = auth_service.create_access_token({"sub": "user-burst"})
+    sent = []
+
+    async def record(message):
+        sent.append(message)
+
+    async def burst():
+        for _ in range(4):
+            await limiter(scope(token), None, record)
+        # A login costs more than the few tokens refilled meanwhile
+        await limiter(scope(token, "/api/users/login") | {"method": "POST"}, None, record)
+    asyncio.run(burst())
+
+    starts = [message for message in sent if message["type"] == "http.response.start"]
+    assert [message["status"] for message in starts] == [200, 200, 200, 429, 429]
+    assert (b"retry-after", b"2") in starts[3]["headers"]
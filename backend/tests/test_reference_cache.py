@@ -0,0 +1,58 @@
+"""Reference data caches: expiry, eviction and invalidation across workers (user-039)"""
+import asyncio
+import uuid
+
+from app.models import PlantType
+from app.utils.cache_utils import LocalInvalidationBus, TTLCache
+
+TYPES = "/api/plants/types"
+
+def test_entries_expire_after_their_ttl():
+    cache = TTLCache("test_expiry", ttl_seconds=0, bus=LocalInvalidationBus())
+    cache.set("key", "value")
+
+    assert cache.get("key") is None
+    assert cache.misses == 1
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache("test_eviction", max_entries=2, bus=LocalInvalidationBus())
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+def test_invalidation_reaches_every_worker():
+    bus = LocalInvalidationBus()
+    # The same cache in two workers sharing one bus
+    writer, reader = TTLCache("test_workers", bus=bus), TTLCache("test_workers", bus=bus)
+    other = TTLCache("test_other", bus=bus)
+    for cache in (writer, reader, other):
+        cache.set(("id", "1"), {"id": "1"})
+        cache.set(("id", "2"), {"id": "2"})
+
+    asyncio.run(writer.invalidate(where={"id": "1"}))
+    assert reader.get(("id", "1")) is None
+    assert reader.get(("id", "2")) == {"id": "2"}
+
+    asyncio.run(writer.invalidate())
+    assert reader.get(("id", "2")) is None
+    assert other.get(("id", "1")) == {"id": "1"}
+
+def test_admin_write_invalidates_the_cached_list(client, make_user, db):
+    admin = make_user(is_admin=True)
+    params = {"limit": 1000}
+    client.get(TYPES, params=params)
+
+    # Written behind the API's back, so only the cached list is served
+    direct = PlantType(id=str(uuid.uuid4()), name=f"Direct {uuid.uuid4().hex[:8]}")
+    db.add(direct)
+    db.commit()
+    assert direct.id not in {plant_type["id"] for plant_type in client.get(TYPES, params=params).json()}
+
+    created = client.post(TYPES, json={"name": f"Created {uuid.uuid4().hex[:8]}"}, headers=admin.headers)
+    assert created.status_code == 201
+
+    listed = {plant_type["id"] for plant_type in client.get(TYPES, params=params).json()}
+    assert {direct.id, created.json()["id"]} <= listed
@@ -0,0 +1,75 @@
+"""Refresh token rotation and reuse detection (user-043)"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+
+from app.models import RefreshToken, User
+
+REFRESH = "/api/users/token/refresh"
+
+def login(client, user) -> str:
+    response = client.post("/api/users/login", data={"username": user.email, "password": user.password})
+    assert response.status_code == 200
+    return response.json()["refresh_token"]
+
+def refresh(client, token: str):
+    return client.post(REFRESH, json={"refresh_token": token})
+
+def test_refresh_rotates_the_token(client, make_user, db):
+    user = make_user()
+    first = login(client, user)
+
+    rotated = refresh(client, first)
+    assert rotated.status_code == 200
+    body = rotated.json()
+    assert body["refresh_token"] != first
+    assert client.get("/api/users/me", headers={"Authorization": f"Bearer {body['access_token']}"}).json()["id"] == user.id
+
+    # Only hashes are stored, all in the login's family
+    rows = db.execute(select(RefreshToken.token_hash, RefreshToken.family_id).filter(RefreshToken.user_id == user.id)).all()
+    assert len(rows) == 2
+    assert len({family_id for _, family_id in rows}) == 1
+    assert not {first, body["refresh_token"]} & {token_hash for token_hash, _ in rows}
+
+    assert refresh(client, body["refresh_token"]).status_code == 200
+
+def test_reused_token_revokes_its_family(client, make_user):
+    user = make_user()
+    stolen, other_device = login(client, user), login(client, user)
+    current = refresh(client, stolen).json()["refresh_token"]
+
+    assert refresh(client, stolen).status_code == 401
+    # The legitimate client's newer token went with the family
+    assert refresh(client, current).status_code == 401
+    # Other logins are separate families
+    assert refresh(client, other_device).status_code == 200
+
+def test_signed_out_token_is_rejected_without_reuse(client, make_user):
+    user = make_user()
+    token = login(client, user)
+
+    revoked = client.delete("/api/users/me/refresh-tokens", headers=user.headers)
+    assert revoked.json() == {"revoked": 1}
+    assert refresh(client, token).status_code == 401
+
+def test_expired_token_is_rejected(client, make_user, db):
+    user = make_user()
+    token = login(client, user)
+    db.execute(update(RefreshToken).where(RefreshToken.user_id == user.id).values(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+    db.commit()
+
+    assert refresh(client, token).status_code == 401
+
+def test_inactive_user_cannot_refresh(client, make_user, db):
+    user = make_user()
+    token = login(client, user)
+    db.execute(update(User).where(User.id == user.id).values(is_active=False))
+    db.commit()
+
+    assert refresh(client, token).status_code == 401
+
+def test_unknown_token_is_rejected(client):
+    response = refresh(client, "not-a-token")
+
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid or expired refresh token"
@@ -0,0 +1,63 @@
+"""Read replica routing with the primary and a replica in two SQLite files (user-031)"""
+import asyncio
+import sqlite3
+import uuid
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import database
+from app.models import Product, ProductCategory
+
+def product_ids(url: str) -> set:
+    with sqlite3.connect(url.split("///", 1)[1]) as connection:
+        return {row[0] for row in connection.execute("SELECT id FROM products")}
+
+def insert_product(url: str) -> str:
+    product_id = str(uuid.uuid4())
+    with sqlite3.connect(url.split("///", 1)[1]) as connection:
+        connection.execute(
+            "INSERT INTO products (id, name, price, category, stock_quantity, is_available, is_deleted, rating, reviews_count, rating_total, created_at) "
+            "VALUES (?, 'Replica only', 5.0, 'SEEDS', 1, 1, 0, 0, 0, 0, CURRENT_TIMESTAMP)",
+            (product_id,)
+        )
+    return product_id
+
+@pytest.fixture
+def replica_url(migrated_database, tmp_path, monkeypatch):
+    """A replica in its own SQLite file, copied from the primary and routed to by get_read_db"""
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    with sqlite3.connect(migrated_database.url.database) as primary, sqlite3.connect(url.split("///", 1)[1]) as replica:
+        primary.backup(replica)
+    monkeypatch.setattr(database.replica_set, "engines", [database._create_replica_engine(url, "replica-test")])
+    return url
+
+def test_read_routes_use_the_replica(client, replica_url, make_product):
+    on_replica = insert_product(replica_url)
+    on_primary = make_product()
+
+    assert client.get(f"/api/marketplace/products/{on_replica}").status_code == 200
+    assert client.get(f"/api/marketplace/products/{on_primary}").status_code == 404
+
+def test_read_session_writes_go_to_the_primary(replica_url, monkeypatch):
+    on_replica = insert_product(replica_url)
+    # An unpooled primary, usable from this test's own event loop
+    monkeypatch.setattr(database, "async_engine", create_async_engine(database.ASYNC_DATABASE_URL, poolclass=NullPool))
+    written = str(uuid.uuid4())
+
+    async def read_then_write():
+        async with database.ReadSessionLocal() as db:
+            read = (await db.execute(select(Product.id).filter(Product.id == on_replica))).scalar()
+            db.add(Product(id=written, name="Written", price=5.0, category=ProductCategory.SEEDS, stock_quantity=1))
+            await db.commit()
+            # Pinned to the primary after writing, so the write is visible
+            read_back = (await db.execute(select(Product.id).filter(Product.id == written))).scalar()
+        for engine in database.replica_set.engines:
+            await engine.dispose()
+        return read, read_back
+
+    assert asyncio.run(read_then_write()) == (on_replica, written)
+    assert written in product_ids(database.DATABASE_URL)
+    assert written not in product_ids(replica_url)
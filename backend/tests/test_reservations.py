@@ -0,0 +1,163 @@
+"""Checkout stock reservations"""
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from app.models import Product
+from app.services import reservation_service
+from app.utils.rate_limit_utils import LocalSharedStore
+
+def reserve(client, user, product_id, quantity: int = 1):
+    return client.post(
+        "/api/marketplace/reservations",
+        json={"items": [{"product_id": product_id, "quantity": quantity}]},
+        headers=user.headers
+    )
+
+def test_reservation_expiry_is_timezone_aware(client, make_user, make_product):
+    response = reserve(client, make_user(), make_product())
+
+    assert response.status_code == 201
+    expires_at = datetime.fromisoformat(response.json()["expires_at"])
+    assert expires_at.tzinfo is not None
+    assert expires_at > datetime.now(timezone.utc)
+
+def test_active_reservations_per_user_are_capped(client, make_user, make_product):
+    user = make_user()
+    product_id = make_product(stock_quantity=100)
+
+    held = [reserve(client, user, product_id) for _ in range(reservation_service.RESERVATION_MAX_PER_USER)]
+    assert all(response.status_code == 201 for response in held)
+
+    assert reserve(client, user, product_id).status_code == 429
+    assert reserve(client, make_user(), product_id).status_code == 201
+
+    released = client.delete(f"/api/marketplace/reservations/{held[0].json()['id']}", headers=user.headers)
+    assert released.status_code == 204
+    assert reserve(client, user, product_id).status_code == 201
+
+def test_reservations_hold_stock_from_other_carts(client, make_user, make_product):
+    product_id = make_product(stock_quantity=3)
+
+    assert reserve(client, make_user(), product_id, quantity=2).status_code == 201
+    assert reserve(client, make_user(), product_id, quantity=2).status_code == 400
+
+    response = client.post("/api/marketplace/cart/validate", json={"items": [{"product_id": product_id, "quantity": 1}]})
+    assert response.json()["items"][0]["available_quantity"] == 1
+
+def validate(client, product_id, quantity, reservation_id=None, headers=None):
+    return client.post(
+        "/api/marketplace/cart/validate",
+        json={"items": [{"product_id": product_id, "quantity": quantity}], "reservation_id": reservation_id},
+        headers=headers or {}
+    )
+
+def test_cart_validation_counts_only_own_reservation(client, make_user, make_product):
+    owner, other = make_user(), make_user()
+    product_id = make_product(stock_quantity=3)
+    reservation_id = reserve(client, owner, product_id, quantity=2).json()["id"]
+
+    own = validate(client, product_id, 3, reservation_id, owner.headers)
+    someone_elses = validate(client, product_id, 3, reservation_id, other.headers)
+    anonymous = validate(client, product_id, 3, reservation_id)
+
+    assert own.json()["items"][0]["available_quantity"] == 3
+    assert someone_elses.json()["items"][0]["available_quantity"] == 1
+    assert anonymous.json()["items"][0]["available_quantity"] == 1
+
+def test_unchanged_cart_validation_is_not_modified(client, make_product):
+    product_id = make_product(stock_quantity=3)
+
+    first = validate(client, product_id, 1)
+    second = validate(client, product_id, 1, headers={"If-None-Match": first.headers["ETag"]})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+
+@pytest.fixture(params=["memory", "shared"])
+def reservation_store(request, monkeypatch):
+    """Run a test against the per-worker store and against the shared one"""
+    store = reservation_service.MemoryReservationStore() if request.param == "memory" else reservation_service.SharedReservationStore(LocalSharedStore())
+    monkeypatch.setattr(reservation_service, "store", store)
+    return store
+
+ORDER = {
+    "shipping_address": "12 Garden Street",
+    "shipping_city": "Amman",
+    "shipping_country": "Jordan",
+    "contact_phone": "+962700000000"
+}
+
+def place_order(client, user, product_id, quantity, reservation_id):
+    return client.post(
+        "/api/marketplace/orders",
+        json=ORDER | {"items": [{"product_id": product_id, "quantity": quantity}], "reservation_id": reservation_id},
+        headers=user.headers
+    )
+
+def test_checkout_consumes_the_reservation(client, make_user, make_product, db, reservation_store):
+    owner, other = make_user(), make_user()
+    product_id = make_product(stock_quantity=3)
+    reservation_id = reserve(client, owner, product_id, quantity=2).json()["id"]
+
+    assert place_order(client, owner, product_id, 2, reservation_id).status_code == 201
+
+    assert db.get(Product, product_id).stock_quantity == 1
+    assert place_order(client, owner, product_id, 2, reservation_id).status_code == 404
+    assert client.delete(f"/api/marketplace/reservations/{reservation_id}", headers=owner.headers).status_code == 404
+    # The sold units are no longer held on top of being out of stock
+    assert reserve(client, other, product_id, quantity=1).status_code == 201
+
+def test_failed_checkout_keeps_the_reservation(client, make_user, make_product, reservation_store):
+    owner, other = make_user(), make_user()
+    product_id = make_product(stock_quantity=3)
+    reservation_id = reserve(client, owner, product_id, quantity=2).json()["id"]
+
+    assert place_order(client, owner, product_id, 1, reservation_id).status_code == 400
+    assert reserve(client, other, product_id, quantity=2).status_code == 400
+    assert place_order(client, owner, product_id, 2, reservation_id).status_code == 201
+
+def test_someone_elses_reservation_cannot_be_checked_out(client, make_user, make_product, reservation_store):
+    owner, other = make_user(), make_user()
+    product_id = make_product(stock_quantity=3)
+    reservation_id = reserve(client, owner, product_id, quantity=2).json()["id"]
+
+    assert place_order(client, other, product_id, 2, reservation_id).status_code == 404
+
+def test_expired_reservation_releases_its_stock(client, make_user, make_product, monkeypatch, reservation_store):
+    owner, other = make_user(), make_user()
+    product_id = make_product(stock_quantity=3)
+    monkeypatch.setattr(reservation_service, "RESERVATION_TTL_MINUTES", 0.2 / 60)
+    reservation_id = reserve(client, owner, product_id, quantity=2).json()["id"]
+    assert reserve(client, other, product_id, quantity=2).status_code == 400
+
+    time.sleep(0.3)
+
+    assert place_order(client, owner, product_id, 2, reservation_id).status_code == 404
+    assert reserve(client, other, product_id, quantity=2).status_code == 201
+
+def test_claimed_reservation_cannot_be_claimed_again(reservation_store):
+    async def claim_twice():
+        reservation = await reservation_store.reserve("user", {"product": 1}, {"product": 1}, 60, 5)
+        first = await reservation_store.claim(reservation.id)
+        second = await reservation_store.claim(reservation.id)
+        await reservation_store.unclaim(reservation.id)
+        return first, second, await reservation_store.claim(reservation.id)
+
+    assert asyncio.run(claim_twice()) == (True, False, True)
+
+def test_shared_holds_are_seen_by_every_worker():
+    shared = LocalSharedStore()
+    first, second = reservation_service.SharedReservationStore(shared), reservation_service.SharedReservationStore(shared)
+
+    async def hold_on_one_worker():
+        reservation = await first.reserve("user", {"product": 2}, {"product": 3}, 60, 5)
+        held = await second.held("product")
+        with pytest.raises(ValueError):
+            await second.reserve("other", {"product": 2}, {"product": 3}, 60, 5)
+        await second.release(reservation.id)
+        return held, await first.held("product"), await first.get(reservation.id)
+
+    assert asyncio.run(hold_on_one_worker()) == (2, 0, None)
@@ -0,0 +1,43 @@
+"""Product reviews keep the rating aggregates up to date incrementally"""
+from app.models import Product
+
+def test_reviews_update_rating_aggregates(client, make_user, make_product, db):
+    product_id = make_product()
+
+    for rating in (5, 2):
+        response = client.post(
+            "/api/marketplace/reviews",
+            json={"product_id": product_id, "rating": rating, "comment": "Grows well"},
+            headers=make_user().headers
+        )
+        assert response.status_code == 201, response.text
+
+    product = db.get(Product, product_id)
+    assert (product.reviews_count, product.rating_total, product.rating) == (2, 7, 3.5)
+
+def test_second_review_by_same_user_is_rejected(client, make_user, make_product, db):
+    product_id = make_product()
+    user = make_user()
+
+    first = client.post("/api/marketplace/reviews", json={"product_id": product_id, "rating": 4}, headers=user.headers)
+    second = client.post("/api/marketplace/reviews", json={"product_id": product_id, "rating": 1}, headers=user.headers)
+
+    assert first.status_code == 201
+    assert second.status_code == 400
+    product = db.get(Product, product_id)
+    assert (product.reviews_count, product.rating_total) == (1, 4)
+
+def test_review_of_missing_product_is_not_found(client, make_user):
+    response = client.post("/api/marketplace/reviews", json={"product_id": "missing", "rating": 4}, headers=make_user().headers)
+
+    assert response.status_code == 404
+
+def test_reconcile_leaves_incremental_aggregates_unchanged(client, make_user, make_product, db):
+    product_id = make_product()
+    client.post("/api/marketplace/reviews", json={"product_id": product_id, "rating": 3}, headers=make_user().headers)
+
+    response = client.post("/api/marketplace/reviews/reconcile", headers=make_user(is_admin=True).headers)
+
+    assert response.status_code == 200
+    product = db.get(Product, product_id)
+    assert (product.reviews_count, product.rating_total, product.rating) == (1, 3, 3.0)
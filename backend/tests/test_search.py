@@ -0,0 +1,69 @@
+"""Product search through GET /products?search= (user-032)"""
+import uuid
+
+import pytest
+
+from app.database import SessionLocal
+from app.models import Product, ProductCategory
+from app.services import search_service
+
+PRODUCTS = "/api/marketplace/products"
+
+@pytest.fixture
+def tag():
+    """A term no other test's products contain, to keep each search to this test's rows"""
+    return f"tag{uuid.uuid4().hex[:10]}"
+
+@pytest.fixture
+def make_indexed_product(migrated_database):
+    """Insert a product and add it to the search index, as the admin routes do"""
+    def make(**fields) -> str:
+        product = Product(id=str(uuid.uuid4()), price=5.0, category=ProductCategory.SEEDS, stock_quantity=10, is_available=True, **fields)
+        names, body = search_service.build_search_document(product)
+        with SessionLocal() as session:
+            session.add(product)
+            session.execute(search_service.product_search.insert().values(**search_document_values(product.id, names, body)))
+            session.commit()
+            return product.id
+    return make
+
+def search_document_values(product_id: str, names: str, body: str) -> dict:
+    if not search_service.USE_FTS5:
+        pytest.skip("indexes through the sync session on SQLite only")
+    return search_service.search_document_values(product_id, names, body)
+
+def search(client, text: str) -> list:
+    response = client.get(PRODUCTS, params={"search": text})
+    assert response.status_code == 200
+    return [product["id"] for product in response.json()]
+
+def test_arabic_spelling_variants_match(client, tag, make_indexed_product):
+    product_id = make_indexed_product(name=f"Rose {tag}", name_ar="بذور زهرة الأقحوان", description_ar="نَبْتَة مُزهِرة")
+
+    # Alef with hamza, taa marbuta and diacritics fold to the same terms
+    assert search(client, f"{tag} الاقحوان") == [product_id]
+    assert search(client, f"{tag} الإقحوان") == [product_id]
+    assert search(client, f"{tag} زهره") == [product_id]
+    assert search(client, f"{tag} نبته") == [product_id]
+
+def test_latin_text_matches_regardless_of_case_and_as_a_prefix(client, tag, make_indexed_product):
+    product_id = make_indexed_product(name=f"Tomato Seeds {tag}", description="Heirloom VARIETY")
+
+    assert search(client, f"{tag.upper()} TOMATO") == [product_id]
+    assert search(client, f"{tag} herb") == []
+    assert search(client, f"{tag} heirl vari") == [product_id]
+
+def test_name_matches_rank_ahead_of_description_matches(client, tag, make_indexed_product):
+    in_description = make_indexed_product(name=f"Garden Soil {tag}", description="Mixed for basil and mint")
+    in_name = make_indexed_product(name=f"Basil Seeds {tag}", description="Sweet and aromatic")
+
+    assert search(client, f"{tag} basil") == [in_name, in_description]
+
+def test_deleted_products_are_not_found(client, tag, make_user, make_indexed_product):
+    kept = make_indexed_product(name=f"Mint {tag}")
+    deleted = make_indexed_product(name=f"Mint {tag}")
+    admin = make_user(is_admin=True)
+
+    assert set(search(client, tag)) == {kept, deleted}
+    assert client.delete(f"{PRODUCTS}/{deleted}", headers=admin.headers).status_code == 204
+    assert search(client, tag) == [kept]
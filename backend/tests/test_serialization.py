@@ -0,0 +1,83 @@
+"""Column projections with orjson against ORM objects with pydantic (user-047)
+
+Each list endpoint on the fast path is timed both ways for a 100-row
+page, query included: the previous ORM objects -> response model ->
+jsonable_encoder -> json path, and the Core projection -> dicts ->
+orjson path the route uses now. Both must produce the same JSON. Run
+with -s to see the timings.
+"""
+import json
+import timeit
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from app.database import SessionLocal
+from app.models import Plant, PlantType, WateringHistory
+from app.routers.plants import PlantResponse, WateringHistoryResponse
+from app.utils import serialization_utils
+
+PAGE = 100
+
+@pytest.fixture(scope="module")
+def seeded(migrated_database):
+    """A user with a full page of typed plants, one of them with a full page of waterings"""
+    owner_id = str(uuid.uuid4())
+    with SessionLocal() as db:
+        plant_type = PlantType(id=str(uuid.uuid4()), name=f"Aroid {owner_id[:8]}", name_ar="قلقاسية", description="Tropical")
+        db.add(plant_type)
+        plants = [
+            Plant(
+                id=str(uuid.uuid4()), owner_id=owner_id, plant_type_id=plant_type.id,
+                nickname=f"Plant {index}", nickname_ar=f"نبتة {index}", plant_name="Monstera", plant_name_ar="مونستيرا",
+                description="Large leaves " * 10, description_ar="أوراق كبيرة " * 10, is_deleted=False
+            )
+            for index in range(PAGE)
+        ]
+        db.add_all(plants)
+        db.add_all([
+            WateringHistory(id=str(uuid.uuid4()), plant_id=plants[0].id, watered_at=datetime(2026, 1, 1) + timedelta(days=index), notes="Soaked")
+            for index in range(PAGE)
+        ])
+        db.commit()
+        return owner_id, plants[0].id
+
+def orm_json(db, query, model) -> bytes:
+    """The previous path: ORM objects validated into the response model, encoded with json"""
+    items = [model.from_orm(item) for item in db.execute(query.limit(PAGE)).unique().scalars()]
+    return JSONResponse(jsonable_encoder(items)).body
+
+def projection_json(db, query, entity, model) -> bytes:
+    """The fast path: just the response columns, mapped to dicts and encoded with orjson"""
+    projection = serialization_utils.get_projection(entity, model)
+    rows = db.execute(projection.project(query).limit(PAGE)).all()
+    return serialization_utils.json_response(projection.to_dicts(rows)).body
+
+def compare(name, db, orm_query, fast_query, entity, model):
+    before = orm_json(db, orm_query, model)
+    after = projection_json(db, fast_query, entity, model)
+    assert json.loads(after) == json.loads(before)
+
+    orm_seconds = min(timeit.repeat(lambda: orm_json(db, orm_query, model), number=10, repeat=5)) / 10
+    fast_seconds = min(timeit.repeat(lambda: projection_json(db, fast_query, entity, model), number=10, repeat=5)) / 10
+    print(f"\n{name} ({PAGE} rows): ORM + pydantic {orm_seconds * 1000:.2f} ms, projection + orjson {fast_seconds * 1000:.2f} ms")
+    assert fast_seconds < orm_seconds
+
+@pytest.mark.benchmark
+def test_plants_list_serialization(seeded):
+    owner_id, _ = seeded
+    query = select(Plant).filter(Plant.owner_id == owner_id, Plant.is_deleted == False).order_by(Plant.created_at, Plant.id)
+    with SessionLocal() as db:
+        compare("GET /api/plants/", db, query.options(joinedload(Plant.plant_type)), query, Plant, PlantResponse)
+
+@pytest.mark.benchmark
+def test_watering_history_serialization(seeded):
+    _, plant_id = seeded
+    query = select(WateringHistory).filter(WateringHistory.plant_id == plant_id).order_by(WateringHistory.watered_at, WateringHistory.id)
+    with SessionLocal() as db:
+        compare("GET /api/plants/{id}/watering-history", db, query, query, WateringHistory, WateringHistoryResponse)
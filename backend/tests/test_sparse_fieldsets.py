@@ -0,0 +1,50 @@
+"""Sparse fieldsets with ?fields= (user-049)"""
+import pytest
+
+PLANTS = "/api/plants/"
+
+@pytest.fixture
+def user(client, make_user):
+    """A user with one plant"""
+    user = make_user()
+    response = client.post(PLANTS, json={"nickname": "Desk plant", "nickname_ar": "نبتة المكتب", "plant_name": "Monstera"}, headers=user.headers)
+    assert response.status_code == 201
+    return user
+
+@pytest.mark.parametrize("fields, unknown", [
+    ("bogus", "bogus"),
+    ("nickname,bogus,secret", "bogus, secret"),
+    # Columns of the model that the response does not expose
+    ("is_deleted", "is_deleted"),
+    # Nested models are selected as a whole
+    ("plant_type.name", "plant_type.name")
+])
+def test_unknown_fields_are_rejected(client, user, fields, unknown):
+    response = client.get(PLANTS, params={"fields": fields}, headers=user.headers)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Unknown fields: {unknown}"
+
+def test_unknown_fields_are_rejected_on_every_endpoint(client):
+    response = client.get("/api/marketplace/products", params={"fields": "name,cost_price"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: cost_price"
+
+def test_only_the_requested_fields_are_returned(client, user):
+    response = client.get(PLANTS, params={"fields": "id, nickname"}, headers=user.headers)
+
+    assert response.status_code == 200
+    assert [set(plant) for plant in response.json()] == [{"id", "nickname"}]
+
+def test_translations_come_with_their_field(client, user):
+    arabic = client.get(PLANTS, params={"fields": "nickname", "lang": "ar"}, headers=user.headers).json()
+    both = client.get(PLANTS, params={"fields": "nickname", "lang": "both"}, headers=user.headers).json()
+
+    assert arabic == [{"nickname": "نبتة المكتب"}]
+    assert both == [{"nickname": "Desk plant", "nickname_ar": "نبتة المكتب"}]
+
+def test_empty_fields_return_everything(client, user):
+    response = client.get(PLANTS, params={"fields": ""}, headers=user.headers)
+
+    assert {"id", "nickname", "plant_name", "plant_type"} <= set(response.json()[0])
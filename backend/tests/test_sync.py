@@ -0,0 +1,96 @@
+"""Delta sync with an opaque watermark (user-050)"""
+import base64
+import json
+import time
+
+import pytest
+
+from app.services import sync_service
+
+SYNC = "/api/sync"
+
+def craft(values) -> str:
+    """A watermark carrying arbitrary values, as a client could send"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+@pytest.mark.parametrize("since", [
+    craft([1, 2]),
+    craft([1, 2, None, None, None, None, None, None]),
+    craft(["2026-10-19 08:00:00", None, None, None, None, None, None, None]),
+    craft([{"dt": "yesterday"}, "id", None, None, None, None, None, None]),
+    craft(["2026-10-19 08:00:00", 7, None, None, None, None, None, None]),
+    "not base64!"
+], ids=["short", "numbers", "half a position", "bad time", "numeric id", "garbage"])
+def test_crafted_watermark_is_rejected(client, make_user, since):
+    response = client.get(SYNC, params={"since": since}, headers=make_user().headers)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid sync token, sync again without one"
+
+PLANTS = "/api/plants/"
+
+@pytest.fixture(autouse=True)
+def settle_window(monkeypatch):
+    """A one second settle window, so the tests wait for changes to settle quickly"""
+    monkeypatch.setattr(sync_service, "SYNC_SETTLE_SECONDS", 1)
+
+def settle():
+    # Change times and the cutoff are both truncated to the second on SQLite
+    time.sleep(sync_service.SYNC_SETTLE_SECONDS + 0.05)
+
+def create_plant(client, user, nickname: str) -> str:
+    response = client.post(PLANTS, json={"nickname": nickname, "plant_name": "Monstera"}, headers=user.headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+def sync(client, user, since=None, **params) -> dict:
+    response = client.get(SYNC, params=params | ({"since": since} if since else {}), headers=user.headers)
+    assert response.status_code == 200
+    return response.json()
+
+def test_changes_are_returned_once_after_they_settle(client, make_user):
+    user, other = make_user(), make_user()
+    kept, deleted = create_plant(client, user, "Fern"), create_plant(client, user, "Palm")
+    create_plant(client, other, "Not mine")
+
+    # Too recent: a transaction still in flight could commit an earlier time
+    unsettled = sync(client, user)
+    assert unsettled["plants"] == []
+
+    settle()
+    first = sync(client, user, unsettled["watermark"])
+    assert {plant["id"] for plant in first["plants"]} == {kept, deleted}
+    assert first["has_more"] is False
+    assert sync(client, user, first["watermark"])["plants"] == []
+
+    client.put(f"{PLANTS}{kept}", json={"nickname": "Boston fern"}, headers=user.headers)
+    client.delete(f"{PLANTS}{deleted}", headers=user.headers)
+    settle()
+    changes = sync(client, user, first["watermark"])
+    assert [(plant["id"], plant["nickname"]) for plant in changes["plants"]] == [(kept, "Boston fern")]
+    assert changes["deleted_plants"] == [deleted]
+
+def test_first_sync_has_no_tombstones(client, make_user):
+    user = make_user()
+    deleted = create_plant(client, user, "Palm")
+    client.delete(f"{PLANTS}{deleted}", headers=user.headers)
+    settle()
+
+    first = sync(client, user)
+
+    assert (first["plants"], first["deleted_plants"]) == ([], [])
+
+def test_batches_resume_from_the_watermark(client, make_user):
+    user = make_user()
+    plant_ids = {create_plant(client, user, f"Plant {index}") for index in range(3)}
+    settle()
+
+    seen, since = [], None
+    while True:
+        batch = sync(client, user, since, limit=2)
+        seen.extend(plant["id"] for plant in batch["plants"])
+        since = batch["watermark"]
+        if not batch["has_more"]:
+            break
+
+    assert sorted(seen) == sorted(plant_ids)